@@ -0,0 +1,139 @@
+"""Wire formats of /predict/batch: packed binary, Arrow IPC stream and JSON.
+
+Binary layout (little endian): a 16-byte header followed by the row-major values.
+
+    magic  4s  b"DBT1"
+    dtype  B   1 = float32, 2 = float64 (request), 3 = int8 (response)
+    -      3x  reserved
+    rows   I
+    cols   I   8 for requests (EXPECTED_FEATURES order), 1 for responses
+
+Response predictions are int8, with -1 for rejected rows.
+"""
+import json
+import os
+import struct
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from data.csv_pipeline import EXPECTED_FEATURES
+
+BINARY_MEDIA_TYPE = "application/x-diabetes-batch"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+JSON_MEDIA_TYPE = "application/json"
+
+MAGIC = b"DBT1"
+HEADER = struct.Struct("<4sB3xII")
+DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<f8"), 3: np.dtype("i1")}
+DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+REJECTED = -1
+# larger batches should go through /jobs/csv
+MAX_BATCH_ROWS = int(os.getenv("PREDICT_BATCH_MAX_ROWS", "1000000"))
+# request bodies are refused before decoding above this size: MAX_BATCH_ROWS rows of
+# generously written JSON (binary rows take 32 or 64 bytes)
+MAX_BATCH_BYTES = int(os.getenv("PREDICT_BATCH_MAX_BYTES", str(MAX_BATCH_ROWS * 256)))
+
+
+def media_type(content_type: Optional[str]) -> str:
+    """Canonical wire format of a Content-Type/Accept value (parameters ignored); JSON by default."""
+    value = (content_type or "").split(";")[0].strip().lower()
+    return value if value in (BINARY_MEDIA_TYPE, ARROW_MEDIA_TYPE) else JSON_MEDIA_TYPE
+
+
+def encode_binary(values: np.ndarray) -> bytes:
+    values = np.ascontiguousarray(values)
+    if values.ndim == 1:
+        values = values.reshape(-1, 1)
+    code = DTYPE_CODES.get(values.dtype.newbyteorder("<"))
+    if code is None:
+        raise ValueError(f"Unsupported dtype {values.dtype}")
+    return HEADER.pack(MAGIC, code, *values.shape) + values.astype(DTYPES[code], copy=False).tobytes()
+
+
+def decode_binary(body: bytes, cols: int = len(EXPECTED_FEATURES)) -> np.ndarray:
+    """(rows, cols) view over the body; no per-row Python objects and no copy."""
+    if len(body) < HEADER.size:
+        raise ValueError("Body shorter than the batch header")
+    magic, code, rows, n_cols = HEADER.unpack_from(body)
+    if magic != MAGIC:
+        raise ValueError("Bad magic; expected a DBT1 batch")
+    if code not in DTYPES:
+        raise ValueError(f"Unknown dtype code {code}")
+    if n_cols != cols:
+        raise ValueError(f"Expected {cols} columns, got {n_cols}")
+    dtype = DTYPES[code]
+    if len(body) != HEADER.size + rows * n_cols * dtype.itemsize:
+        raise ValueError(f"Body size does not match a {rows}x{n_cols} {dtype.name} batch")
+    return np.frombuffer(body, dtype=dtype, count=rows * n_cols, offset=HEADER.size).reshape(rows, n_cols)
+
+
+def decode_arrow(body: bytes) -> np.ndarray:
+    """Feature matrix from an Arrow IPC stream with one numeric column per EXPECTED_FEATURES name."""
+    import pyarrow as pa
+
+    table = pa.ipc.open_stream(body).read_all()
+    missing = [c for c in EXPECTED_FEATURES if c not in table.column_names]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+    # nulls come back as NaN and are rejected by validation
+    return np.column_stack([
+        table.column(c).to_numpy().astype(np.float64, copy=False) for c in EXPECTED_FEATURES
+    ]) if table.num_rows else np.empty((0, len(EXPECTED_FEATURES)))
+
+
+def encode_arrow(preds: np.ndarray) -> bytes:
+    import pyarrow as pa
+
+    preds = np.asarray(preds)
+    column = pa.array(preds.astype(np.int8), mask=preds == REJECTED, type=pa.int8())
+    batch = pa.RecordBatch.from_arrays([column], names=["prediction"])
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def decode_json(body: bytes) -> np.ndarray:
+    """Feature matrix from `[[8 numbers], ...]` or `{"rows": [[...], ...]}`; null becomes NaN."""
+    data = json.loads(body)
+    if isinstance(data, dict):
+        data = data.get("rows")
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON array of rows or {"rows": [...]}')
+    if not data:
+        return np.empty((0, len(EXPECTED_FEATURES)))
+    try:
+        values = np.array(data, dtype=np.float64)
+    except (TypeError, ValueError) as e:
+        # objects, nested lists and ragged rows
+        raise ValueError(f"Rows must hold numbers or null: {e}") from None
+    if values.ndim != 2 or values.shape[1] != len(EXPECTED_FEATURES):
+        raise ValueError(f"Each row must have {len(EXPECTED_FEATURES)} numbers ({', '.join(EXPECTED_FEATURES)})")
+    return values
+
+
+def decode(body: bytes, content_type: Optional[str]) -> Tuple[np.ndarray, str]:
+    fmt = media_type(content_type)
+    if fmt == BINARY_MEDIA_TYPE:
+        X = decode_binary(body)
+    elif fmt == ARROW_MEDIA_TYPE:
+        X = decode_arrow(body)
+    else:
+        X = decode_json(body)
+    if len(X) > MAX_BATCH_ROWS:
+        raise ValueError(f"Batch has {len(X)} rows; the limit is {MAX_BATCH_ROWS}")
+    return X, fmt
+
+
+def response_format(accept: Optional[str], request_format: str) -> str:
+    """Format named by Accept, else the request's own format."""
+    for value in (accept or "").split(","):
+        value = value.split(";")[0].strip().lower()
+        if value in (BINARY_MEDIA_TYPE, ARROW_MEDIA_TYPE, JSON_MEDIA_TYPE):
+            return value
+    return request_format
+
+
+def json_predictions(preds: np.ndarray) -> List[Optional[int]]:
+    return [None if p == REJECTED else p for p in preds.tolist()]
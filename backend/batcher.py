@@ -0,0 +1,96 @@
+import threading
+import time
+from concurrent.futures import Future
+from queue import Empty, Queue
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .metrics import Histogram
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+QUEUE_WAIT_MS_BUCKETS = [0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100]
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into one model call.
+
+    Callers block on `predict`; a background thread drains the queue, waits at most
+    `max_wait_ms` after the first queued row for more rows (up to `max_batch_size`),
+    runs `predict_fn` once on the stacked matrix and hands each caller its result.
+    `collate` turns the list of queued rows into the batch argument (default: a numpy
+    matrix); pass `list` for rows that are not numeric.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], Sequence],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+        collate: Callable[[List], object] = np.array,
+        name: str = "predict-batcher",
+    ):
+        self.predict_fn = predict_fn
+        self.collate = collate
+        self.name = name
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.batch_size_hist = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_hist = Histogram(QUEUE_WAIT_MS_BUCKETS)
+        self._queue: "Queue[Tuple[List[float], float, Future]]" = Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, row: Sequence[float]) -> Future:
+        self._ensure_started()
+        fut: Future = Future()
+        self._queue.put((list(row), time.perf_counter(), fut))
+        return fut
+
+    def predict(self, row: Sequence[float], timeout: Optional[float] = None):
+        return self.submit(row).result(timeout=timeout)
+
+    def _collect(self) -> List[Tuple[List[float], float, Future]]:
+        first = self._queue.get()
+        batch = [first]
+        deadline = first[1] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            dispatched = time.perf_counter()
+            for _, enqueued, _ in batch:
+                self.queue_wait_hist.observe((dispatched - enqueued) * 1000.0)
+            self.batch_size_hist.observe(len(batch))
+            try:
+                results = self.predict_fn(self.collate([row for row, _, _ in batch]))
+            except Exception as e:
+                for _, _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, _, fut), res in zip(batch, results):
+                fut.set_result(res)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self._queue.qsize(),
+            "batch_size": self.batch_size_hist.snapshot(),
+            "queue_wait_ms": self.queue_wait_hist.snapshot(),
+        }
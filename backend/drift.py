@@ -0,0 +1,218 @@
+"""Feature and prediction drift of scored traffic against the training distribution.
+
+A baseline holds, per feature, fixed bin edges (training quantiles) and the training
+counts in those bins, plus the training prediction rate. It is written next to each
+model version by the training script. The monitor keeps one count per bin per feature
+for live traffic, so memory does not grow with traffic. /drift compares the two with
+the population stability index (PSI) and a binned Kolmogorov-Smirnov distance.
+"""
+import csv
+import os
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from data.csv_pipeline import EXPECTED_FEATURES, OUTCOME_COLUMN
+
+DRIFT_BINS = int(os.getenv("DRIFT_BINS", "10"))
+# scores are withheld until this many rows were observed since the baseline was set
+DRIFT_MIN_SAMPLES = int(os.getenv("DRIFT_MIN_SAMPLES", "100"))
+# used for models published without a baseline (e.g. the legacy model.joblib)
+DRIFT_BASELINE_CSV = os.getenv("DRIFT_BASELINE_CSV", os.path.join("data", "diabetes.csv"))
+# conventional PSI reading: < 0.1 stable, 0.1-0.25 moderate shift, above that significant
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+# single rows are buffered and binned together once this many are pending
+PENDING_ROWS = 256
+# keeps PSI finite when a bin is empty on one side
+_EPSILON = 1e-4
+
+
+def _bin_counts(values: np.ndarray, edges: Sequence[float]) -> np.ndarray:
+    # len(edges) + 1 bins; the first and last are open ended
+    index = np.searchsorted(np.asarray(edges, dtype=np.float64), values, side="right")
+    return np.bincount(index, minlength=len(edges) + 1)
+
+
+def build_baseline(X: np.ndarray, prediction_rate: Optional[float], source: str, bins: int = DRIFT_BINS) -> dict:
+    """Baseline from an (n, 8) training matrix in EXPECTED_FEATURES order."""
+    X = np.asarray(X, dtype=np.float64)
+    features = {}
+    for j, name in enumerate(EXPECTED_FEATURES):
+        col = X[:, j]
+        col = col[np.isfinite(col)]
+        # interior quantiles; discrete columns collapse to fewer, distinct edges
+        edges = np.unique(np.quantile(col, np.linspace(0, 1, bins + 1)[1:-1])) if len(col) else np.array([])
+        features[name] = {"edges": edges.tolist(), "counts": _bin_counts(col, edges).tolist()}
+    return {
+        "source": source,
+        "rows": int(len(X)),
+        "prediction_rate": None if prediction_rate is None else float(prediction_rate),
+        "features": features,
+    }
+
+
+def baseline_from_csv(path: str = DRIFT_BASELINE_CSV) -> dict:
+    """Baseline of a labelled training CSV; its outcome rate stands in for the prediction rate."""
+    with open(path, newline="", encoding="latin1") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        columns = [header.index(c) for c in EXPECTED_FEATURES]
+        outcome = header.index(OUTCOME_COLUMN) if OUTCOME_COLUMN in header else None
+        rows = [row for row in reader if row]
+    X = np.array([[row[j] or "nan" for j in columns] for row in rows], dtype=np.float64)
+    rate = float(np.mean([float(row[outcome]) for row in rows])) if outcome is not None and rows else None
+    return build_baseline(X, rate, source=path)
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    p = np.maximum(expected / max(expected.sum(), 1), _EPSILON)
+    q = np.maximum(actual / max(actual.sum(), 1), _EPSILON)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def ks(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Largest CDF gap at the bin edges (a lower bound of the exact two-sample KS statistic)."""
+    p = np.cumsum(expected) / max(expected.sum(), 1)
+    q = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.max(np.abs(q - p)))
+
+
+def _status(value: Optional[float]) -> Optional[str]:
+    if value is None:
+        return None
+    return "significant" if value >= PSI_SIGNIFICANT else "moderate" if value >= PSI_MODERATE else "stable"
+
+
+class DriftMonitor:
+    """Fixed-size live histograms over the baseline's bins plus a running prediction rate.
+
+    `observe_row` only appends to a small buffer that is binned in one vectorized pass
+    every PENDING_ROWS rows (and before a report); `observe` bins batches directly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.baseline: Optional[dict] = None
+        self.version: Optional[str] = None
+        self._edges: List[List[float]] = []
+        self._counts = np.zeros((0, 0), dtype=np.int64)
+        self._rows = 0
+        self._predicted = 0
+        self._positive = 0
+        self._pending: List[Sequence[float]] = []
+        self._pending_predictions: List[int] = []
+
+    def set_baseline(self, baseline: Optional[dict], version: Optional[str] = None) -> None:
+        """Switch to a new baseline; live counts restart because the bins change with it."""
+        with self._lock:
+            self.baseline = baseline
+            self.version = version
+            self._edges = [list(baseline["features"][name]["edges"]) for name in EXPECTED_FEATURES] if baseline else []
+            width = max((len(e) + 1 for e in self._edges), default=0)
+            self._counts = np.zeros((len(self._edges), width), dtype=np.int64)
+            self._rows = self._predicted = self._positive = 0
+            self._pending, self._pending_predictions = [], []
+
+    def reset(self) -> None:
+        self.set_baseline(self.baseline, self.version)
+
+    def observe_row(self, row: Sequence[float], prediction: int) -> None:
+        with self._lock:
+            if not self._edges:
+                return
+            self._pending.append(row)
+            self._pending_predictions.append(prediction)
+            if len(self._pending) >= PENDING_ROWS:
+                self._flush()
+
+    def observe(self, X: np.ndarray, predictions: np.ndarray) -> None:
+        X = np.asarray(X, dtype=np.float64)
+        if not len(X):
+            return
+        with self._lock:
+            if self._edges:
+                self._add(X, np.asarray(predictions))
+
+    def snapshot(self) -> Optional[dict]:
+        """Live counts since the last reset, for `merge` into another process's monitor
+        (background job workers send theirs back with the job result)."""
+        with self._lock:
+            self._flush()
+            if not self._edges:
+                return None
+            return {
+                "version": self.version,
+                "counts": self._counts.tolist(),
+                "rows": self._rows,
+                "predicted": self._predicted,
+                "positive": self._positive,
+            }
+
+    def merge(self, snapshot: Optional[dict]) -> bool:
+        """Add another monitor's `snapshot`; ignored unless it was taken against the same model."""
+        if not snapshot:
+            return False
+        counts = np.asarray(snapshot["counts"], dtype=np.int64)
+        with self._lock:
+            if not self._edges or snapshot["version"] != self.version or counts.shape != self._counts.shape:
+                return False
+            self._counts += counts
+            self._rows += snapshot["rows"]
+            self._predicted += snapshot["predicted"]
+            self._positive += snapshot["positive"]
+        return True
+
+    def _flush(self) -> None:
+        if self._pending:
+            self._add(np.array(self._pending, dtype=np.float64), np.array(self._pending_predictions))
+            self._pending, self._pending_predictions = [], []
+
+    def _add(self, X: np.ndarray, predictions: np.ndarray) -> None:
+        width = self._counts.shape[1]
+        for j, edges in enumerate(self._edges):
+            self._counts[j] += np.bincount(np.searchsorted(edges, X[:, j], side="right"), minlength=width)[:width]
+        self._rows += len(X)
+        self._predicted += len(predictions)
+        self._positive += int(np.count_nonzero(predictions == 1))
+
+    def report(self) -> dict:
+        with self._lock:
+            self._flush()
+            baseline, counts, rows = self.baseline, self._counts.copy(), self._rows
+            predicted, positive = self._predicted, self._positive
+        if baseline is None:
+            return {"baseline": None, "rows": 0, "features": {}}
+        scored = rows >= DRIFT_MIN_SAMPLES
+        features: Dict[str, dict] = {}
+        for j, name in enumerate(EXPECTED_FEATURES):
+            base = baseline["features"][name]
+            expected = np.asarray(base["counts"], dtype=np.float64)
+            actual = counts[j, : len(expected)].astype(np.float64)
+            value = psi(expected, actual) if scored else None
+            features[name] = {
+                "psi": value,
+                "ks": ks(expected, actual) if scored else None,
+                "status": _status(value),
+                "edges": base["edges"],
+                "baseline_share": (expected / max(expected.sum(), 1)).tolist(),
+                "live_share": (actual / max(actual.sum(), 1)).tolist(),
+            }
+        psis = [f["psi"] for f in features.values() if f["psi"] is not None]
+        return {
+            "baseline": {"source": baseline["source"], "rows": baseline["rows"], "model_version": self.version},
+            "rows": rows,
+            "min_samples": DRIFT_MIN_SAMPLES,
+            "max_psi": max(psis) if psis else None,
+            "status": _status(max(psis)) if psis else None,
+            "prediction_rate": {
+                "baseline": baseline["prediction_rate"],
+                "live": positive / predicted if predicted else None,
+                "predictions": predicted,
+            },
+            "features": features,
+        }
+
+
+monitor = DriftMonitor()
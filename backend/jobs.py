@@ -0,0 +1,498 @@
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import IO, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, or_, select, update
+
+from data.csv_pipeline import DEFAULT_CHUNK_ROWS, ValidatedChunk, iter_validated_chunks
+from data.pdf_pipeline_with_feature_extract import (
+    EXPECTED_KEYS,
+    PDF_TIMEOUT_SECONDS,
+    extract_text_from_pdf_bytes,
+    report_features,
+)
+from models.db import Job, SessionLocal
+from models.forest import CompiledForest
+from models.registry import ModelRegistry, load_legacy_model
+from . import drift, serving
+from .serving import csv_result_lines, score_chunk
+
+# spooled uploads and NDJSON results, one directory per job
+JOB_DIR = os.getenv("JOB_DIR", os.path.join("data", "jobs"))
+# jobs scored at the same time; each one runs in its own worker process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# submissions are refused (429) once this many jobs are queued or running
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+# a pending job belongs to the API process holding its lease; jobs of a process that died
+# are claimed by another (or the restarted) one once the lease runs out. The API process
+# renews the leases of queued jobs, the worker those of the job it is running, so a
+# worker that stops making progress loses its job too
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# finished jobs, their rows and result files are deleted after this long (0 = kept forever)
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "168"))
+
+CSV_INPUT = "input.csv"
+PDF_INPUT_DIR = "pdfs"
+RESULT_FILE = "result.ndjson"
+TERMINAL_STATUSES = ("succeeded", "failed")
+PENDING_STATUSES = ("queued", "running")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class LeaseLost(Exception):
+    """Another process claimed the job; this one must stop without committing anything."""
+
+
+def job_dir(job_id: str) -> str:
+    return os.path.join(JOB_DIR, job_id)
+
+
+def result_path(job_id: str) -> str:
+    return os.path.join(job_dir(job_id), RESULT_FILE)
+
+
+def job_status(job: Job) -> dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "store": job.store,
+        "model_version": job.model_version,
+        "total": job.total,
+        "processed": job.processed,
+        "failed": job.failed,
+        "progress": min(1.0, job.processed / job.total) if job.total else (1.0 if job.status == "succeeded" else 0.0),
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    with SessionLocal() as db:
+        job = db.get(Job, job_id)
+        return job_status(job) if job is not None else None
+
+
+# ---- API process side -------------------------------------------------------
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# lease owner name of this API process (worker processes are handed it with each job)
+OWNER = uuid.uuid4().hex
+
+
+def _lease_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)
+
+
+def get_job_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the API process runs threads, which fork does not copy safely
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, JOB_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _replace_job_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a pool that broke (a worker died) so the next dispatch builds a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_job_pool() -> None:
+    """Stop taking work; jobs still queued or running are claimed by `resume_jobs` once their
+    lease has run out."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _on_done(job_id: str, pool: ProcessPoolExecutor, future: Future) -> None:
+    # the worker records its own failures; this only catches a worker process that died
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        if isinstance(error, BrokenProcessPool):
+            _replace_job_pool(pool)
+        _finish(job_id, OWNER, "failed", f"worker crashed: {error!r}")
+        return
+    # drift counts of the rows the worker scored, so /drift covers job traffic too
+    drift.monitor.merge(future.result().get("drift"))
+
+
+def _dispatch(job_id: str) -> bool:
+    """Hand a claimed job to the worker pool, replacing the pool once if it is broken.
+
+    If the job cannot be submitted its lease is released, so the job keeper claims it
+    again on its next round instead of renewing a lease nobody works under.
+    """
+    try:
+        pool = get_job_pool()
+        try:
+            future = pool.submit(run_job, job_id, OWNER)
+        except BrokenProcessPool:
+            _replace_job_pool(pool)
+            pool = get_job_pool()
+            future = pool.submit(run_job, job_id, OWNER)
+    except Exception as e:
+        print(f"Could not dispatch job {job_id}: {e!r}")
+        _release(job_id)
+        return False
+    future.add_done_callback(lambda f: _on_done(job_id, pool, f))
+    return True
+
+
+def _release(job_id: str) -> None:
+    with SessionLocal() as db:
+        db.execute(
+            update(Job).where(Job.id == job_id, Job.owner == OWNER, Job.status.in_(PENDING_STATUSES))
+            .values(owner=None, lease_until=None)
+        )
+        db.commit()
+
+
+def _create_job(kind: str, store: bool, model_version: Optional[str], fill_spool) -> str:
+    with SessionLocal() as db:
+        pending = db.scalar(select(func.count()).select_from(Job).where(Job.status.in_(("queued", "running"))))
+        if pending >= JOB_MAX_PENDING:
+            raise QueueFull(f"{pending} jobs are already pending; try again later")
+        job_id = uuid.uuid4().hex
+        os.makedirs(job_dir(job_id))
+        try:
+            fill_spool(job_dir(job_id))
+        except Exception:
+            shutil.rmtree(job_dir(job_id), ignore_errors=True)
+            raise
+        db.add(Job(
+            id=job_id, kind=kind, status="queued", store=store, model_version=model_version,
+            owner=OWNER, lease_until=_lease_expiry(),
+        ))
+        db.commit()
+    _dispatch(job_id)
+    return job_id
+
+
+def submit_csv_job(source: IO[bytes], store: bool = False, model_version: Optional[str] = None) -> str:
+    """Spool an uploaded CSV to disk and queue it for scoring; returns the job id."""
+
+    def spool(directory: str) -> None:
+        with open(os.path.join(directory, CSV_INPUT), "wb") as out:
+            shutil.copyfileobj(source, out, 1024 * 1024)
+
+    return _create_job("csv", store, model_version, spool)
+
+
+def submit_pdf_job(documents: Iterable[Tuple[str, IO[bytes]]], model_version: Optional[str] = None) -> str:
+    """Spool uploaded PDFs to disk and queue them for scoring; returns the job id."""
+
+    def spool(directory: str) -> None:
+        pdf_dir = os.path.join(directory, PDF_INPUT_DIR)
+        os.makedirs(pdf_dir)
+        names: List[str] = []
+        for i, (name, source) in enumerate(documents):
+            # files are numbered on disk; the manifest keeps the client's names and order
+            with open(os.path.join(pdf_dir, f"{i:06d}.pdf"), "wb") as out:
+                shutil.copyfileobj(source, out, 1024 * 1024)
+            names.append(name)
+        with open(os.path.join(directory, "manifest.json"), "w") as f:
+            json.dump(names, f)
+
+    return _create_job("pdf", False, model_version, spool)
+
+
+def resume_jobs() -> int:
+    """Claim and dispatch pending jobs whose lease has expired (their process stopped).
+
+    Each claim is a conditional UPDATE, so with several API workers every job is taken by
+    exactly one of them. A claimed job resumes from its last committed progress.
+    """
+    now = datetime.utcnow()
+    expired = or_(Job.lease_until.is_(None), Job.lease_until < now)
+    claimed: List[str] = []
+    with SessionLocal() as db:
+        candidates = list(db.scalars(select(Job.id).where(Job.status.in_(PENDING_STATUSES), expired).order_by(Job.created_at)))
+        for job_id in candidates:
+            result = db.execute(
+                update(Job).where(Job.id == job_id, Job.status.in_(PENDING_STATUSES), expired)
+                .values(owner=OWNER, lease_until=_lease_expiry())
+            )
+            db.commit()
+            if result.rowcount == 1:
+                claimed.append(job_id)
+    for job_id in claimed:
+        _dispatch(job_id)
+    return len(claimed)
+
+
+def renew_leases() -> int:
+    """Extend the lease of every queued job this process owns; running jobs are renewed by
+    their worker as it makes progress."""
+    with SessionLocal() as db:
+        result = db.execute(
+            update(Job).where(Job.owner == OWNER, Job.status == "queued").values(lease_until=_lease_expiry())
+        )
+        db.commit()
+        return result.rowcount
+
+
+def purge_jobs(retention_hours: float = JOB_RETENTION_HOURS) -> int:
+    """Delete finished jobs older than `retention_hours`, with their spool and result files."""
+    if retention_hours <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    with SessionLocal() as db:
+        job_ids = list(db.scalars(select(Job.id).where(Job.status.in_(TERMINAL_STATUSES), Job.finished_at < cutoff)))
+        for job_id in job_ids:
+            shutil.rmtree(job_dir(job_id), ignore_errors=True)
+        if job_ids:
+            db.execute(delete(Job).where(Job.id.in_(job_ids)))
+            db.commit()
+    return len(job_ids)
+
+
+class JobKeeper(threading.Thread):
+    """Renews this process's queued-job leases, adopts jobs whose lease expired and purges old jobs."""
+
+    def __init__(self, interval: float = JOB_LEASE_SECONDS / 4):
+        super().__init__(name="job-keeper", daemon=True)
+        self.interval = max(0.1, interval)
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                renew_leases()
+                claimed = resume_jobs()
+                if claimed:
+                    print(f"Claimed {claimed} scoring jobs left by a stopped process")
+                purge_jobs()
+            except Exception as e:
+                print(f"Job keeper failed: {e}")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+# ---- worker process side ----------------------------------------------------
+
+_forests: Dict[str, CompiledForest] = {}
+
+
+def _load_forest(version: Optional[str]) -> Tuple[str, CompiledForest]:
+    if version is not None and version in _forests:
+        return version, _forests[version]
+    if version is not None and version.startswith("legacy-"):
+        # the legacy version is the artifact's fingerprint; never substitute the registry's CURRENT
+        loaded_version, forest = load_legacy_model()
+        if loaded_version != version:
+            raise ValueError(f"Model {version} is no longer available; the legacy artifact is now {loaded_version}")
+    else:
+        loaded_version, forest = ModelRegistry().load(version)
+    _forests[loaded_version] = forest
+    return loaded_version, forest
+
+
+def _progress(db, job_id: str, owner: str, **values) -> None:
+    """Record progress and renew the lease in `db`'s transaction; raises LeaseLost (the caller
+    rolls back) if another process has claimed the job meanwhile."""
+    result = db.execute(
+        update(Job).where(Job.id == job_id, Job.owner == owner).values(lease_until=_lease_expiry(), **values)
+    )
+    if result.rowcount != 1:
+        raise LeaseLost(f"job {job_id} was claimed by another process")
+
+
+@contextmanager
+def _time_limit(seconds: float, what: str):
+    """Raise TimeoutError in the worker's main thread after `seconds` (SIGALRM). pypdf is pure
+    Python, so this interrupts a document it is stuck in; elsewhere it is a no-op."""
+    if seconds <= 0 or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expire(signum, frame):
+        raise TimeoutError(f"{what} exceeded {seconds:g}s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _update(job_id: str, owner: str, **values) -> None:
+    with SessionLocal() as db:
+        _progress(db, job_id, owner, **values)
+        db.commit()
+
+
+def _finish(job_id: str, owner: str, status: str, error: Optional[str] = None) -> None:
+    try:
+        _update(job_id, owner, status=status, error=error, finished_at=datetime.utcnow())
+    except LeaseLost:
+        return
+    # the uploads are no longer needed; the result is kept until purge_jobs
+    shutil.rmtree(os.path.join(job_dir(job_id), PDF_INPUT_DIR), ignore_errors=True)
+    for name in (CSV_INPUT, "manifest.json"):
+        try:
+            os.remove(os.path.join(job_dir(job_id), name))
+        except FileNotFoundError:
+            pass
+
+
+def _count_csv_rows(path: str) -> int:
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(0, lines - 1)
+
+
+def _drop_head(chunk: ValidatedChunk, n: int) -> ValidatedChunk:
+    """`chunk` without its first `n` rows."""
+    errors = {rule: positions[positions >= n] - n for rule, positions in chunk.errors.items()}
+    return ValidatedChunk(chunk.features.iloc[n:], chunk.valid[n:], {r: p for r, p in errors.items() if len(p)})
+
+
+def _run_csv(job: Job, active: serving.ActiveModel, out: IO[str], owner: str) -> None:
+    """Score chunk by chunk from row `job.processed` on. Stored rows of a chunk are committed
+    in the same transaction as the progress that covers them, so a resumed job never
+    inserts a row twice."""
+    path = os.path.join(job_dir(job.id), CSV_INPUT)
+    _update(job.id, owner, total=_count_csv_rows(path))
+    with SessionLocal() as db:
+        offset = 0
+        rejected = job.failed
+        for chunk in iter_validated_chunks(path, chunksize=DEFAULT_CHUNK_ROWS, with_outcome=job.store):
+            if offset + len(chunk.valid) <= job.processed:
+                offset += len(chunk.valid)
+                continue
+            if offset < job.processed:
+                chunk, offset = _drop_head(chunk, job.processed - offset), job.processed
+            try:
+                preds, ids = score_chunk(
+                    chunk, lambda X: serving.predict_rows(X, active), db if job.store else None, commit=False
+                )
+                out.write(csv_result_lines(chunk, offset, preds, ids))
+                out.flush()
+                offset += len(preds)
+                rejected += chunk.rejected
+                _progress(db, job.id, owner, processed=offset, failed=rejected)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        _update(job.id, owner, total=offset)
+
+
+def _run_pdf(job: Job, active: serving.ActiveModel, out: IO[str], owner: str) -> None:
+    directory = job_dir(job.id)
+    with open(os.path.join(directory, "manifest.json")) as f:
+        names = json.load(f)
+    _update(job.id, owner, total=len(names))
+    failed = job.failed
+    for i in range(job.processed, len(names)):
+        result = {"filename": names[i]}
+        try:
+            with open(os.path.join(directory, PDF_INPUT_DIR, f"{i:06d}.pdf"), "rb") as f:
+                # already in a worker process, so the text is extracted here rather than on the pdf pool
+                with _time_limit(PDF_TIMEOUT_SECONDS, "PDF text extraction"):
+                    text = extract_text_from_pdf_bytes(f.read())
+                feats = report_features(text)
+            row = np.asarray([[feats[k] for k in EXPECTED_KEYS]], dtype=np.float64)
+            prediction = int(serving.predict_rows(row, active)[0])
+            result.update({"prediction": prediction, "features": feats, "model_version": job.model_version})
+        except Exception as e:
+            failed += 1
+            result["error"] = str(e) or type(e).__name__
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        _update(job.id, owner, processed=i + 1, failed=failed)
+
+
+def _open_result(job: Job):
+    """Result file for appending, cut back to the `job.processed` lines whose progress was
+    committed (a crash can leave lines of an uncommitted chunk behind)."""
+    path = result_path(job.id)
+    if not job.processed:
+        return open(path, "w")
+    with open(path, "rb+") as f:
+        lines = 0
+        while lines < job.processed and f.readline():
+            lines += 1
+        if lines < job.processed:
+            raise RuntimeError(f"result file has {lines} lines, progress says {job.processed}")
+        f.truncate(f.tell())
+    return open(path, "a")
+
+
+def _activate(version: str, forest: CompiledForest) -> serving.ActiveModel:
+    """Serve `forest` in this worker process; the drift monitor restarts so that it only
+    holds this job's rows when its counts are sent back."""
+    active = serving.current()
+    if active is None or active.version != version:
+        active = serving.set_model(forest, version)
+    drift.monitor.reset()
+    return active
+
+
+def run_job(job_id: str, owner: str) -> dict:
+    """Score one spooled job in a worker process, writing NDJSON results and progress as it goes.
+
+    Returns the final status and the drift counts of the rows scored here.
+    """
+    with SessionLocal() as db:
+        job = db.get(Job, job_id)
+        if job is None or job.status in TERMINAL_STATUSES or job.owner != owner:
+            return {"status": job.status if job is not None else "missing", "drift": None}
+        db.expunge(job)
+    try:
+        version, forest = _load_forest(job.model_version)
+        active = _activate(version, forest)
+        job.model_version = version
+        _update(job_id, owner, status="running", model_version=version, started_at=job.started_at or datetime.utcnow())
+        with _open_result(job) as out:
+            if job.kind == "csv":
+                _run_csv(job, active, out, owner)
+            elif job.kind == "pdf":
+                _run_pdf(job, active, out, owner)
+            else:
+                raise ValueError(f"Unknown job kind: {job.kind}")
+    except LeaseLost:
+        return {"status": "claimed", "drift": None}
+    except Exception as e:
+        _finish(job_id, owner, "failed", str(e) or type(e).__name__)
+        return {"status": "failed", "drift": drift.monitor.snapshot()}
+    _finish(job_id, owner, "succeeded")
+    return {"status": "succeeded", "drift": drift.monitor.snapshot()}
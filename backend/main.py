@@ -1,22 +1,115 @@
-from io import BytesIO
+import time
+_import_started = time.perf_counter()
+import asyncio
+import json
+import threading
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import AsyncIterator, Iterator, List, Optional
 from sqlalchemy.orm import Session
-import tempfile
-import pandas as pd
-import joblib
-import numpy as np
-import os
 # from typing import List
-from fastapi import FastAPI,HTTPException,UploadFile,File,Depends
+from fastapi import FastAPI,HTTPException,UploadFile,File,Depends,Query,Request,Response
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from research.chatbot import get_chat_response
-from data.csv_pipeline import load_feature_from_csv_file
-from data.pdf_pipeline_with_feature_extract import extract_text_from_pdf
-from data.pdf_pipeline_with_feature_extract import extract_features_with_validation as extract_pdf_features
-from models.db import init_db,get_db
+from research.chatbot import aget_chat_response, answer_cache, get_chain
+from data.csv_pipeline import (
+    DEFAULT_CHUNK_ROWS,
+    iter_validated_chunks,
+    load_validated_csv,
+)
+from data.pdf_pipeline_with_feature_extract import aextract_text_from_pdf_bytes_pooled as extract_pdf_text
+from data.pdf_pipeline_with_feature_extract import iter_pdf_texts, shutdown_pdf_pool
+from data.pdf_pipeline_with_feature_extract import report_features
+from models.db import SessionLocal,init_db,get_db
 from models.schema import RecordCreate
-from models import crud
+from models import crud, export, partitions, rollups
+from backend import batch_codec, drift, jobs, metrics, profiler, serving, startup
 
-app=FastAPI()
+# heavy dependencies (pandas, pypdf, joblib/sklearn, langchain) are imported on first use,
+# so this only covers FastAPI, SQLAlchemy, NumPy and the app's own modules
+startup.state.record("import backend.main", time.perf_counter() - _import_started)
+
+
+def _warm_up() -> None:
+    """Load the model and run a dummy prediction off the event loop; /ready flips afterwards."""
+    try:
+        with startup.state.phase("load_model"):
+            active = serving.load_active()
+        with startup.state.phase("warm_model"):
+            serving.warm_up(active)
+        with startup.state.phase("rollup_backfill"), SessionLocal() as db:
+            backfilled = rollups.backfill_if_empty(db)
+        if backfilled:
+            print(f"Built record rollups from {backfilled} existing records")
+        startup.state.ready.set()
+    except Exception as e:
+        print(f"Model not loaded: {e}")
+    finally:
+        startup.state.finish()
+        startup.state.warming.clear()
+        print(startup.state.summary())
+
+
+def _warm_chat() -> None:
+    try:
+        # build the shared LLM client and chain once instead of per /chat call
+        with startup.state.phase("warm_chat"):
+            get_chain()
+    except Exception as e:
+        print(f"Chat model not initialised at startup, retrying on first /chat: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the startup total is the import time plus wall-clock time from here until the model is warm
+    startup.state.begin(startup.state.phases.get("import backend.main", 0.0))
+    with startup.state.phase("init_db"):
+        init_db()
+    startup.state.warming.set()
+    threading.Thread(target=_warm_up, name="model-warmup", daemon=True).start()
+    threading.Thread(target=_warm_chat, name="chat-warmup", daemon=True).start()
+    profiler.start_profiler()
+    resumed = jobs.resume_jobs()
+    if resumed:
+        print(f"Re-queued {resumed} unfinished scoring jobs")
+    # jobs still leased by a process that just stopped are claimed once their lease runs out
+    job_keeper = jobs.JobKeeper()
+    job_keeper.start()
+    watcher = None
+    if serving.MODEL_WATCH_INTERVAL > 0:
+        watcher = serving.ModelWatcher()
+        watcher.start()
+    yield
+    if watcher is not None:
+        watcher.stop()
+    profiler.stop_profiler()
+    job_keeper.stop()
+    jobs.shutdown_job_pool()
+    shutdown_pdf_pool()
+
+app=FastAPI(lifespan=lifespan)
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Per-route latency histogram, plus a flame profile of slow requests when PROFILE_SLOW_MS is set.
+
+    Streaming responses are timed until their headers are sent, not until the body ends.
+    """
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        end = time.perf_counter()
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        metrics.REQUEST_SECONDS.labels(request.method, path, status).observe(end - start)
+        dumped = profiler.maybe_dump_slow_request(start, end, f"{request.method}{path}")
+        if dumped:
+            print(f"Slow request {request.method} {path} took {(end - start) * 1000:.0f}ms, profile: {dumped}")
 
 class DiabetesInput(BaseModel):
     pregnancies: int
@@ -32,22 +125,40 @@ class ChatRequest(BaseModel):
     question:str
 
 
-MODEL_PATH = os.path.join(os.path.dirname("diabities-prediction-app"), "models", "model.joblib")
-if os.path.exists(MODEL_PATH):
-    model = joblib.load(MODEL_PATH)
-else:
-    model = None
+def _require_model(detail: str = "Model not loaded. Run the training script to generate model.joblib") -> serving.ActiveModel:
+    active = serving.current()
+    if active is None:
+        if startup.state.warming.is_set():
+            raise HTTPException(status_code=503, detail="Model is still loading", headers={"Retry-After": "1"})
+        raise HTTPException(status_code=500, detail=detail)
+    return active
 
-init_db()
 
 @app.get("/")
 def read_root():
     return {"message": "Diabetes Prediction API is running."}
 
+@app.get("/ready")
+def readiness(response: Response):
+    """200 once the model is loaded and has answered a dummy prediction, 503 before (or if loading failed)."""
+    active = serving.current()
+    report = startup.state.report()
+    report["model_version"] = active.version if active else None
+    if not report["ready"]:
+        response.status_code = 503
+    return report
+
+PROBA_QUERY = Query(False, description="also return the probability of a positive outcome")
+EXPLAIN_QUERY = Query(False, description="also return per-feature contributions to the probability (implies proba)")
+
 @app.post("/predict")
-def predict_diabetes(data: DiabetesInput, db: Session = Depends(get_db)):
-    if model is None:
-        raise HTTPException(status_code=500, detail="Model not loaded. Run the training script to generate model.joblib")
+def predict_diabetes(
+    data: DiabetesInput,
+    proba: bool = PROBA_QUERY,
+    explain: bool = EXPLAIN_QUERY,
+    db: Session = Depends(get_db),
+):
+    active = _require_model()
     input_row = [
         data.pregnancies,
         data.glucose,
@@ -58,118 +169,476 @@ def predict_diabetes(data: DiabetesInput, db: Session = Depends(get_db)):
         data.diabetes_pedigree_function,
         data.age,
     ]
-    prediction = int(model.predict(np.array([input_row]))[0])
-    record = crud.create_record(db, RecordCreate(**data.dict()), predicted=prediction)
-    return {"diabetes_risk": prediction, "record_id": record.id}
+    extra = {}
+    if proba or explain:
+        prediction, extra = serving.explain_one(input_row, active, proba=True, explain=explain)
+    else:
+        prediction = serving.predict_one(input_row, active)
+    record_id = crud.create_record_id(db, RecordCreate(**data.dict()), predicted=prediction)
+    return {"diabetes_risk": prediction, "record_id": record_id, "model_version": active.version, **extra}
 
 @app.post("/predict/csv")
-def predict_from_csv(file:UploadFile=File(...)):
-    if model is None:
-        raise HTTPException(status_code=500,detail="model not loaded")
+def predict_from_csv(
+    file:UploadFile=File(...),
+    store:bool=Query(False, description="persist rows and predictions to patient_records"),
+    proba:bool=PROBA_QUERY,
+    explain:bool=EXPLAIN_QUERY,
+    db:Session=Depends(get_db),
+):
+    active = _require_model("model not loaded")
     
     if not file.filename.lower().endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
     
     try:
-        content=file.file.read()
-        df=pd.read_csv(BytesIO(content))
-        features=load_feature_from_csv_file(BytesIO(content))
-        preds=model.predict(features.values)
-        return {"count":len(preds),"predictions":[int(x) for x in preds]}
+        chunk=load_validated_csv(file.file, with_outcome=store)
+        scores=None
+        def predict(X):
+            nonlocal scores
+            scores=serving.score_rows(X, active, proba=proba or explain, explain=explain)
+            return scores.predictions
+        preds,ids=serving.score_chunk(chunk, predict, db if store else None)
+        # rejected rows keep their place with a null prediction; `rejects` says why
+        result={"count":len(preds),"predictions":preds,"model_version":active.version,**chunk.summary()}
+        if proba or explain:
+            result.update(serving.explanation_fields(scores, chunk.valid, explain))
+        if store:
+            result["record_ids"]=ids
+        return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"CSV processing error: {e}")
     
+async def _read_body(request: Request, limit: int) -> bytes:
+    """The request body, or 413 as soon as Content-Length or the bytes received exceed `limit`."""
+    too_large = HTTPException(status_code=413, detail=f"Body larger than {limit} bytes; use /jobs/csv for big batches")
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > limit:
+        raise too_large
+    parts = []
+    received = 0
+    async for part in request.stream():
+        received += len(part)
+        if received > limit:
+            raise too_large
+        parts.append(part)
+    return b"".join(parts)
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """Score an (n, 8) feature batch in one call; nothing is stored.
+
+    The body is a packed binary batch, an Arrow IPC stream or JSON rows, chosen by
+    Content-Type (see backend/batch_codec.py). The response uses the Accept format, or the
+    request's. Rejected rows get prediction -1 (binary) or null (Arrow, JSON).
+    """
+    active = _require_model()
+    body = await _read_body(request, batch_codec.MAX_BATCH_BYTES)
+
+    def score():
+        X, fmt = batch_codec.decode(body, request.headers.get("content-type"))
+        preds, chunk = serving.score_matrix(X, active)
+        return preds, chunk, fmt
+
+    try:
+        preds, chunk, fmt = await run_in_threadpool(score)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Batch decoding error: {e}")
+    out = batch_codec.response_format(request.headers.get("accept"), fmt)
+    headers = {"X-Model-Version": active.version, "X-Rejected": str(chunk.rejected)}
+    if out == batch_codec.BINARY_MEDIA_TYPE:
+        return Response(batch_codec.encode_binary(preds), media_type=out, headers=headers)
+    if out == batch_codec.ARROW_MEDIA_TYPE:
+        return Response(batch_codec.encode_arrow(preds), media_type=out, headers=headers)
+    return {"count": len(preds), "predictions": batch_codec.json_predictions(preds), "model_version": active.version, **chunk.summary()}
+
+def _stream_csv_predictions(first, chunks: Iterator, fmt: str, store: bool, active: serving.ActiveModel) -> Iterator[str]:
+    if fmt == "csv":
+        yield "row,prediction,record_id,errors\n" if store else "row,prediction,errors\n"
+    # the request-scoped session is not guaranteed to outlive the endpoint, so own one here
+    db = SessionLocal() if store else None
+    try:
+        offset = 0
+        chunk = first
+        while chunk is not None:
+            preds, ids = serving.score_chunk(chunk, lambda X: serving.predict_rows(X, active), db)
+            yield serving.csv_result_lines(chunk, offset, preds, ids, fmt)
+            offset += len(preds)
+            chunk = next(chunks, None)
+    finally:
+        if db is not None:
+            db.close()
+
+
+@app.post("/predict/csv/stream")
+def predict_from_csv_stream(
+    file: UploadFile = File(...),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    chunksize: int = Query(DEFAULT_CHUNK_ROWS, gt=0, le=1_000_000),
+    store: bool = Query(False, description="persist rows and predictions to patient_records"),
+):
+    """Score a CSV of any size chunk by chunk and stream the predictions back as NDJSON or CSV.
+
+    Rows failing validation get a null prediction and their errors instead of being scored.
+    """
+    active = _require_model("model not loaded")
+
+    if not file.filename.lower().endswith('.csv'):
+        raise HTTPException(status_code=400, detail="File must be a CSV")
+
+    chunks = iter_validated_chunks(file.file, chunksize=chunksize, with_outcome=store)
+    try:
+        # pull the first chunk eagerly so header errors still become a 400
+        first = next(chunks, None)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"CSV processing error: {e}")
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _stream_csv_predictions(first, chunks, format, store, active),
+        media_type=media_type,
+        headers={"X-Model-Version": active.version},
+    )
+
+def _predict_pdf_text(text: str, active: serving.ActiveModel, proba: bool = False, explain: bool = False) -> dict:
+    """Features and prediction for extracted report text; ValueError carries the client message."""
+    if text:
+        # show first 200 characters of extracted text
+        print(f"PDF Text Preview: {text[:200]}...")
+
+    feats = report_features(text)
+    # Make prediction
+    input_row = [
+        feats["pregnancies"],
+        feats["glucose"],
+        feats["blood_pressure"],
+        feats["skin_thickness"],
+        feats["insulin"],
+        feats["bmi"],
+        feats["diabetes_pedigree_function"],
+        feats["age"],
+    ]
+    extra = {}
+    if proba or explain:
+        pred, extra = serving.explain_one(input_row, active, proba=True, explain=explain)
+    else:
+        pred = serving.predict_one(input_row, active)
+    return {
+        "prediction": pred,
+        "features": feats,
+        "extracted_text_length": len(text),
+        "model_version": active.version,
+        "message": "PDF processed successfully",
+        **extra,
+    }
+
 @app.post("/predict/pdf")
-def predict_from_pdf(file: UploadFile = File(...)):
-    if model is None:
-        raise HTTPException(status_code=500, detail="Model not loaded.")
+async def predict_from_pdf(file: UploadFile = File(...), proba: bool = PROBA_QUERY, explain: bool = EXPLAIN_QUERY):
+    active = _require_model("Model not loaded.")
     
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="File must be a PDF")
     
-    temp_file = None
     try:
-        # create temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        temp_file.write(file.file.read())
-        temp_file.close()
-        
-        # extract text from PDF
-        text = extract_text_from_pdf(temp_file.name)
-        if not text or len(text.strip()) < 10:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"PDF appears to be empty or unreadable. Extracted text length: {len(text) if text else 0} characters"
-            )
-        
-        # show first 200 characters of extracted text
-        print(f"PDF Text Preview: {text[:200]}...")
-        
-        feats, missing_features = extract_pdf_features(text)
-        if not feats:
-            raise HTTPException(
-                status_code=400, 
-                detail="could not extract any features from PDF. Ensure the PDF contains text with values like: Pregnancies: 1, Glucose: 120, BloodPressure: 70, etc."
-            )
-        
-        if missing_features:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Missing required features: {missing_features}. Found: {list(feats.keys())}. Please ensure all 8 features are present in the PDF."
-            )
-        # Make prediction
-        input_row = [[
-            feats["pregnancies"],
-            feats["glucose"],
-            feats["blood_pressure"],
-            feats["skin_thickness"],
-            feats["insulin"],
-            feats["bmi"],
-            feats["diabetes_pedigree_function"],
-            feats["age"],
-        ]]
-        pred = int(model.predict(np.array(input_row))[0])
-        return {
-            "prediction": pred,
-            "features": feats,
-            "extracted_text_length": len(text),
-            "message": "PDF processed successfully"
-        }
-        
-    except HTTPException:
-        raise
+        # extract text in the pdf process pool, straight from the upload bytes; the event
+        # loop awaits the pool, so no threadpool thread is held while pypdf runs
+        with metrics.span("pdf.read_upload"):
+            data = await file.read()
+        text = await extract_pdf_text(data)
+        return await run_in_threadpool(_predict_pdf_text, text, active, proba, explain)
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"PDF processing error: {str(e)}")
-    finally:
-        if temp_file and os.path.exists(temp_file.name):
+
+def _stream_pdf_predictions(documents: dict, active: serving.ActiveModel) -> Iterator[str]:
+    for name, text, error in iter_pdf_texts(documents):
+        result = {"filename": name}
+        if error is None:
             try:
-                os.unlink(temp_file.name)
-            except:
-                pass
+                result.update(_predict_pdf_text(text, active))
+            except Exception as e:
+                error = e
+        if error is not None:
+            result["error"] = str(error) or type(error).__name__
+        yield json.dumps(result) + "\n"
+
+@app.post("/predict/pdf/batch")
+def predict_from_pdf_batch(files: List[UploadFile] = File(...)):
+    """Score many PDFs in one request; one NDJSON line per file, in completion order."""
+    active = _require_model("Model not loaded.")
+
+    not_pdf = [f.filename for f in files if not f.filename.lower().endswith('.pdf')]
+    if not_pdf:
+        raise HTTPException(status_code=400, detail=f"Files must be PDFs: {not_pdf}")
+
+    documents = {}
+    for i, f in enumerate(files):
+        name = f.filename if f.filename not in documents else f"{f.filename}#{i}"
+        documents[name] = f.file.read()
+    return StreamingResponse(
+        _stream_pdf_predictions(documents, active),
+        media_type="application/x-ndjson",
+        headers={"X-Model-Version": active.version},
+    )
+
+def _job_accepted(job_id: str) -> dict:
+    status = jobs.get_job(job_id)
+    status["status_url"] = f"/jobs/{job_id}"
+    status["events_url"] = f"/jobs/{job_id}/events"
+    status["result_url"] = f"/jobs/{job_id}/result"
+    return status
+
+@app.post("/jobs/csv", status_code=202)
+def submit_csv_job(
+    file: UploadFile = File(...),
+    store: bool = Query(False, description="persist rows and predictions to patient_records"),
+):
+    """Queue a CSV of any size for background scoring; poll /jobs/{job_id} for progress."""
+    active = _require_model("model not loaded")
+    if not file.filename.lower().endswith('.csv'):
+        raise HTTPException(status_code=400, detail="File must be a CSV")
+    try:
+        job_id = jobs.submit_csv_job(file.file, store=store, model_version=active.version)
+    except jobs.QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return _job_accepted(job_id)
+
+@app.post("/jobs/pdf", status_code=202)
+def submit_pdf_job(files: List[UploadFile] = File(...)):
+    """Queue one or more PDF reports for background scoring; one result line per file."""
+    active = _require_model("Model not loaded.")
+    not_pdf = [f.filename for f in files if not f.filename.lower().endswith('.pdf')]
+    if not_pdf:
+        raise HTTPException(status_code=400, detail=f"Files must be PDFs: {not_pdf}")
+    try:
+        job_id = jobs.submit_pdf_job([(f.filename, f.file) for f in files], model_version=active.version)
+    except jobs.QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return _job_accepted(job_id)
+
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    status = jobs.get_job(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return status
+
+async def _job_events(job_id: str, interval: float) -> AsyncIterator[str]:
+    last = None
+    while True:
+        status = await run_in_threadpool(jobs.get_job, job_id)
+        if status != last:
+            yield f"event: progress\ndata: {json.dumps(status)}\n\n"
+            last = status
+        if status["status"] in jobs.TERMINAL_STATUSES:
+            return
+        await asyncio.sleep(interval)
+
+@app.get("/jobs/{job_id}/events")
+def stream_job_events(job_id: str, interval: float = Query(0.5, gt=0, le=30)):
+    """Server-sent events with the job status each time it changes, until the job finishes."""
+    if jobs.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return StreamingResponse(_job_events(job_id, interval), media_type="text/event-stream")
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    """NDJSON results of a finished job, in input order."""
+    status = jobs.get_job(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if status["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {status['status']}" + (f": {status['error']}" if status["error"] else ""))
+    return FileResponse(
+        jobs.result_path(job_id),
+        media_type="application/x-ndjson",
+        filename=f"{job_id}.ndjson",
+        headers={"X-Model-Version": status["model_version"] or ""},
+    )
 
 @app.get("/records")
-def list_recent_records(db:Session = Depends(get_db)):
-    items=crud.list_records(db)
-    return[
-        {
-            "id": r.id,
-            "pregnancies": r.pregnancies,
-            "glucose": r.glucose,
-            "blood_pressure": r.blood_pressure,
-            "skin_thickness": r.skin_thickness,
-            "insulin": r.insulin,
-            "bmi": r.bmi,
-            "diabetes_pedigree_function": r.diabetes_pedigree_function,
-            "age": r.age,
-            "outcome": r.outcome,
-            "predicted": r.predicted,
-            "created_at": r.created_at.isoformat() if r.created_at else None,
-        }
-        for r in items
-    ]
+def list_recent_records(
+    response:Response,
+    limit:int=Query(50, ge=1, le=10_000),
+    cursor:Optional[int]=Query(None, description="return records with id < cursor (X-Next-Cursor of the previous page)"),
+    predicted:Optional[int]=None,
+    outcome:Optional[int]=None,
+    min_age:Optional[int]=Query(None, ge=0),
+    max_age:Optional[int]=Query(None, ge=0),
+    created_from:Optional[datetime]=None,
+    created_to:Optional[datetime]=None,
+    fields:Optional[str]=Query(None, description="comma separated columns to return"),
+    db:Session = Depends(get_db),
+):
+    columns=[f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        items=crud.list_records(
+            db,
+            limit=limit,
+            before_id=cursor,
+            predicted=predicted,
+            outcome=outcome,
+            min_age=min_age,
+            max_age=max_age,
+            created_from=created_from,
+            created_to=created_to,
+            columns=columns,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(items)==limit:
+        response.headers["X-Next-Cursor"]=str(items[-1]["id"])
+    for item in items:
+        if item.get("created_at") is not None:
+            item["created_at"]=item["created_at"].isoformat()
+    return items
+
+
+def _export_stream(fmt: str, created_from: Optional[datetime], created_to: Optional[datetime], chunk_rows: int) -> Iterator[bytes]:
+    # the session lives as long as the response body, not the request handler
+    with SessionLocal() as db:
+        yield from export.stream_records(db, fmt, created_from, created_to, chunk_rows)
+
+@app.get("/records/export")
+def export_records(
+    format:str=Query("parquet", pattern="^(parquet|arrow)$"),
+    created_from:Optional[datetime]=Query(None, description="UTC, inclusive"),
+    created_to:Optional[datetime]=Query(None, description="UTC, exclusive"),
+    chunk_rows:int=Query(export.EXPORT_CHUNK_ROWS, ge=1_000, le=1_000_000),
+):
+    """Stream every matching record as zstd Parquet or an Arrow IPC stream, oldest first.
+
+    Months already archived by the compaction job are not included; /records/partitions
+    lists their Parquet files.
+    """
+    suffix = "parquet" if format == "parquet" else "arrows"
+    return StreamingResponse(
+        _export_stream(format, created_from, created_to, chunk_rows),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="patient_records.{suffix}"'},
+    )
+
+
+@app.get("/records/partitions")
+def list_record_partitions(db:Session=Depends(get_db)):
+    """The hot table and every month partition with its state, row count, id range and archive file."""
+    return partitions.status(db)
+
+
+@app.get("/records/stats")
+def record_stats(
+    group_by:str=Query("day", pattern="^(day|age_band|none)$"),
+    day_from:Optional[date]=Query(None, description="first UTC day, inclusive"),
+    day_to:Optional[date]=Query(None, description="last UTC day, inclusive"),
+    min_age:Optional[int]=Query(None, ge=0, description="lowest age band that overlaps this age"),
+    max_age:Optional[int]=Query(None, ge=0),
+    db:Session=Depends(get_db),
+):
+    """Prediction rates, confusion counts and feature distributions per day, age band or overall.
+
+    Served from the record_rollups table, so the cost grows with the number of buckets, not records.
+    """
+    return rollups.stats(
+        db,
+        group_by=group_by,
+        day_from=day_from,
+        day_to=day_to,
+        min_age_band=int(rollups.age_band(min_age)) if min_age is not None else None,
+        max_age_band=int(rollups.age_band(max_age)) if max_age is not None else None,
+    )
+
+
+@app.get("/models")
+def list_models():
+    active = serving.current()
+    return {
+        "active": active.version if active else None,
+        "current": serving.registry.current_version(),
+        "versions": [serving.registry.meta(v) for v in serving.registry.versions()],
+    }
+
+
+@app.post("/models/reload", status_code=202)
+def reload_model(version: Optional[str] = None):
+    """Load `version` (default: the registry CURRENT pointer) in the background and swap it in.
+
+    With an explicit version the CURRENT pointer is moved as well, so the file watchers of
+    every other worker process pick up the same version.
+    """
+    if version is not None:
+        try:
+            serving.registry.activate(version)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    serving.reload_in_background(version)
+    active = serving.current()
+    return {"status": "loading", "requested": version or serving.registry.current_version(), "active": active.version if active else None}
+
+
+@app.get("/stats")
+def service_stats():
+    active = serving.current()
+    return {
+        "model_version": active.version if active else None,
+        "batcher": serving.batcher.stats(),
+        "prediction_cache": serving.prediction_cache.stats(),
+        "chat_cache": answer_cache.stats(),
+        "write_buffer": crud.write_buffer.stats() if crud.write_buffer is not None else None,
+    }
+
+
+@app.get("/drift")
+def drift_report():
+    """PSI and binned KS per feature, and the prediction rate, of traffic scored by this
+    process since the model (and so the baseline) last changed."""
+    return drift.monitor.report()
+
+
+@app.post("/drift/reset")
+def reset_drift():
+    """Restart the live histograms, e.g. after a known change in the population."""
+    drift.monitor.reset()
+    return drift.monitor.report()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage and request latency histograms plus batcher and cache counters, Prometheus text format."""
+    lines = metrics.render_family(metrics.STAGE_SECONDS) + metrics.render_family(metrics.REQUEST_SECONDS)
+    lines += metrics.render_histogram(
+        "diabetes_batcher_batch_size", "Rows per micro-batched model call.", [((), (), serving.batcher.batch_size_hist)]
+    )
+    lines += metrics.render_histogram(
+        "diabetes_batcher_queue_wait_ms", "Time a row waited for its batch, in milliseconds.",
+        [((), (), serving.batcher.queue_wait_hist)],
+    )
+    lines += metrics.render_gauges(
+        "diabetes_batcher_queue_depth", "Rows waiting for the batcher.", "gauge", {(): serving.batcher.stats()["queue_depth"]}
+    )
+    caches = {"prediction": serving.prediction_cache.stats(), "chat": answer_cache.stats()}
+    for field, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("expirations", "counter"), ("size", "gauge")):
+        suffix = "_total" if kind == "counter" else ""
+        lines += metrics.render_gauges(
+            f"diabetes_cache_{field}{suffix}", f"Cache {field}.", kind,
+            {(("cache", name),): stats[field] for name, stats in caches.items()},
+        )
+    report = drift.monitor.report()
+    lines += metrics.render_gauges(
+        "diabetes_drift_psi", "Population stability index of live traffic vs the training baseline.", "gauge",
+        {(("feature", name),): f["psi"] for name, f in report["features"].items() if f["psi"] is not None},
+    )
+    lines += metrics.render_gauges("diabetes_drift_rows", "Rows observed by the drift monitor.", "gauge", {(): report["rows"]})
+    if report.get("prediction_rate", {}).get("live") is not None:
+        lines += metrics.render_gauges(
+            "diabetes_prediction_rate", "Share of positive predictions, live and at training time.", "gauge",
+            {(("source", k),): v for k, v in report["prediction_rate"].items() if k in ("live", "baseline") and v is not None},
+        )
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
 
 
 @app.post("/chat")
-def chat(req:ChatRequest):
-    answer=get_chat_response(req.question)
+async def chat(req:ChatRequest):
+    with metrics.span("chat.answer"):
+        answer=await aget_chat_response(req.question)
     return {"answer": answer}
\ No newline at end of file
@@ -0,0 +1,139 @@
+import functools
+import threading
+import time
+from typing import Dict, List, Sequence, Tuple
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram with cumulative (Prometheus style) counts."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets: List[float] = sorted(float(b) for b in buckets)
+        self._counts: List[int] = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        idx = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                idx = i
+                break
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative: Dict[str, int] = {}
+        running = 0
+        for bound, c in zip(self.buckets + [float("inf")], counts):
+            running += c
+            cumulative["+Inf" if bound == float("inf") else f"{bound:g}"] = running
+        return {
+            "buckets": cumulative,
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+        }
+
+
+# seconds; spans cover sub-millisecond cache hits up to multi-second batch uploads
+DURATION_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+
+class HistogramFamily:
+    """Histograms sharing a metric name, one per label-value combination."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.bucket_bounds = list(buckets)
+        self._children: Dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> Histogram:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, Histogram(self.bucket_bounds))
+        return child
+
+    def items(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+STAGE_SECONDS = HistogramFamily(
+    "diabetes_stage_duration_seconds", "Time spent in one processing stage.", ["stage"], DURATION_BUCKETS
+)
+REQUEST_SECONDS = HistogramFamily(
+    "diabetes_http_request_duration_seconds",
+    "Request latency until response headers are sent.",
+    ["method", "route", "status"],
+    DURATION_BUCKETS,
+)
+
+
+class span:
+    """Time a block (or a function, as a decorator) into the per-stage histogram."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._start = 0.0
+
+    def __enter__(self) -> "span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        STAGE_SECONDS.labels(self.stage).observe(time.perf_counter() - self._start)
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(self.stage):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_histogram(name: str, help_text: str, series: List[Tuple[Sequence[str], Sequence[str], Histogram]]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for label_names, label_values, hist in series:
+        snap = hist.snapshot()
+        for le, count in snap["buckets"].items():
+            le_label = 'le="%s"' % le
+            lines.append(f"{name}_bucket{_label_str(label_names, label_values, le_label)} {count}")
+        lines.append(f"{name}_sum{_label_str(label_names, label_values)} {snap['sum']}")
+        lines.append(f"{name}_count{_label_str(label_names, label_values)} {snap['count']}")
+    return lines
+
+
+def render_family(family: HistogramFamily) -> List[str]:
+    return render_histogram(
+        family.name, family.help, [(family.label_names, values, hist) for values, hist in family.items()]
+    )
+
+
+def render_gauges(name: str, help_text: str, kind: str, values: Dict[Tuple[Tuple[str, str], ...], float]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in values.items():
+        lines.append(f"{name}{_label_str([k for k, _ in labels], [v for _, v in labels])} {value}")
+    return lines
@@ -0,0 +1,106 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Optional, Tuple
+
+# opt-in: requests slower than PROFILE_SLOW_MS get a folded-stack profile in PROFILE_DIR
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# samples older than this are dropped; bounds memory to roughly window / interval * threads
+PROFILE_WINDOW_SECONDS = float(os.getenv("PROFILE_WINDOW_SECONDS", "60"))
+
+# frames at the top of a stack that mean the thread is parked, not working
+_IDLE_FUNCTIONS = {"wait", "select", "poll", "epoll", "_worker", "accept"}
+
+
+def _fold(frame, thread_name: str) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler(threading.Thread):
+    """Background sampler of every thread's Python stack via `sys._current_frames()`.
+
+    Samples are kept in a time-bounded ring buffer; `dump(start, end, path)` writes the
+    ones taken inside a request's time window as folded stacks
+    (`thread;file:func;... count`), the input format of flamegraph.pl and speedscope.
+    All threads are sampled because a sync endpoint runs on a threadpool thread, not the
+    one that measured the request; idle stacks are skipped.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, window: float = PROFILE_WINDOW_SECONDS):
+        super().__init__(name="sampling-profiler", daemon=True)
+        self.interval = max(0.001, interval_ms / 1000.0)
+        self.window = window
+        self._samples: Deque[Tuple[float, str]] = deque()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks = [
+                _fold(frame, names.get(ident, str(ident)))
+                for ident, frame in sys._current_frames().items()
+                if ident != own_id and frame.f_code.co_name not in _IDLE_FUNCTIONS
+            ]
+            with self._lock:
+                self._samples.extend((now, s) for s in stacks)
+                while self._samples and self._samples[0][0] < now - self.window:
+                    self._samples.popleft()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def dump(self, start: float, end: float, path: str) -> int:
+        """Write samples taken in [start, end] (perf_counter time); returns the sample count."""
+        with self._lock:
+            counts = Counter(stack for t, stack in self._samples if start <= t <= end)
+        if not counts:
+            return 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            for stack, n in counts.most_common():
+                f.write(f"{stack} {n}\n")
+        return sum(counts.values())
+
+
+_profiler: Optional[SamplingProfiler] = None
+
+
+def start_profiler() -> Optional[SamplingProfiler]:
+    """Start the process-wide sampler when PROFILE_SLOW_MS is set; None otherwise."""
+    global _profiler
+    if PROFILE_SLOW_MS <= 0:
+        return None
+    if _profiler is None or not _profiler.is_alive():
+        _profiler = SamplingProfiler()
+        _profiler.start()
+    return _profiler
+
+
+def stop_profiler() -> None:
+    global _profiler
+    if _profiler is not None:
+        _profiler.stop()
+        _profiler = None
+
+
+def maybe_dump_slow_request(start: float, end: float, label: str) -> Optional[str]:
+    """Dump a flame profile for a request that took longer than PROFILE_SLOW_MS."""
+    elapsed_ms = (end - start) * 1000.0
+    if _profiler is None or elapsed_ms < PROFILE_SLOW_MS:
+        return None
+    safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_")
+    path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}-{elapsed_ms:.0f}ms.folded")
+    return path if _profiler.dump(start, end, path) else None
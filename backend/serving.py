@@ -0,0 +1,292 @@
+import json
+import os
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from data.csv_pipeline import EXPECTED_FEATURES, OUTCOME_COLUMN, ValidatedChunk, validate_matrix
+from models import crud
+from models.forest import CompiledForest
+from models.registry import ModelRegistry
+from .batcher import MicroBatcher
+from . import drift
+from .cache import TTLCache, feature_key
+from .metrics import span
+
+
+class ActiveModel(NamedTuple):
+    forest: CompiledForest
+    version: str
+
+
+registry = ModelRegistry()
+# arrays are memory-mapped so uvicorn workers serving the same version share pages
+MODEL_MMAP_MODE = os.getenv("MODEL_MMAP_MODE", "r") or None
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "5"))
+
+# predictions keyed on (model version, canonical feature tuple)
+prediction_cache = TTLCache(
+    maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PREDICTION_CACHE_TTL", "3600")),
+)
+
+# the whole model is swapped by rebinding this one reference, so a request that reads it
+# once always sees a consistent (forest, version) pair
+_active: Optional[ActiveModel] = None
+_load_lock = threading.Lock()
+
+
+def current() -> Optional[ActiveModel]:
+    return _active
+
+
+def set_model(forest: CompiledForest, version: str) -> ActiveModel:
+    """Make `forest` the active model and drop predictions cached for the previous one."""
+    global _active
+    _active = ActiveModel(forest, version)
+    prediction_cache.clear()
+    _set_drift_baseline(version)
+    return _active
+
+
+def _set_drift_baseline(version: str) -> None:
+    baseline = registry.baseline(version)
+    if baseline is None:
+        try:
+            baseline = drift.baseline_from_csv()
+        except (OSError, ValueError) as e:
+            print(f"No drift baseline for model {version}: {e}")
+    drift.monitor.set_baseline(baseline, version)
+
+
+def load_active(version: Optional[str] = None) -> ActiveModel:
+    """Load a registry version (default: CURRENT) and swap it in once fully loaded."""
+    with _load_lock:
+        loaded_version, forest = registry.load(version, mmap_mode=MODEL_MMAP_MODE)
+        if _active is not None and _active.version == loaded_version:
+            return _active
+        return set_model(forest, loaded_version)
+
+
+def reload_in_background(version: Optional[str] = None) -> threading.Thread:
+    def run() -> None:
+        try:
+            active = load_active(version)
+            print(f"Model version {active.version} is active")
+        except Exception as e:
+            print(f"Model reload failed: {e}")
+
+    thread = threading.Thread(target=run, name="model-reload", daemon=True)
+    thread.start()
+    return thread
+
+
+class ModelWatcher(threading.Thread):
+    """Poll the registry CURRENT pointer and hot-swap the model when it changes."""
+
+    def __init__(self, interval: float = MODEL_WATCH_INTERVAL):
+        super().__init__(name="model-watcher", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def _stamp(self):
+        try:
+            stat = os.stat(registry.current_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def run(self) -> None:
+        last = self._stamp()
+        while not self._stop_event.wait(self.interval):
+            stamp = self._stamp()
+            if stamp is None or stamp == last:
+                continue
+            last = stamp
+            try:
+                active = load_active()
+                print(f"Model version {active.version} is active")
+            except Exception as e:
+                print(f"Model reload failed: {e}")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+def _predict_queued(items: List[Tuple[ActiveModel, Sequence[float]]]) -> np.ndarray:
+    """Score each queued row with the model its request read, so a prediction is always cached
+    and reported under the version that made it; a batch spans two models only during a swap."""
+    groups: Dict[str, Tuple[ActiveModel, List[int]]] = {}
+    for i, (active, _) in enumerate(items):
+        groups.setdefault(active.version, (active, []))[1].append(i)
+    preds = np.empty(len(items), dtype=np.int64)
+    for active, index in groups.values():
+        preds[index] = active.forest.predict(np.array([items[i][1] for i in index], dtype=np.float64))
+    return preds
+
+
+# coalesce concurrent /predict calls into one model.predict per batch (and model)
+batcher = MicroBatcher(
+    _predict_queued,
+    max_batch_size=int(os.getenv("PREDICT_MAX_BATCH_SIZE", "64")),
+    max_wait_ms=float(os.getenv("PREDICT_MAX_WAIT_MS", "2")),
+    collate=list,
+)
+
+
+def warm_up(active: ActiveModel) -> None:
+    """Run dummy predictions through the batcher and the batch path so the first request
+    does not pay for thread start-up or first-touch page faults of the model arrays."""
+    row = [0.0] * len(crud.FEATURE_COLUMNS)
+    batcher.predict((active, row))
+    predict_rows(np.zeros((2, len(row))), active, observe=False)
+
+
+@span("model.predict_one")
+def predict_one(row, active: ActiveModel) -> int:
+    """Single-row prediction through the result cache and the micro-batcher."""
+    key = (active.version, feature_key(row))
+    prediction = prediction_cache.get(key)
+    if prediction is None:
+        prediction = int(batcher.predict((active, row)))
+        prediction_cache.put(key, prediction)
+    drift.monitor.observe_row(row, prediction)
+    return prediction
+
+
+@span("model.predict_rows")
+def predict_rows(X: np.ndarray, active: ActiveModel, observe: bool = True) -> np.ndarray:
+    """Batch prediction that scores each distinct feature row only once; `observe` feeds the drift monitor."""
+    X = np.asarray(X, dtype=np.float64)
+    if len(X) < 2:
+        preds = active.forest.predict(X)
+    else:
+        unique, inverse = np.unique(X, axis=0, return_inverse=True)
+        preds = active.forest.predict(unique)[inverse.reshape(-1)]
+    if observe:
+        drift.monitor.observe(X, preds)
+    return preds
+
+
+class Scores(NamedTuple):
+    predictions: np.ndarray
+    # P(diabetes) per row, when asked for
+    probability: Optional[np.ndarray] = None
+    # (n, 8) per-feature contributions to the probability, in EXPECTED_FEATURES order
+    contributions: Optional[np.ndarray] = None
+    # probability before any feature is looked at: the forest's base rate
+    bias: Optional[float] = None
+
+
+@span("model.score_rows")
+def score_rows(X: np.ndarray, active: ActiveModel, proba: bool = False, explain: bool = False) -> Scores:
+    """Predictions plus, on request, probabilities and feature contributions, for every row in
+    one vectorized pass; identical feature rows are scored once."""
+    if not proba and not explain:
+        return Scores(predict_rows(X, active))
+    X = np.asarray(X, dtype=np.float64)
+    forest = active.forest
+    unique, inverse = (X, None) if len(X) < 2 else np.unique(X, axis=0, return_inverse=True)
+    if explain:
+        probabilities, bias, contributions = forest.explain(unique)
+    else:
+        probabilities, bias, contributions = forest.predict_proba(unique), None, None
+    predictions = forest.classes_.take(np.argmax(probabilities, axis=1))
+    probability = probabilities[:, forest.positive_index()]
+    if inverse is not None:
+        inverse = inverse.reshape(-1)
+        predictions, probability = predictions[inverse], probability[inverse]
+        contributions = contributions[inverse] if contributions is not None else None
+    drift.monitor.observe(X, predictions)
+    return Scores(predictions, probability, contributions, bias)
+
+
+def explanation_fields(scores: Optional[Scores], valid: np.ndarray, explain: bool = False, decimals: int = 6) -> dict:
+    """`probabilities` (and with `explain` the contributions) lined up with the input rows;
+    rows that were not scored, or all rows when nothing was (`scores` None), get None."""
+    if scores is None:
+        scores = Scores(np.empty(0), np.empty(0), np.empty((0, len(EXPECTED_FEATURES))) if explain else None)
+    fields = {"probabilities": _spread(np.round(scores.probability, decimals).tolist(), valid)}
+    if explain:
+        fields["bias"] = round(scores.bias, decimals) if scores.bias is not None else None
+        fields["contribution_features"] = list(EXPECTED_FEATURES)
+        fields["contributions"] = _spread(np.round(scores.contributions, decimals).tolist(), valid)
+    return fields
+
+
+def explain_one(row, active: ActiveModel, proba: bool = False, explain: bool = False) -> Tuple[int, dict]:
+    """Prediction and response fields for one row; contributions are keyed by input field name.
+
+    Bypasses the prediction cache and micro-batcher, which only carry the hard 0/1.
+    """
+    scores = score_rows(np.asarray([row], dtype=np.float64), active, proba=proba, explain=explain)
+    fields = {}
+    if scores.probability is not None:
+        fields["probability"] = round(float(scores.probability[0]), 6)
+    if scores.contributions is not None:
+        fields["bias"] = round(scores.bias, 6)
+        fields["contributions"] = {
+            name: round(float(value), 6) for name, value in zip(crud.FEATURE_COLUMNS, scores.contributions[0])
+        }
+    return int(scores.predictions[0]), fields
+
+
+def _spread(values: list, valid: np.ndarray) -> list:
+    it = iter(values)
+    return [next(it) if ok else None for ok in valid.tolist()]
+
+
+def score_chunk(
+    chunk: ValidatedChunk, predict: Callable[[np.ndarray], np.ndarray], db=None, commit: bool = True
+) -> Tuple[List[Optional[int]], Optional[List[Optional[int]]]]:
+    """Predictions for a validated CSV chunk (None for rejected rows) and, given `db`, the
+    record ids of the stored rows. Only valid rows are scored and stored; with `commit=False`
+    the inserts are left in the caller's transaction."""
+    valid = chunk.valid
+    X = chunk.features[EXPECTED_FEATURES].to_numpy()[valid]
+    scored = np.full(len(valid), -1, dtype=np.int64)
+    if len(X):
+        scored[valid] = predict(X)
+    mask = valid.tolist()
+    preds = [p if ok else None for p, ok in zip(scored.tolist(), mask)]
+    if db is None:
+        return preds, None
+    outcome = chunk.features[OUTCOME_COLUMN].to_numpy()[valid] if OUTCOME_COLUMN in chunk.features.columns else None
+    stored = iter(crud.create_records_bulk(db, X, scored[valid], outcome=outcome, commit=commit))
+    return preds, [next(stored) if ok else None for ok in mask]
+
+
+@span("model.score_matrix")
+def score_matrix(X: np.ndarray, active: ActiveModel) -> Tuple[np.ndarray, ValidatedChunk]:
+    """int8 predictions for a decoded (n, 8) batch, -1 for rows failing validation."""
+    X = np.asarray(X, dtype=np.float64)
+    valid, errors = validate_matrix(X)
+    preds = np.full(len(X), -1, dtype=np.int8)
+    if valid.any():
+        preds[valid] = predict_rows(X if valid.all() else X[valid], active)
+    return preds, ValidatedChunk(X, valid, errors)
+
+
+def csv_result_lines(
+    chunk: ValidatedChunk, offset: int, preds: List[Optional[int]], ids: Optional[List[Optional[int]]], fmt: str = "ndjson"
+) -> str:
+    """NDJSON (or CSV) result lines of a scored chunk; rejected rows carry their errors."""
+    errors = chunk.row_errors(offset)
+    lines = []
+    for k, p in enumerate(preds):
+        i = offset + k
+        if fmt == "csv":
+            cells = [i, "" if p is None else p]
+            if ids is not None:
+                cells.append("" if ids[k] is None else ids[k])
+            cells.append('"%s"' % "; ".join(errors[i]) if i in errors else "")
+            lines.append(",".join(str(c) for c in cells) + "\n")
+            continue
+        item = {"row": i, "prediction": p}
+        if ids is not None:
+            item["record_id"] = ids[k]
+        if i in errors:
+            item["errors"] = errors[i]
+        lines.append(json.dumps(item) + "\n")
+    return "".join(lines)
@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+# wall-clock budget for the whole startup (imports + warm-up); exceeding it is only reported
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "5"))
+
+
+class StartupState:
+    """Timed startup phases and the readiness flag behind /ready."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.ready = threading.Event()
+        self.warming = threading.Event()
+        # perf_counter marks of the start of startup and of the end of warm-up; phases run
+        # in parallel, so the total is the wall-clock time between them, not their sum
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def begin(self, elapsed: float = 0.0) -> None:
+        """Start the wall clock, counting `elapsed` seconds already spent (the imports)."""
+        self.started = time.perf_counter() - elapsed
+        self.finished = None
+
+    def finish(self) -> None:
+        self.finished = time.perf_counter()
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[name] = seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            with self._lock:
+                self.errors[name] = str(e) or type(e).__name__
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def report(self) -> dict:
+        with self._lock:
+            phases = {name: round(seconds * 1000.0, 1) for name, seconds in self.phases.items()}
+            errors = dict(self.errors)
+        total_ms = None
+        if self.started is not None:
+            end = self.finished if self.finished is not None else time.perf_counter()
+            total_ms = round((end - self.started) * 1000.0, 1)
+        return {
+            "ready": self.ready.is_set(),
+            "warming": self.warming.is_set(),
+            "phases_ms": phases,
+            # still counting while warming up
+            "total_ms": total_ms,
+            "budget_ms": STARTUP_BUDGET_SECONDS * 1000.0,
+            "errors": errors,
+        }
+
+    def summary(self) -> str:
+        report = self.report()
+        total = report["total_ms"]
+        over = " (over budget)" if total is not None and total > report["budget_ms"] else ""
+        parts = ", ".join(f"{name} {ms:.0f}ms" for name, ms in report["phases_ms"].items())
+        return f"Startup {'?' if total is None else f'{total:.0f}'}ms{over}: {parts}"
+
+
+state = StartupState()
+
+
+def wait_ready(timeout: Optional[float] = None) -> bool:
+    return state.ready.wait(timeout)
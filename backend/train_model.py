@@ -1,16 +1,157 @@
+"""Train the diabetes forest and publish it to the model registry.
+
+    python -m backend.train_model [--n-jobs -1] [--include-records] [--warm-start --extra-trees 20]
+
+With --warm-start --include-records the run is incremental: only records added since the
+base version was trained (its `records_max_id`) are read, and the new trees are fitted on
+the training CSV plus those records. Stages are timed and their peak traced memory is reported at the end. The parsed
+training CSV is cached as per-column .npy arrays keyed on the file's content hash,
+so unchanged data is not re-parsed on the next run.
+"""
+import argparse
+import hashlib
+import os
+import resource
+import shutil
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import joblib
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
-import joblib
-import os
 
-df = pd.read_csv("./data/diabetes.csv")
+from backend.drift import build_baseline
+from data.csv_pipeline import EXPECTED_FEATURES, OUTCOME_COLUMN
+from models import crud
+from models.db import SessionLocal
+from models.registry import SKLEARN_FILE, ModelRegistry
+
+CACHE_DIR = os.path.join("data", ".cache")
+
+
+@contextmanager
+def stage(name: str, report: List[Tuple[str, float, int]]):
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    yield
+    _, peak = tracemalloc.get_traced_memory()
+    report.append((name, time.perf_counter() - start, peak))
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_training_csv(path: str, use_cache: bool = True) -> Tuple[pd.DataFrame, np.ndarray, bool]:
+    """Training matrix from `path`, read from the columnar cache when the content is unchanged."""
+    cache_dir = os.path.join(CACHE_DIR, f"train-{file_sha256(path)[:16]}")
+    columns = EXPECTED_FEATURES + [OUTCOME_COLUMN]
+    if use_cache and all(os.path.exists(os.path.join(cache_dir, f"{c}.npy")) for c in columns):
+        data = {c: np.load(os.path.join(cache_dir, f"{c}.npy")) for c in columns}
+        return pd.DataFrame({c: data[c] for c in EXPECTED_FEATURES}), data[OUTCOME_COLUMN], True
+
+    df = pd.read_csv(path)
+    X = df[EXPECTED_FEATURES]
+    y = df[OUTCOME_COLUMN].to_numpy()
+    if use_cache:
+        tmp_dir = cache_dir + f".tmp-{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        for c in EXPECTED_FEATURES:
+            np.save(os.path.join(tmp_dir, f"{c}.npy"), X[c].to_numpy())
+        np.save(os.path.join(tmp_dir, f"{OUTCOME_COLUMN}.npy"), y)
+        try:
+            os.rename(tmp_dir, cache_dir)
+        except OSError:
+            # another run cached the same content first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return X, y, False
+
+
+def load_labeled_records(after_id: Optional[int] = None) -> Tuple[pd.DataFrame, np.ndarray, Optional[int]]:
+    """Labeled patient_records rows, only those with an id above `after_id` when given."""
+    db = SessionLocal()
+    try:
+        features, outcome, max_id = crud.labeled_feature_matrix(db, after_id)
+    finally:
+        db.close()
+    return pd.DataFrame(features, columns=EXPECTED_FEATURES), outcome, max_id
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=os.path.join("data", "diabetes.csv"))
+    parser.add_argument("--n-jobs", type=int, default=-1, help="cores used to fit trees (-1: all)")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--include-records", action="store_true",
+                        help="add patient_records rows whose outcome is set to the training data")
+    parser.add_argument("--warm-start", action="store_true",
+                        help="grow --extra-trees new trees onto the current registry model instead of refitting")
+    parser.add_argument("--extra-trees", type=int, default=20)
+    parser.add_argument("--no-cache", action="store_true", help="always re-parse the training CSV")
+    parser.add_argument("--no-activate", action="store_true", help="publish without moving the CURRENT pointer")
+    args = parser.parse_args()
+
+    report: List[Tuple[str, float, int]] = []
+    meta = {}
+    tracemalloc.start()
+
+    with stage("load csv", report):
+        X, y, cache_hit = load_training_csv(args.csv, use_cache=not args.no_cache)
+    meta["csv_rows"] = len(X)
+    print(f"{len(X)} rows from {args.csv} ({'cache hit' if cache_hit else 'parsed'})")
+
+    registry = ModelRegistry()
+    base_version = registry.current_version() if args.warm_start else None
+    if args.warm_start and base_version is None:
+        parser.error("--warm-start needs a current model in the registry")
+    # records the base version's trees have already seen
+    seen_id = registry.meta(base_version).get("records_max_id") if base_version else None
+
+    if args.include_records:
+        with stage("load records", report):
+            rec_X, rec_y, max_id = load_labeled_records(after_id=seen_id)
+            X = pd.concat([X, rec_X], ignore_index=True)
+            y = np.concatenate([y, rec_y])
+        meta.update(record_rows=len(rec_X), records_max_id=max_id if max_id is not None else seen_id)
+        print(f"{len(rec_X)} labeled rows from patient_records" + (f" after id {seen_id}" if seen_id is not None else ""))
+    elif seen_id is not None:
+        meta["records_max_id"] = seen_id
+
+    with stage("fit", report):
+        if args.warm_start:
+            model = joblib.load(os.path.join(registry.root, base_version, SKLEARN_FILE))
+            model.set_params(warm_start=True, n_jobs=args.n_jobs, verbose=0,
+                             n_estimators=len(model.estimators_) + args.extra_trees)
+            meta["warm_start_from"] = base_version
+        else:
+            model = RandomForestClassifier(n_estimators=args.n_estimators, n_jobs=args.n_jobs)
+        model.fit(X, y)
+    meta["n_estimators"] = len(model.estimators_)
+
+    # feature histograms and prediction rate of the training data, for /drift
+    with stage("drift baseline", report):
+        source = args.csv + (" + patient_records" if args.include_records else "")
+        rate = float(np.mean(model.predict(X) == 1))
+        baseline = build_baseline(np.asarray(X[EXPECTED_FEATURES], dtype=np.float64), rate, source=source)
+
+    # versioned artifacts (sklearn model + compiled forest); running APIs hot-swap to it
+    with stage("publish", report):
+        version = registry.publish(model, activate=not args.no_activate, meta=meta, baseline=baseline)
+    tracemalloc.stop()
 
-X = df.drop("Outcome", axis=1)
-y = df["Outcome"]
+    print(f"Model published as version {version} in {registry.root} ({meta['n_estimators']} trees)")
+    print(f"{'stage':<14} {'wall s':>8} {'peak traced MB':>15}")
+    for name, seconds, peak in report:
+        print(f"{name:<14} {seconds:>8.3f} {peak / 2**20:>15.1f}")
+    print(f"process peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
 
-model = RandomForestClassifier(verbose=True)
-model.fit(X, y)
 
-os.makedirs("models", exist_ok=True)
-joblib.dump(model, "models/model.joblib")
-print("Model saved as models/model.joblib")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
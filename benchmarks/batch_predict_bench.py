@@ -0,0 +1,93 @@
+"""Per-row /predict vs one /predict/batch call in each wire format.
+
+    python -m benchmarks.batch_predict_bench [--rows 100000] [--per-row 2000]
+
+Runs the app in-process with TestClient against a throwaway SQLite database (/predict
+stores every row). The per-row path is timed on `--per-row` requests and reported as
+rows/s; each batch format scores all `--rows` rows in one request, timed end to end
+including encoding on the client side and decoding of the response.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--per-row", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ.setdefault("CHAT_LLM", "stub")
+    os.environ.setdefault("MODEL_WATCH_INTERVAL", "0")
+    os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+
+    import pyarrow as pa
+    from fastapi.testclient import TestClient
+
+    from backend import batch_codec, startup
+    from backend.main import app
+    from benchmarks.synthetic import make_feature_matrix, make_patients
+    from data.csv_pipeline import EXPECTED_FEATURES
+
+    X = np.asarray(make_feature_matrix(args.rows, seed=0), dtype=np.float64)
+
+    def arrow_body(values: np.ndarray) -> bytes:
+        batch = pa.RecordBatch.from_arrays([pa.array(values[:, j]) for j in range(values.shape[1])], names=EXPECTED_FEATURES)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+
+    def read_binary(content: bytes) -> np.ndarray:
+        return batch_codec.decode_binary(content, cols=1)
+
+    def read_arrow(content: bytes) -> np.ndarray:
+        return pa.ipc.open_stream(content).read_all().column(0).to_numpy(zero_copy_only=False)
+
+    variants = {
+        "batch binary float32": (lambda: batch_codec.encode_binary(X.astype(np.float32)), batch_codec.BINARY_MEDIA_TYPE, read_binary),
+        "batch binary float64": (lambda: batch_codec.encode_binary(X), batch_codec.BINARY_MEDIA_TYPE, read_binary),
+        "batch arrow": (lambda: arrow_body(X), batch_codec.ARROW_MEDIA_TYPE, read_arrow),
+        "batch json": (lambda: json.dumps(X.tolist()).encode(), batch_codec.JSON_MEDIA_TYPE, lambda c: json.loads(c)["predictions"]),
+    }
+
+    results = []
+    with contextlib.redirect_stdout(sys.stderr), TestClient(app) as client:
+        startup.wait_ready(timeout=120)
+        rows = make_patients(args.per_row, seed=0)
+        start = time.perf_counter()
+        for row in rows:
+            client.post("/predict", json=row).raise_for_status()
+        elapsed = time.perf_counter() - start
+        results.append(("per-row /predict", len(rows), elapsed, None))
+
+        for name, (encode, content_type, read) in variants.items():
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                body = encode()
+                response = client.post("/predict/batch", content=body, headers={"content-type": content_type})
+                response.raise_for_status()
+                preds = read(response.content)
+                best = min(best, time.perf_counter() - start)
+            assert len(preds) == len(X)
+            results.append((name, len(X), best, len(body)))
+
+    print(f"{'path':<24} {'rows':>8} {'seconds':>9} {'rows/s':>12} {'request MB':>11}")
+    for name, n, seconds, size in results:
+        mb = f"{size / 1e6:>11.1f}" if size is not None else f"{'-':>11}"
+        print(f"{name:<24} {n:>8} {seconds:>9.3f} {n / seconds:>12,.0f} {mb}")
+
+
+if __name__ == "__main__":
+    main()
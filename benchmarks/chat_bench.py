@@ -0,0 +1,60 @@
+"""Offline throughput and cache hit-rate of the research chatbot with the stub LLM.
+
+    python -m benchmarks.chat_bench [--requests 500] [--concurrency 50] [--distinct 40]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("CHAT_LLM", "stub")
+
+from research import chatbot  # noqa: E402
+
+TOPICS = [
+    "insulin resistance", "HbA1c targets", "type 1 vs type 2 diabetes", "gestational diabetes",
+    "metformin", "GLP-1 agonists", "diabetic retinopathy", "low glycemic index diets",
+    "continuous glucose monitors", "prediabetes reversal",
+]
+
+
+def make_questions(n: int, distinct: int, seed: int = 0):
+    rng = random.Random(seed)
+    pool = [f"What does current research say about {TOPICS[i % len(TOPICS)]} (variant {i})?" for i in range(distinct)]
+    # skewed popularity and cosmetic variations, like real repeated questions
+    weights = [1.0 / (rank + 1) for rank in range(distinct)]
+    picks = rng.choices(pool, weights=weights, k=n)
+    return [q.upper() if rng.random() < 0.2 else q.rstrip("?") + " ?" if rng.random() < 0.2 else q for q in picks]
+
+
+async def run(questions, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(q):
+        async with sem:
+            await chatbot.aget_chat_response(q)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in questions))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--distinct", type=int, default=40)
+    args = parser.parse_args()
+
+    questions = make_questions(args.requests, args.distinct)
+    print(f"stub latency {chatbot.CHAT_STUB_LATENCY_MS:g} ms, {args.requests} requests, concurrency {args.concurrency}")
+    for label, maxsize in (("no cache", 0), ("cache", chatbot.answer_cache.maxsize or 1000)):
+        chatbot.answer_cache = chatbot.TTLCache(maxsize=maxsize, ttl=chatbot.answer_cache.ttl)
+        elapsed = asyncio.run(run(questions, args.concurrency))
+        stats = chatbot.answer_cache.stats()
+        print(f"{label:>9}: {args.requests / elapsed:8.1f} req/s  hit rate {stats['hit_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
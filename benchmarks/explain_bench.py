@@ -0,0 +1,75 @@
+"""Throughput of probabilities and per-feature contributions on a CSV-sized batch.
+
+    python -m benchmarks.explain_bench [--rows 100000] [--reference-rows 200]
+
+Times CompiledForest.predict_proba and the vectorized path decomposition
+(CompiledForest.explain) on `--rows` synthetic rows, checks that bias plus
+contributions adds up to the probability, and compares both against a per-row Python
+walk of every tree (the offline approach) on `--reference-rows` rows.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_feature_matrix
+from models.forest import CompiledForest
+from models.registry import ModelRegistry
+
+
+def reference_contributions(forest: CompiledForest, X: np.ndarray) -> np.ndarray:
+    """Per-row, per-tree Python walk; what the vectorized version replaces."""
+    X = forest._as_matrix(X)
+    k = forest.positive_index()
+    out = np.zeros(X.shape)
+    for i, x in enumerate(X):
+        for root in forest.roots:
+            node = int(root)
+            while forest.left[node] != node:
+                f = int(forest.feature[node])
+                child = int(forest.right[node] if x[f] > forest.threshold[node] else forest.left[node])
+                out[i, f] += forest.value[child, k] - forest.value[node, k]
+                node = child
+    return out / forest.n_trees
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--reference-rows", type=int, default=200)
+    parser.add_argument("--version", default=None, help="registry version (default: CURRENT, else the legacy model)")
+    args = parser.parse_args()
+
+    version, forest = ModelRegistry().load(args.version, mmap_mode=None)
+    X = make_feature_matrix(args.rows, seed=0)
+    print(f"model {version}: {forest.n_trees} trees, max depth {forest.max_depth}, {len(forest.left):,} nodes")
+
+    proba, proba_s = timed(forest.predict_proba, X)
+    (explained_proba, bias, contributions), explain_s = timed(forest.explain, X)
+    k = forest.positive_index()
+    np.testing.assert_allclose(explained_proba, proba, rtol=0, atol=1e-12)
+    additivity = float(np.abs(bias + contributions.sum(axis=1) - proba[:, k]).max())
+
+    sample = X[: args.reference_rows]
+    reference, reference_s = timed(reference_contributions, forest, sample)
+    np.testing.assert_allclose(contributions[: len(sample)], reference, atol=1e-9)
+
+    print(f"{'path':<34} {'rows':>8} {'seconds':>9} {'rows/s':>12}")
+    for name, n, seconds in (
+        ("predict_proba (vectorized)", args.rows, proba_s),
+        ("explain (vectorized)", args.rows, explain_s),
+        ("explain (per-row Python walk)", len(sample), reference_s),
+    ):
+        print(f"{name:<34} {n:>8} {seconds:>9.3f} {n / seconds:>12,.0f}")
+    print(f"bias {bias:.4f}; max |bias + sum(contributions) - P(1)| = {additivity:.2e}")
+    print(f"mean |contribution| per feature: {np.round(np.abs(contributions).mean(axis=0), 4).tolist()}")
+
+
+if __name__ == "__main__":
+    main()
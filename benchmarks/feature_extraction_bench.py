@@ -0,0 +1,77 @@
+"""Documents/sec of the single-pass lab report feature extractor vs the per-feature scans.
+
+    python -m benchmarks.feature_extraction_bench [--docs 200] [--kb 256]
+"""
+import argparse
+import random
+import re
+import time
+from typing import Dict, List
+
+from data.pdf_pipeline_with_feature_extract import EXPECTED_KEYS, extract_features
+
+FILLER = (
+    "Specimen received and processed per laboratory protocol. Reference ranges are "
+    "provided for adults; interpret results in clinical context. Sample hemolysed: no. "
+)
+FEATURE_LINES = [
+    "Pregnancies: {}", "Glucose: {}", "Blood Pressure: {}", "Skin Thickness: {}",
+    "Insulin: {}", "BMI: {}", "Diabetes Pedigree Function: {}", "Age: {}",
+]
+
+
+def legacy_extract_features(text: str) -> Dict[str, float]:
+    """The previous implementation: lowercase copy plus one full scan per feature."""
+    text_lower = text.lower()
+    features: Dict[str, float] = {}
+    for key, pattern in EXPECTED_KEYS.items():
+        match = re.search(pattern, text_lower)
+        if match:
+            features[key] = float(match.group(1))
+    return features
+
+
+def make_report(rng: random.Random, size_kb: int, position: str) -> str:
+    values = [rng.randint(0, 12), rng.randint(60, 200), rng.randint(40, 120), rng.randint(0, 60),
+              rng.randint(0, 400), round(rng.uniform(15, 50), 1), round(rng.uniform(0.05, 2.4), 3),
+              rng.randint(21, 85)]
+    block = "\n".join(line.format(v) for line, v in zip(FEATURE_LINES, values))
+    filler = FILLER * max(1, size_kb * 1024 // len(FILLER))
+    if position == "partial":
+        # only half the features present: every missing feature costs the legacy path a full scan
+        return filler + "\n" + "\n".join(block.splitlines()[::2])
+    if position == "head":
+        return block + "\n" + filler
+    if position == "tail":
+        return filler + "\n" + block
+    cut = rng.randint(0, len(filler))
+    return filler[:cut] + "\n" + block + "\n" + filler[cut:]
+
+
+def docs_per_sec(fn, corpus: List[str]) -> float:
+    start = time.perf_counter()
+    for text in corpus:
+        fn(text)
+    return len(corpus) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--kb", type=int, default=256, help="approximate size of each report")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{args.docs} synthetic reports of ~{args.kb} KB")
+    print(f"{'features at':>12} {'legacy docs/s':>14} {'single-pass docs/s':>19} {'speedup':>8}")
+    for position in ("head", "middle", "tail", "partial"):
+        corpus = [make_report(rng, args.kb, position) for _ in range(args.docs)]
+        for text in corpus[:20]:
+            assert extract_features(text) == legacy_extract_features(text)
+        legacy = docs_per_sec(legacy_extract_features, corpus)
+        single = docs_per_sec(extract_features, corpus)
+        print(f"{position:>12} {legacy:>14,.1f} {single:>19,.1f} {single / legacy:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Parity check and throughput benchmark: compiled forest vs sklearn predict.
+
+    python -m benchmarks.forest_bench [--model models/model.joblib]
+
+The "served" column is what the API runs: the compiled walk below SKLEARN_MIN_ROWS rows,
+the attached sklearn estimator from there on. tests/test_forest.py asserts the parity.
+"""
+import argparse
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from data.csv_pipeline import EXPECTED_FEATURES
+from models.forest import SKLEARN_MIN_ROWS, CompiledForest
+
+BATCH_SIZES = [1, 10, 100, 1_000, 10_000, 100_000]
+
+
+def check_parity(model, forest: CompiledForest, X: np.ndarray) -> None:
+    expected = model.predict_proba(X)
+    got = forest.predict_proba(X)
+    np.testing.assert_allclose(got, expected, rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(forest.predict(X), model.predict(X))
+
+
+def rows_per_sec(fn, X: np.ndarray, min_time: float = 0.5) -> float:
+    fn(X)
+    calls, start = 0, time.perf_counter()
+    while True:
+        fn(X)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return calls * len(X) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="models/model.joblib")
+    parser.add_argument("--csv", default="data/diabetes.csv")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    forest = CompiledForest.from_sklearn(model)
+    served = CompiledForest.from_sklearn(model).with_estimator(joblib.load(args.model))
+    X = pd.read_csv(args.csv)[EXPECTED_FEATURES].to_numpy(dtype=np.float64)
+
+    check_parity(model, forest, X)
+    print(f"parity ok on {len(X)} rows from {args.csv}; served batches switch to sklearn at {SKLEARN_MIN_ROWS} rows")
+
+    rng = np.random.default_rng(0)
+    print(f"{'batch':>8} {'sklearn rows/s':>16} {'compiled rows/s':>16} {'served rows/s':>14} {'speedup':>8}")
+    for size in BATCH_SIZES:
+        batch = X[rng.integers(0, len(X), size)]
+        sk = rows_per_sec(model.predict, batch)
+        cf = rows_per_sec(forest.predict, batch)
+        sv = rows_per_sec(served.predict, batch)
+        print(f"{size:>8} {sk:>16,.0f} {cf:>16,.0f} {sv:>14,.0f} {sv / sk:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Concurrent load test of every API endpoint, run in-process against a temporary SQLite DB.
+
+    python -m benchmarks.load_test [--requests 200] [--concurrency 8] [--out results.json]
+
+Emits one JSON document with throughput, p50/p95/p99 latency and peak RSS per endpoint,
+tagged with the current git commit so runs can be compared across commits.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+
+ENDPOINTS = ["predict", "predict_csv", "predict_csv_stream", "predict_pdf", "records", "chat"]
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, interval: float = 0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss_bytes()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes())
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        return max(self.peak, current_rss_bytes())
+
+
+def run_scenario(name: str, call: Callable[[int], None], requests: int, concurrency: int) -> Dict[str, object]:
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            call(i)
+            ok = True
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            errors += 0 if ok else 1
+
+    sampler = RssSampler()
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    peak_rss = sampler.stop()
+
+    ms = np.array(latencies) * 1000.0
+    return {
+        "endpoint": name,
+        "requests": requests,
+        "errors": errors,
+        "concurrency": concurrency,
+        "throughput_rps": requests / wall,
+        "latency_ms": {
+            "p50": float(np.percentile(ms, 50)),
+            "p95": float(np.percentile(ms, 95)),
+            "p99": float(np.percentile(ms, 99)),
+            "max": float(ms.max()),
+        },
+        "peak_rss_mb": peak_rss / 2**20,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--csv-rows", type=int, default=5_000)
+    parser.add_argument("--pdf-filler-pages", type=int, default=4)
+    parser.add_argument("--seed-records", type=int, default=10_000, help="rows inserted before the /records scenario")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="diabetes-bench-")
+    # configure the app before it is imported: throwaway database, offline chat model
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    os.environ.setdefault("CHAT_LLM", "stub")
+    os.environ.setdefault("CHAT_STUB_LATENCY_MS", "50")
+    os.environ["MODEL_WATCH_INTERVAL"] = "0"
+
+    from fastapi.testclient import TestClient
+
+    from backend import startup
+    from backend.main import app
+    from benchmarks import synthetic
+    from models import crud
+    from models.db import SessionLocal
+
+    patients = synthetic.make_patients(max(args.requests, 1))
+    csv_bytes = synthetic.make_csv_bytes(args.csv_rows)
+    pdfs = [synthetic.make_pdf_bytes(p, args.pdf_filler_pages) for p in patients[:50]]
+    questions = [f"What is known about diabetes topic {i % 20}?" for i in range(args.requests)]
+
+    def check(resp) -> None:
+        resp.raise_for_status()
+        resp.read()
+
+    results = []
+    # keep stdout clean for the JSON report; app logging goes to stderr
+    with contextlib.redirect_stdout(sys.stderr), TestClient(app) as client:
+        # the model loads in the background; measure warmed-up serving only
+        startup.wait_ready(timeout=120)
+        db = SessionLocal()
+        X = synthetic.make_feature_matrix(args.seed_records, seed=7)
+        crud.create_records_bulk(db, X, np.zeros(len(X), dtype=int))
+        db.close()
+
+        scenarios = {
+            "predict": lambda i: check(client.post("/predict", json=patients[i % len(patients)])),
+            "predict_csv": lambda i: check(
+                client.post("/predict/csv", files={"file": ("bench.csv", csv_bytes, "text/csv")})
+            ),
+            "predict_csv_stream": lambda i: check(
+                client.post("/predict/csv/stream", files={"file": ("bench.csv", csv_bytes, "text/csv")})
+            ),
+            "predict_pdf": lambda i: check(
+                client.post("/predict/pdf", files={"file": ("bench.pdf", pdfs[i % len(pdfs)], "application/pdf")})
+            ),
+            "records": lambda i: check(client.get("/records", params={"limit": 50})),
+            "chat": lambda i: check(client.post("/chat", json={"question": questions[i]})),
+        }
+        for name in [e.strip() for e in args.endpoints.split(",") if e.strip()]:
+            if name not in scenarios:
+                parser.error(f"unknown endpoint {name}; choose from {ENDPOINTS}")
+            print(f"running {name} ...", file=sys.stderr)
+            results.append(run_scenario(name, scenarios[name], args.requests, args.concurrency))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": vars(args),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Concurrent single-record insert throughput: default SQLite vs tuned pragmas vs write-behind.
+
+    python -m benchmarks.sqlite_inserts [--rows 4000] [--threads 16] [--write-behind-ms 2]
+
+Each mode gets a fresh database file in a temp directory; every insert is one
+`create_record`-style call from one of `--threads` threads, like concurrent /predict requests.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.synthetic import make_patients
+from models import crud
+from models.db import Base, make_engine
+from models.schema import RecordCreate
+
+
+def run_mode(name: str, tuned: bool, write_behind_ms: float, patients, threads: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", tuned=tuned)
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        buffer = crud.make_write_buffer(factory, max_wait_ms=write_behind_ms) if write_behind_ms > 0 else None
+
+        def insert(data: RecordCreate) -> float:
+            start = time.perf_counter()
+            if buffer is not None:
+                buffer.predict(crud.record_row(data, predicted=0))
+            else:
+                with factory() as db:
+                    crud.create_record(db, data, predicted=0)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            latencies = np.array(list(pool.map(insert, patients))) * 1000.0
+        elapsed = time.perf_counter() - start
+        engine.dispose()
+    print(
+        f"{name:<22} {len(patients) / elapsed:>12,.0f} {np.percentile(latencies, 50):>9.2f} "
+        f"{np.percentile(latencies, 99):>9.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=4000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--write-behind-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    patients = [RecordCreate(**p) for p in make_patients(args.rows)]
+    print(f"{args.rows} inserts from {args.threads} threads")
+    print(f"{'mode':<22} {'inserts/s':>12} {'p50 ms':>9} {'p99 ms':>9}")
+    run_mode("default", False, 0, patients, args.threads)
+    run_mode("wal+pragmas", True, 0, patients, args.threads)
+    run_mode(f"wal+write-behind {args.write_behind_ms:g}ms", True, args.write_behind_ms, patients, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Cold-start budget report: import time per module of `backend.main`, and time to /ready.
+
+    python -m benchmarks.startup_report [--budget-ms 1500] [--top 15] [--ready]
+
+Imports are measured in a fresh interpreter with `python -X importtime`. Self times are
+summed per top-level package; the slowest modules are listed by cumulative time. Exits
+non-zero when importing backend.main exceeds the budget.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+READY_SCRIPT = """
+import json, os, time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+from backend.main import app
+with TestClient(app) as client:
+    while client.get("/ready").status_code != 200:
+        if not client.get("/ready").json()["warming"]:
+            break
+        time.sleep(0.01)
+    report = client.get("/ready").json()
+report["wall_ms"] = (time.perf_counter() - start) * 1000.0
+print("READY " + json.dumps(report))
+"""
+
+
+def import_times(module: str = "backend.main") -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) for every module imported by `import module`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True, env=dict(os.environ, PYTHONPATH=os.getcwd()),
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def ready_report() -> Dict:
+    env = dict(os.environ, PYTHONPATH=os.getcwd(), CHAT_LLM=os.getenv("CHAT_LLM", "stub"), MODEL_WATCH_INTERVAL="0")
+    proc = subprocess.run([sys.executable, "-c", READY_SCRIPT], capture_output=True, text=True, check=True, env=env)
+    line = next(l for l in proc.stdout.splitlines() if l.startswith("READY "))
+    return json.loads(line[len("READY "):])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--ready", action="store_true", help="also start the app and time it until /ready")
+    args = parser.parse_args()
+
+    rows = import_times(args.module)
+    total_ms = next(cum for name, _, cum in rows if name == args.module) / 1000.0
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"import {args.module}: {total_ms:,.0f} ms (budget {args.budget_ms:,.0f} ms), {len(rows)} modules")
+    print(f"\n{'package':<28} {'self ms':>9}")
+    for package, us in sorted(by_package.items(), key=lambda kv: -kv[1])[: args.top]:
+        print(f"{package:<28} {us / 1000.0:>9,.1f}")
+    print(f"\n{'module':<48} {'cumulative ms':>14}")
+    for name, _, cum in sorted(rows, key=lambda r: -r[2])[: args.top]:
+        print(f"{name:<48} {cum / 1000.0:>14,.1f}")
+
+    if args.ready:
+        report = ready_report()
+        print(f"\nprocess start to /ready: {report['wall_ms']:,.0f} ms (ready={report['ready']})")
+        for phase, ms in report["phases_ms"].items():
+            print(f"  {phase:<26} {ms:>9,.1f} ms")
+
+    if total_ms > args.budget_ms:
+        sys.exit(f"import {args.module} took {total_ms:,.0f} ms, over the {args.budget_ms:,.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
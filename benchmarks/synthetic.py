@@ -0,0 +1,94 @@
+"""Synthetic patients, CSV uploads and lab report PDFs for benchmarks."""
+import io
+from typing import Dict, List
+
+import numpy as np
+
+from data.csv_pipeline import EXPECTED_FEATURES, OUTCOME_COLUMN
+
+# rough ranges of the Pima training data
+FEATURE_RANGES = {
+    "pregnancies": (0, 12),
+    "glucose": (60, 200),
+    "blood_pressure": (40, 120),
+    "skin_thickness": (0, 60),
+    "insulin": (0, 400),
+    "bmi": (15, 55),
+    "diabetes_pedigree_function": (0.05, 2.4),
+    "age": (21, 85),
+}
+INT_FEATURES = {"pregnancies", "age"}
+PDF_LABELS = {
+    "pregnancies": "Pregnancies",
+    "glucose": "Glucose",
+    "blood_pressure": "Blood Pressure",
+    "skin_thickness": "Skin Thickness",
+    "insulin": "Insulin",
+    "bmi": "BMI",
+    "diabetes_pedigree_function": "Diabetes Pedigree Function",
+    "age": "Age",
+}
+
+
+def make_feature_matrix(n: int, seed: int = 0) -> np.ndarray:
+    """(n, 8) matrix in model feature order."""
+    rng = np.random.default_rng(seed)
+    cols = []
+    for key, (low, high) in FEATURE_RANGES.items():
+        col = rng.uniform(low, high, n)
+        cols.append(np.floor(col) if key in INT_FEATURES else np.round(col, 3))
+    return np.column_stack(cols)
+
+
+def make_patients(n: int, seed: int = 0) -> List[Dict[str, float]]:
+    """JSON bodies for POST /predict."""
+    return [
+        {key: int(v) if key in INT_FEATURES else float(v) for key, v in zip(FEATURE_RANGES, row)}
+        for row in make_feature_matrix(n, seed)
+    ]
+
+
+def make_csv_bytes(n: int, seed: int = 0, with_outcome: bool = True) -> bytes:
+    X = make_feature_matrix(n, seed)
+    header = list(EXPECTED_FEATURES) + ([OUTCOME_COLUMN] if with_outcome else [])
+    if with_outcome:
+        X = np.column_stack([X, np.random.default_rng(seed + 1).integers(0, 2, n)])
+    buf = io.StringIO()
+    buf.write(",".join(header) + "\n")
+    np.savetxt(buf, X, delimiter=",", fmt="%g")
+    return buf.getvalue().encode()
+
+
+def make_pdf_bytes(patient: Dict[str, float], filler_pages: int = 0) -> bytes:
+    """Minimal text PDF: `filler_pages` pages of boilerplate followed by the lab values."""
+    filler = ["Specimen received and processed per laboratory protocol."] * 40
+    values = [f"{PDF_LABELS[key]}: {patient[key]}" for key in FEATURE_RANGES]
+    return _write_pdf([filler] * filler_pages + [["Laboratory report"] + values])
+
+
+def _write_pdf(pages: List[List[str]]) -> bytes:
+    n = len(pages)
+    font_id = 3 + 2 * n
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(" ".join(f"{3 + 2 * i} 0 R" for i in range(n)), n),
+    ]
+    for i, lines in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>"
+        )
+        body = "BT /F1 11 Tf 14 TL 50 750 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(body)} >>\nstream\n{body}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{off:010d} 00000 n \n".encode() for off in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
@@ -1,5 +1,12 @@
-from typing import List
-import pandas as pd
+from typing import IO, TYPE_CHECKING, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+import annotated_types
+import numpy as np
+from backend.metrics import span
+from models.crud import FEATURE_COLUMNS
+from models.schema import RecordBase
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 EXPECTED_FEATURES:List[str]=[
     "Pregnancies",
@@ -12,10 +19,174 @@ EXPECTED_FEATURES:List[str]=[
     "Age",
 ]
 
-def load_feature_from_csv_file(csv_path:str)->pd.DataFrame:
-    df=pd.read_csv(csv_path,encoding="latin1")
+OUTCOME_COLUMN = "Outcome"
+
+DEFAULT_CHUNK_ROWS = 50_000
+# per-row reject details returned to clients; counts per rule are always complete
+MAX_REPORTED_REJECTS = 1_000
+
+def _schema_constraints()->Tuple[Dict[str,float],List[str]]:
+    """(column -> lower bound, integer columns) taken from RecordBase, so CSV and JSON input agree."""
+    lower:Dict[str,float]={}
+    integer:List[str]=[]
+    # matched by name, so reordering the schema's fields cannot shift the rules onto other columns
+    for column,name in zip(EXPECTED_FEATURES,FEATURE_COLUMNS):
+        field=RecordBase.model_fields[name]
+        for constraint in field.metadata:
+            if isinstance(constraint,annotated_types.Ge):
+                lower[column]=float(constraint.ge)
+        if field.annotation is int:
+            integer.append(column)
+    return lower,integer
+
+LOWER_BOUNDS,INTEGER_FEATURES=_schema_constraints()
+# every column is parsed as float64: integer columns may hold blanks, which int64 cannot
+CSV_DTYPES={c:np.float64 for c in EXPECTED_FEATURES+[OUTCOME_COLUMN]}
+
+class ValidatedChunk(NamedTuple):
+    """Parsed rows plus the outcome of validating them.
+
+    `features` keeps every input row (coerced to float64, unparseable cells as NaN) so
+    row numbers line up with the file; only rows with `valid` set should be scored. Batch
+    input decoded straight into an (n, 8) array keeps that array here instead of a frame.
+    `errors` maps each broken rule to the chunk-relative positions of the rows breaking it.
+    """
+    features:Union["pd.DataFrame",np.ndarray]
+    valid:np.ndarray
+    errors:Dict[str,np.ndarray]
+
+    @property
+    def rejected(self)->int:
+        return int(len(self.valid)-np.count_nonzero(self.valid))
+
+    def row_errors(self,offset:int=0,limit:Optional[int]=None)->Dict[int,List[str]]:
+        """Messages per rejected row (keyed by `offset` + position), for at most `limit` rows."""
+        rows=np.flatnonzero(~self.valid)
+        if limit is not None:
+            rows=rows[:limit]
+        messages:Dict[int,List[str]]={int(r)+offset:[] for r in rows}
+        for rule,positions in self.errors.items():
+            for r in positions[np.isin(positions,rows)]:
+                messages[int(r)+offset].append(rule)
+        return messages
+
+    def summary(self,offset:int=0)->dict:
+        return {
+            "rejected":self.rejected,
+            "reject_counts":{rule:int(len(positions)) for rule,positions in self.errors.items()},
+            "rejects":[{"row":row,"errors":errors} for row,errors in self.row_errors(offset,MAX_REPORTED_REJECTS).items()],
+        }
+
+def validate_features(df:"pd.DataFrame",with_outcome:bool=False)->ValidatedChunk:
+    """Column-wise checks: numeric, >= the schema bound, integral where the schema says int."""
+    import pandas as pd
+    columns=list(EXPECTED_FEATURES)
+    if with_outcome and OUTCOME_COLUMN in df.columns:
+        columns.append(OUTCOME_COLUMN)
+    features=df[columns]
+    if any(features[c].dtype!=np.float64 for c in columns):
+        features=features.apply(pd.to_numeric,errors="coerce").astype(np.float64)
+    valid,errors=validate_matrix(features[EXPECTED_FEATURES].to_numpy())
+    return ValidatedChunk(features,valid,errors)
+
+def validate_matrix(values:np.ndarray)->Tuple[np.ndarray,Dict[str,np.ndarray]]:
+    """(valid mask, rule -> failing row positions) for an (n, 8) float matrix in EXPECTED_FEATURES order."""
+    checks:Dict[str,np.ndarray]={}
+    # inf/-inf (possible in binary batch input) is rejected like NaN
+    missing=~np.isfinite(values)
+    with np.errstate(invalid="ignore"):
+        for j,column in enumerate(EXPECTED_FEATURES):
+            col=values[:,j]
+            checks[f"{column}: missing or not a number"]=missing[:,j]
+            if column in LOWER_BOUNDS:
+                checks[f"{column}: must be >= {LOWER_BOUNDS[column]:g}"]=col<LOWER_BOUNDS[column]
+            if column in INTEGER_FEATURES:
+                checks[f"{column}: must be a whole number"]=(col!=np.floor(col))&~missing[:,j]
+    valid=np.ones(len(values),dtype=bool)
+    errors:Dict[str,np.ndarray]={}
+    for rule,failed in checks.items():
+        positions=np.flatnonzero(failed)
+        if len(positions):
+            errors[rule]=positions
+            valid[positions]=False
+    return valid,errors
+
+def _check_columns(df:"pd.DataFrame")->None:
     missing=[c for c in EXPECTED_FEATURES if c not in df.columns]
     if missing:
         raise ValueError(f"Missing required columns: {missing}")
-    features=df[EXPECTED_FEATURES].copy().fillna(0)
-    return features
\ No newline at end of file
+
+def _read_csv(csv_source:Union[str, IO],with_outcome:bool,typed:bool,**kwargs):
+    # pandas costs ~0.5 s to import; only processes that parse CSVs pay for it
+    import pandas as pd
+    wanted=set(EXPECTED_FEATURES)
+    if with_outcome:
+        wanted.add(OUTCOME_COLUMN)
+    return pd.read_csv(
+        csv_source,
+        encoding="latin1",
+        # only the model columns are tokenized into values; anything else is skipped
+        usecols=lambda c: c in wanted,
+        # explicit float64 keeps the C parser's fast path; `typed=False` reads text for to_numeric coercion
+        dtype=CSV_DTYPES if typed else str,
+        **kwargs,
+    )
+
+def _rewind(csv_source:Union[str, IO])->bool:
+    if isinstance(csv_source,str):
+        return True
+    if hasattr(csv_source,"seekable") and csv_source.seekable():
+        csv_source.seek(0)
+        return True
+    return False
+
+@span("csv.parse")
+def load_validated_csv(csv_path:Union[str, IO],with_outcome:bool=False)->ValidatedChunk:
+    """Load and validate the model features; with `with_outcome` an `Outcome` column is kept when present."""
+    try:
+        df=_read_csv(csv_path,with_outcome,typed=True)
+    except ValueError:
+        # a non-numeric cell somewhere: re-read as text and coerce it to NaN (a reject)
+        if not _rewind(csv_path):
+            raise
+        df=_read_csv(csv_path,with_outcome,typed=False)
+    _check_columns(df)
+    with span("csv.validate"):
+        return validate_features(df,with_outcome)
+
+def iter_validated_chunks(
+    csv_source:Union[str, IO],
+    chunksize:int=DEFAULT_CHUNK_ROWS,
+    with_outcome:bool=False,
+)->Iterator[ValidatedChunk]:
+    """Yield validated chunks of at most `chunksize` rows; columns are checked once, on the first chunk.
+
+    Parsing starts with explicit float64 dtypes. If a chunk holds a non-numeric cell, the
+    source is rewound and the remaining rows are read as text and coerced instead.
+    """
+    yielded=0
+    typed=True
+    while True:
+        reader=_read_csv(
+            csv_source,with_outcome,typed=typed,chunksize=chunksize,
+            skiprows=range(1,yielded+1) if yielded else None,
+        )
+        with reader:
+            while True:
+                # time only the parse of each chunk, not the consumer's work between yields
+                with span("csv.parse_chunk"):
+                    try:
+                        chunk=next(reader,None)
+                    except ValueError:
+                        if not typed or not _rewind(csv_source):
+                            raise
+                        typed=False
+                        break
+                if chunk is None:
+                    return
+                if yielded==0:
+                    _check_columns(chunk)
+                with span("csv.validate"):
+                    validated=validate_features(chunk,with_outcome)
+                yield validated
+                yielded+=len(chunk)
@@ -1,15 +1,244 @@
-from typing import List,Dict,Tuple
-from pypdf import PdfReader
+from typing import List,Dict,Tuple,Iterator,Optional
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, TimeoutError as FutureTimeout, wait
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
 import re
+from backend.metrics import span
+
+PDF_POOL_WORKERS = int(os.getenv("PDF_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_TIMEOUT_SECONDS = float(os.getenv("PDF_TIMEOUT_SECONDS", "30"))
+# documents longer than this are split into page ranges extracted in parallel
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
 
 #extract text from pdf
 def extract_text_from_pdf(pdf_path: str) -> str:
+    from pypdf import PdfReader
     reader = PdfReader(pdf_path)
     texts: List[str] = []
     for page in reader.pages:
         texts.append(page.extract_text() or "")
     return "\n".join(texts)
 
+def extract_text_from_pdf_bytes(data: bytes, start: int = 0, stop: Optional[int] = None) -> str:
+    """Extract text of pages [start, stop) from an in-memory PDF."""
+    # imported on first use so the API process only loads pypdf once a PDF arrives
+    from pypdf import PdfReader
+    reader = PdfReader(BytesIO(data))
+    return "\n".join(page.extract_text() or "" for page in reader.pages[start:stop])
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the API process runs threads, which fork does not copy safely
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+def recycle_pdf_pool(pool: ProcessPoolExecutor) -> None:
+    """Discard `pool` after a worker crashed or hung: kill its processes so the next call
+    builds a fresh pool. Other documents still running on it fail with BrokenProcessPool."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # ProcessPoolExecutor has no public way to stop a worker stuck inside pypdf
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_pdf_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def _extract_first_pages(data: bytes, stop: int) -> Tuple[str, int]:
+    """Pool task: text of the first `stop` pages and the document's page count."""
+    from pypdf import PdfReader
+    reader = PdfReader(BytesIO(data))
+    return "\n".join(page.extract_text() or "" for page in reader.pages[:stop]), len(reader.pages)
+
+def _extract_shared_pages(name: str, size: int, start: int, stop: int) -> str:
+    """Pool task: text of pages [start, stop) of a document in shared memory."""
+    from multiprocessing.shared_memory import SharedMemory
+    shared = SharedMemory(name=name)
+    try:
+        data = bytes(shared.buf[:size])
+    finally:
+        shared.close()
+    return extract_text_from_pdf_bytes(data, start, stop)
+
+class PdfExtraction:
+    """Pending text extraction of one document, split into page-range tasks on the pool.
+
+    The API process never parses the PDF: the task for the first PDF_PAGES_PER_TASK pages
+    is sent the bytes and also counts the pages. Only a longer document is then copied to
+    shared memory (never to disk) for the tasks of its remaining page ranges.
+
+    On timeout, tasks that have not started are cancelled; if one is still running, its
+    worker is stuck in pypdf and the pool is recycled. A crashed worker recycles it too.
+    """
+
+    def __init__(self, pool: ProcessPoolExecutor, data: bytes, timeout: float):
+        self.pool = pool
+        self.data: Optional[bytes] = data
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+        self.step = max(1, PDF_PAGES_PER_TASK)
+        self.shared = None
+        self.first = pool.submit(_extract_first_pages, data, self.step)
+        self.rest: Optional[List[Future]] = None
+
+    @property
+    def futures(self) -> List[Future]:
+        return [self.first] + (self.rest or [])
+
+    def _submit_rest(self) -> None:
+        if self.rest is not None or not self.first.done() or self.first.cancelled() or self.first.exception() is not None:
+            return
+        n_pages = self.first.result()[1]
+        rest: List[Future] = []
+        if n_pages > self.step:
+            from multiprocessing.shared_memory import SharedMemory
+            if self.shared is None:
+                self.shared = SharedMemory(create=True, size=len(self.data))
+                self.shared.buf[:len(self.data)] = self.data
+            for start in range(self.step, n_pages, self.step):
+                rest.append(self.pool.submit(
+                    _extract_shared_pages, self.shared.name, len(self.data), start, min(start + self.step, n_pages)
+                ))
+        self.rest = rest
+        self.data = None
+
+    def done(self) -> bool:
+        try:
+            self._submit_rest()
+        except Exception:
+            # the pool broke or shut down; `result` raises it again and cleans up
+            return True
+        return all(f.done() for f in self.futures)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self) -> None:
+        """Cancel tasks that have not started and free the shared copy (running tasks have their own)."""
+        for f in self.futures:
+            f.cancel()
+        self.data = None
+        if self.shared is not None:
+            self.shared.close()
+            self.shared.unlink()
+            self.shared = None
+
+    def _failed(self, error: BaseException) -> Exception:
+        """Clean up after a timeout or a crashed worker; returns the error to raise."""
+        self.cancel()
+        if isinstance(error, BrokenProcessPool):
+            recycle_pdf_pool(self.pool)
+            return error
+        if any(f.running() for f in self.futures):
+            recycle_pdf_pool(self.pool)
+        return TimeoutError(f"PDF text extraction exceeded {self.timeout:g}s")
+
+    def _text(self, first: Tuple[str, int], rest: List[str]) -> str:
+        self.cancel()
+        return "\n".join([first[0]] + rest)
+
+    @span("pdf.wait_text")
+    def result(self) -> str:
+        try:
+            first = self.first.result(timeout=self.remaining())
+            self._submit_rest()
+            rest = [f.result(timeout=self.remaining()) for f in self.rest]
+        except (FutureTimeout, BrokenProcessPool) as e:
+            raise self._failed(e) from None
+        except BaseException:
+            self.cancel()
+            raise
+        return self._text(first, rest)
+
+    async def aresult(self) -> str:
+        """`result` for the event loop: awaits the tasks instead of blocking a thread."""
+        async def wait_for(future: Future):
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.remaining())
+
+        with span("pdf.wait_text"):
+            try:
+                first = await wait_for(self.first)
+                self._submit_rest()
+                rest = [await wait_for(f) for f in self.rest]
+            except (asyncio.TimeoutError, BrokenProcessPool) as e:
+                raise self._failed(e) from None
+            except BaseException:
+                self.cancel()
+                raise
+            return self._text(first, rest)
+
+@span("pdf.submit")
+def submit_pdf_extraction(data: bytes, timeout: float = PDF_TIMEOUT_SECONDS) -> PdfExtraction:
+    """Start extracting an in-memory PDF on the pool; a pool found broken is replaced once."""
+    pool = get_pdf_pool()
+    try:
+        return PdfExtraction(pool, data, timeout)
+    except BrokenProcessPool:
+        recycle_pdf_pool(pool)
+        return PdfExtraction(get_pdf_pool(), data, timeout)
+
+def extract_text_from_pdf_bytes_pooled(data: bytes, timeout: float = PDF_TIMEOUT_SECONDS) -> str:
+    """Extract text from an in-memory PDF on the process pool, with a per-document timeout."""
+    return submit_pdf_extraction(data, timeout).result()
+
+async def aextract_text_from_pdf_bytes_pooled(data: bytes, timeout: float = PDF_TIMEOUT_SECONDS) -> str:
+    """`extract_text_from_pdf_bytes_pooled` without holding a thread while pypdf runs."""
+    return await submit_pdf_extraction(data, timeout).aresult()
+
+def iter_pdf_texts(
+    documents: Dict[str, bytes], timeout: float = PDF_TIMEOUT_SECONDS
+) -> Iterator[Tuple[str, Optional[str], Optional[Exception]]]:
+    """Yield (name, text, error) for each document in completion order."""
+    pending: Dict[str, PdfExtraction] = {}
+    try:
+        for name, data in documents.items():
+            try:
+                pending[name] = submit_pdf_extraction(data, timeout)
+            except Exception as e:
+                yield name, None, e
+        while pending:
+            nearest = min(job.deadline for job in pending.values())
+            wait(
+                [f for job in pending.values() for f in job.futures],
+                timeout=max(0.0, nearest - time.monotonic()),
+                return_when=FIRST_COMPLETED,
+            )
+            for name, job in list(pending.items()):
+                # a finished first task queues the document's other page ranges here
+                if job.done() or job.expired():
+                    del pending[name]
+                    try:
+                        yield name, job.result(), None
+                    except Exception as e:
+                        yield name, None, e
+    finally:
+        # the client went away: drop the remaining documents
+        for job in pending.values():
+            job.cancel()
+
 EXPECTED_KEYS = {
     "pregnancies": r"(?:pregnancies?|preg)\s*[:=-]?\s*(\d+)",
     "glucose": r"(?:glucose|glu)\s*[:=-]?\s*(\d+(?:\.\d+)?)",
@@ -22,32 +251,81 @@ EXPECTED_KEYS = {
 }
 
 
-def extract_features(text: str) -> Dict[str, float]:
-    """Extract diabetes features from text. Returns empty dict if no features found."""
-    text_lower = text.lower()
-    features: Dict[str, float] = {}
-    missing_features: List[str] = []
-
+def _build_feature_matcher() -> Tuple["re.Pattern[str]", Dict[int, str]]:
+    # every label spelling becomes its own branch, grouped under its first letter, so the
+    # engine can skip in C to positions starting with a label letter and then only tries
+    # the spellings sharing that letter; the value group number identifies the feature
+    by_first: Dict[str, List[Tuple[str, str]]] = {}
     for key, pattern in EXPECTED_KEYS.items():
-        match = re.search(pattern, text_lower)
-        if match:
-            try:
-                value_str = match.group(1) if key != "diabetes_pedigree_function" else match.group(1)
-                features[key] = float(value_str)
-            except (ValueError, IndexError):
-                missing_features.append(key)
-        else:
-            missing_features.append(key)
+        labels, value = re.fullmatch(r"\(\?:(.*?)\)(.*)", pattern).groups()
+        for label in labels.split("|"):
+            by_first.setdefault(label[0], []).append((key, label[1:] + value))
+    group_keys: Dict[int, str] = {}
+    branches: List[str] = []
+    for first, entries in by_first.items():
+        for key, _ in entries:
+            group_keys[len(group_keys) + 1] = key
+        branches.append(first + "(?:" + "|".join(rest for _, rest in entries) + ")")
+    return re.compile("|".join(branches)), group_keys
 
-    return features
+FEATURE_MATCHER, _FEATURE_GROUPS = _build_feature_matcher()
+# text is lowercased and scanned one block at a time so extraction can stop early;
+# the overlap lets a match that starts near the end of a block finish inside the window
+SCAN_BLOCK_CHARS = 16_384
+SCAN_OVERLAP_CHARS = 512
 
 
+def extract_features(text: str) -> Dict[str, float]:
+    """Extract diabetes features from text. Returns empty dict if no features found.
+
+    Single left-to-right pass over the text that keeps the first value of each feature
+    and stops as soon as all of them have been seen.
+    """
+    features: Dict[str, float] = {}
+    pos = 0
+    while pos < len(text) and len(features) < len(EXPECTED_KEYS):
+        window_end = pos + SCAN_BLOCK_CHARS + SCAN_OVERLAP_CHARS
+        final = window_end >= len(text)
+        window = text[pos:window_end].lower()
+        next_pos = pos + SCAN_BLOCK_CHARS
+        for match in FEATURE_MATCHER.finditer(window):
+            if not final and match.start() >= SCAN_BLOCK_CHARS:
+                break
+            next_pos = max(next_pos, pos + match.end())
+            key = _FEATURE_GROUPS[match.lastindex]
+            if key not in features:
+                features[key] = float(match.group(match.lastindex))
+                if len(features) == len(EXPECTED_KEYS):
+                    break
+        if final:
+            break
+        pos = next_pos
+    return {key: features[key] for key in EXPECTED_KEYS if key in features}
+
+
+@span("pdf.extract_features")
 def extract_features_with_validation(text: str) -> tuple[Dict[str, float], List[str]]:
     """Extract features and return both features and missing features list."""
     features = extract_features(text)
-    missing_features = [key for key in EXPECTED_KEYS.keys() if key not in features]
+    missing_features = [key for key in EXPECTED_KEYS if key not in features]
     return features, missing_features
 
 
+def report_features(text: str) -> Dict[str, float]:
+    """All eight features of an extracted report text; ValueError carries the client message."""
+    if not text or len(text.strip()) < 10:
+        raise ValueError(
+            f"PDF appears to be empty or unreadable. Extracted text length: {len(text) if text else 0} characters"
+        )
+
+    feats, missing_features = extract_features_with_validation(text)
+    if not feats:
+        raise ValueError(
+            "could not extract any features from PDF. Ensure the PDF contains text with values like: Pregnancies: 1, Glucose: 120, BloodPressure: 70, etc."
+        )
 
-    
\ No newline at end of file
+    if missing_features:
+        raise ValueError(
+            f"Missing required features: {missing_features}. Found: {list(feats.keys())}. Please ensure all 8 features are present in the PDF."
+        )
+    return feats
@@ -1,8 +1,82 @@
+import json
+import time
+
 import streamlit as st
 import requests
 import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 API_BASE = "http://localhost:8000"
+JOB_POLL_SECONDS = 1.0
+# keep-alive connections to the API, shared by every browser session of this server
+HTTP_POOL_SIZE = 32
+# how long records and stats reads are served from cache before asking the API again
+RECORDS_TTL_SECONDS = 30
+STATS_TTL_SECONDS = 60
+PAGE_SIZES = [50, 100, 500, 1000]
+RECORD_FIELDS = ["id", "glucose", "blood_pressure", "bmi", "age", "diabetes_pedigree_function", "predicted", "created_at"]
+
+
+@st.cache_resource
+def get_http():
+    """One pooled requests.Session per server process instead of a new connection per call."""
+    session = requests.Session()
+    # GETs are safe to retry on a dropped keep-alive connection or a 503 while the model loads
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET"}))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data(ttl=RECORDS_TTL_SECONDS, show_spinner=False)
+def fetch_records_page(cursor, limit):
+    """(records, next cursor) of one newest-first page; reruns within the TTL reuse it."""
+    params = {"limit": limit, "fields": ",".join(RECORD_FIELDS)}
+    if cursor is not None:
+        params["cursor"] = cursor
+    resp = get_http().get(f"{API_BASE}/records", params=params, timeout=15)
+    resp.raise_for_status()
+    next_cursor = resp.headers.get("X-Next-Cursor")
+    return resp.json(), int(next_cursor) if next_cursor else None
+
+
+@st.cache_data(ttl=STATS_TTL_SECONDS, show_spinner=False)
+def fetch_record_stats(group_by="none"):
+    resp = get_http().get(f"{API_BASE}/records/stats", params={"group_by": group_by}, timeout=15)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def invalidate_records():
+    fetch_records_page.clear()
+    fetch_record_stats.clear()
+
+
+def first_records_page():
+    del st.session_state["records_cursors"][1:]
+
+
+def run_job(endpoint, files, params=None):
+    """Submit a background scoring job, poll it with a progress bar and return (status, result lines)."""
+    http = get_http()
+    resp = http.post(f"{API_BASE}{endpoint}", files=files, params=params, timeout=300)
+    if not resp.ok:
+        raise RuntimeError(f"submit failed: {resp.status_code} {resp.text}")
+    job = resp.json()
+    progress = st.progress(0.0, text="Queued")
+    while job["status"] not in ("succeeded", "failed"):
+        time.sleep(JOB_POLL_SECONDS)
+        job = http.get(f"{API_BASE}/jobs/{job['job_id']}", timeout=15).json()
+        total = f" of {job['total']}" if job["total"] else ""
+        progress.progress(job["progress"], text=f"{job['status'].capitalize()}: {job['processed']}{total}")
+    progress.empty()
+    if job["status"] == "failed":
+        return job, []
+    result = http.get(f"{API_BASE}/jobs/{job['job_id']}/result", timeout=300)
+    result.raise_for_status()
+    return job, [json.loads(line) for line in result.text.splitlines() if line]
 
 #  Custom CSS 
 st.markdown(
@@ -129,9 +203,10 @@ if submit:
         "age": age
     }
     try:
-        response = requests.post(f"{API_BASE}/predict", json=data)
+        response = get_http().post(f"{API_BASE}/predict", json=data, timeout=30)
         if response.status_code == 200:
             result = response.json()
+            invalidate_records()
             st.success(f" Diabetes Risk: {'Positive' if result['diabetes_risk'] else 'Negative'}")
             st.info(f" Record ID: {result.get('record_id')} (stored in database)")
         else:
@@ -149,66 +224,83 @@ with tab1:
     st.subheader("📊 Batch Predictions from CSV")
     csv_file = st.file_uploader("Upload CSV file", type=["csv"])
     if csv_file is not None and st.button(" Process CSV batch"):
-        with st.spinner("Processing..."):
-            try:
-                files = {"file": (csv_file.name, csv_file.getvalue(), "text/csv")}
-                resp = requests.post(f"{API_BASE}/predict/csv", files=files, timeout=30)
-                if resp.ok:
-                    data = resp.json()
-                    st.success(f"✅ Processed {data['count']} patient records")
-                    preds_df = pd.DataFrame({"Prediction": data["predictions"]})
-                    st.dataframe(preds_df, use_container_width=True)
-                else:
-                    st.error(f"❌ CSV processing failed: {resp.status_code} {resp.text}")
-            except Exception as e:
-                st.error(f"⚠️ Error: {e}")
+        try:
+            files = {"file": (csv_file.name, csv_file.getvalue(), "text/csv")}
+            job, rows = run_job("/jobs/csv", files)
+            invalidate_records()
+            if job["status"] == "succeeded":
+                st.success(f"✅ Processed {len(rows)} patient records")
+                rejected = [r for r in rows if r.get("errors")]
+                if rejected:
+                    st.warning(f"{len(rejected)} rows were rejected and not scored")
+                    st.dataframe(
+                        pd.DataFrame({"Row": [r["row"] for r in rejected], "Errors": ["; ".join(r["errors"]) for r in rejected]}),
+                        use_container_width=True,
+                    )
+                preds_df = pd.DataFrame({"Prediction": [r["prediction"] for r in rows]})
+                st.dataframe(preds_df, use_container_width=True)
+            else:
+                st.error(f"❌ CSV processing failed: {job['error']}")
+        except Exception as e:
+            st.error(f"⚠️ Error: {e}")
 
 with tab2:
     st.subheader("📄 AI-Powered PDF Analysis")
-    pdf_file = st.file_uploader("Upload PDF file", type=["pdf"])
-    if pdf_file is not None and st.button(" Analyze PDF"):
-        with st.spinner("processing..."):
-            try:
-                files = {"file": (pdf_file.name, pdf_file.getvalue(), "application/pdf")}
-                resp = requests.post(f"{API_BASE}/predict/pdf", files=files, timeout=30)
-                if resp.ok:
-                    data = resp.json()
-                    st.info(f" {data.get('message', 'Analysis complete')}")
-                    if "features" in data:
-                        df = pd.DataFrame(list(data["features"].items()), columns=["Feature", "Value"])
-                        st.table(df)
-                    if "prediction" in data:
-                        st.metric("Diabetes Risk", data["prediction"])
-                else:
-                    st.error(f"❌ PDF analysis failed: {resp.status_code}")
-            except Exception as e:
-                st.error(f"⚠️ Error: {e}")
+    pdf_files = st.file_uploader("Upload PDF files", type=["pdf"], accept_multiple_files=True)
+    if pdf_files and st.button(" Analyze PDF"):
+        try:
+            files = [("files", (f.name, f.getvalue(), "application/pdf")) for f in pdf_files]
+            job, results = run_job("/jobs/pdf", files)
+            if job["status"] != "succeeded":
+                st.error(f"❌ PDF analysis failed: {job['error']}")
+            for data in results:
+                st.markdown(f"**{data['filename']}**")
+                if "error" in data:
+                    st.error(f"❌ PDF analysis failed: {data['error']}")
+                    continue
+                st.info(" PDF processed successfully")
+                df = pd.DataFrame(list(data["features"].items()), columns=["Feature", "Value"])
+                st.table(df)
+                st.metric("Diabetes Risk", data["prediction"])
+        except Exception as e:
+            st.error(f"⚠️ Error: {e}")
 
 with tab3:
     st.subheader("📋 Patient Records Database")
-    if st.button(" Refresh Records"):
-        st.session_state["records_refresh"] = True
-
-    if st.session_state.get("records_refresh"):
-        with st.spinner("Fetching patient records..."):
-            try:
-                resp = requests.get(f"{API_BASE}/records", timeout=15)
-                if resp.ok:
-                    records = resp.json()
-                    if records:
-                        st.success(f" Found {len(records)} patient records")
-                        df = pd.DataFrame(records)[[
-                            "id", "glucose", "blood_pressure", "bmi", 
-                            "age", "diabetes_pedigree_function","predicted", "created_at",
-                        ]]
-                        st.dataframe(df, use_container_width=True)
-                    else:
-                        st.info("📝 No records yet")
-                else:
-                    st.error(f"❌ Fetch failed: {resp.status_code} {resp.text}")
-            except Exception as e:
-                st.error(f"⚠️ Error: {e}")
-        st.session_state["records_refresh"] = False
+    # cursors of the pages before the current one; the last entry is the current page
+    cursors = st.session_state.setdefault("records_cursors", [None])
+    col_size, col_refresh = st.columns([1, 1])
+    page_size = col_size.selectbox("Rows per page", PAGE_SIZES, key="records_page_size", on_change=first_records_page)
+    if col_refresh.button(" Refresh Records"):
+        invalidate_records()
+        del cursors[1:]
+
+    try:
+        overall = fetch_record_stats("none")
+        if overall:
+            total = overall[0]
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Stored records", f"{total['count']:,}")
+            if total["prediction_rate"] is not None:
+                c2.metric("Predicted positive", f"{total['prediction_rate']:.1%}")
+            if total["accuracy"] is not None:
+                c3.metric("Accuracy (labelled rows)", f"{total['accuracy']:.1%}")
+        records, next_cursor = fetch_records_page(cursors[-1], page_size)
+        if records:
+            page = len(cursors)
+            st.caption(f"Page {page}: {len(records)} records, newest first")
+            st.dataframe(pd.DataFrame(records, columns=RECORD_FIELDS), use_container_width=True)
+            col_prev, col_next = st.columns([1, 1])
+            if col_prev.button("← Newer", disabled=page == 1):
+                cursors.pop()
+                st.rerun()
+            if col_next.button("Older →", disabled=next_cursor is None):
+                cursors.append(next_cursor)
+                st.rerun()
+        else:
+            st.info("📝 No records yet")
+    except requests.RequestException as e:
+        st.error(f"⚠️ Fetch failed: {e}")
 
 # ---- Research Chatbot ----
 st.header("🤖 Research Chatbot")
@@ -216,7 +308,7 @@ question = st.text_input("Ask about diabetes research or prevention")
 if st.button("💬 Ask"):
     with st.spinner("Thinking..."):
         try:
-            resp = requests.post(f"{API_BASE}/chat", json={"question": question}, timeout=30)
+            resp = get_http().post(f"{API_BASE}/chat", json={"question": question}, timeout=30)
             if resp.ok:
                 st.info(f"💡 {resp.json().get('answer', 'No answer')}")
             else:
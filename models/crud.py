@@ -1,10 +1,39 @@
-from sqlalchemy.orm import Session
-from .db import PatientRecord
+import math
+import os
+from datetime import datetime
+import numpy as np
+from sqlalchemy import insert,select
+from sqlalchemy.orm import Session,sessionmaker
+from backend.batcher import MicroBatcher
+from backend.metrics import span
+from . import partitions,rollups
+from .db import PatientRecord,SessionLocal
 from .schema import RecordCreate
-from typing import List,Optional
+from typing import Any,Dict,List,Optional,Sequence,Tuple
 
+# feature columns in model input order (same order as data.csv_pipeline.EXPECTED_FEATURES)
+FEATURE_COLUMNS=(
+    "pregnancies",
+    "glucose",
+    "blood_pressure",
+    "skin_thickness",
+    "insulin",
+    "bmi",
+    "diabetes_pedigree_function",
+    "age",
+)
+INT_COLUMNS={"pregnancies","age"}
+RECORD_COLUMNS=("id",)+FEATURE_COLUMNS+("outcome","predicted","created_at")
+BULK_INSERT_BATCH=10_000
+# opt-in group commit for single-record inserts: wait up to WRITE_BEHIND_MS for other
+# inserts and commit them in one transaction (0 = one transaction per record)
+WRITE_BEHIND_MS=float(os.getenv("WRITE_BEHIND_MS","0"))
+WRITE_BEHIND_MAX_ROWS=int(os.getenv("WRITE_BEHIND_MAX_ROWS","256"))
+
+@span("db.create_record")
 def create_record(db:Session,data:RecordCreate,predicted:Optional[int]=None)->PatientRecord:
 
+    created_at=datetime.utcnow()
     record=PatientRecord(
         pregnancies=data.pregnancies,
         glucose=data.glucose,
@@ -16,15 +45,151 @@ def create_record(db:Session,data:RecordCreate,predicted:Optional[int]=None)->Pa
         age=data.age,
         outcome=data.outcome,
         predicted=predicted,
+        created_at=created_at,
     )
     db.add(record)
+    rollups.apply(db,[record_row(data,predicted)],created_at.date())
     db.commit()
     db.refresh(record)
     return record
 
-def list_records(db: Session, limit: int = 50) -> List[PatientRecord]:
-    return db.query(PatientRecord).order_by(PatientRecord.id.desc()).limit(limit).all()
+def _optional_int(value)->Optional[int]:
+    if value is None or (isinstance(value,float) and math.isnan(value)):
+        return None
+    return int(value)
+
+@span("db.create_records_bulk")
+def create_records_bulk(
+    db:Session,
+    features:np.ndarray,
+    predicted:Sequence[int],
+    outcome:Optional[Sequence[Optional[int]]]=None,
+    batch_size:int=BULK_INSERT_BATCH,
+    commit:bool=True,
+)->List[int]:
+    """Insert an (n, 8) feature matrix with one executemany INSERT .. RETURNING id per batch.
+
+    Each batch is its own transaction; ids come back in input order. With `commit=False`
+    nothing is committed, so the caller can commit the rows together with other changes.
+    """
+    features=np.asarray(features)
+    columns=[
+        features[:,i].astype(np.int64).tolist() if name in INT_COLUMNS else features[:,i].astype(np.float64).tolist()
+        for i,name in enumerate(FEATURE_COLUMNS)
+    ]
+    predicted=[_optional_int(p) for p in predicted]
+    outcome=[None]*len(predicted) if outcome is None else [_optional_int(o) for o in outcome]
+    ids:List[int]=[]
+    for start in range(0,len(predicted),batch_size):
+        stop=start+batch_size
+        ids.extend(insert_rows(db,zip(*(col[start:stop] for col in columns),predicted[start:stop],outcome[start:stop]),commit=commit))
+    return ids
+
+ROW_KEYS=FEATURE_COLUMNS+("predicted","outcome")
+
+def insert_rows(db:Session,rows,commit:bool=True)->List[int]:
+    """Insert value tuples in ROW_KEYS order in one transaction; ids come back in input order.
+
+    The record rollups are updated in the same transaction.
+    """
+    table=PatientRecord.__table__
+    stmt=insert(table).returning(table.c.id,sort_by_parameter_order=True)
+    rows=list(rows)
+    created_at=datetime.utcnow()
+    ids=db.connection().execute(stmt,[dict(zip(ROW_KEYS,values),created_at=created_at) for values in rows]).scalars().all()
+    rollups.apply(db,rows,created_at.date())
+    if commit:
+        db.commit()
+    return list(ids)
+
+def make_write_buffer(session_factory:sessionmaker=SessionLocal,max_wait_ms:float=WRITE_BEHIND_MS,max_rows:int=WRITE_BEHIND_MAX_ROWS)->MicroBatcher:
+    """Group-commit buffer: `predict(row)` blocks until the row's transaction commits and returns its id."""
+    def flush(rows):
+        with session_factory() as db:
+            return insert_rows(db,rows)
+    return MicroBatcher(flush,max_batch_size=max_rows,max_wait_ms=max_wait_ms,collate=list,name="write-behind")
+
+write_buffer=make_write_buffer() if WRITE_BEHIND_MS>0 else None
+
+def record_row(data:RecordCreate,predicted:Optional[int]=None)->tuple:
+    return tuple(getattr(data,c) for c in FEATURE_COLUMNS)+(predicted,data.outcome)
+
+@span("db.create_record_id")
+def create_record_id(db:Session,data:RecordCreate,predicted:Optional[int]=None)->int:
+    """Insert one record and return its id, through the write-behind buffer when it is enabled."""
+    if write_buffer is None:
+        return create_record(db,data,predicted=predicted).id
+    return write_buffer.predict(record_row(data,predicted))
+
+@span("db.list_records")
+def list_records(
+    db:Session,
+    limit:int=50,
+    before_id:Optional[int]=None,
+    predicted:Optional[int]=None,
+    outcome:Optional[int]=None,
+    min_age:Optional[int]=None,
+    max_age:Optional[int]=None,
+    created_from:Optional[datetime]=None,
+    created_to:Optional[datetime]=None,
+    columns:Optional[Sequence[str]]=None,
+)->List[Dict[str,Any]]:
+    """Newest-first page of records as plain dicts.
 
+    Keyset pagination: pass the last `id` of the previous page as `before_id`. `columns`
+    projects the result (validated against RECORD_COLUMNS); `id` is always included.
+    Reads the hot table, then month partitions newest first, until the page is full;
+    partitions outside the created_at range or the cursor are never touched.
+    """
+    columns=list(columns or RECORD_COLUMNS)
+    unknown=[c for c in columns if c not in RECORD_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown record columns: {unknown}")
+    if "id" not in columns:
+        columns.insert(0,"id")
+    created_from,created_to=partitions.naive_utc(created_from),partitions.naive_utc(created_to)
 
+    items:List[Dict[str,Any]]=[]
+    for partition in partitions.readable_partitions(db,created_from,created_to,before_id):
+        # partitions hold increasing id ranges, so an older one cannot beat a full page
+        if len(items)>=limit and partition.max_id is not None and partition.max_id<items[limit-1]["id"]:
+            break
+        table=partition.table
+        stmt=select(*(table.c[c] for c in columns))
+        if before_id is not None:
+            stmt=stmt.where(table.c.id<before_id)
+        if predicted is not None:
+            stmt=stmt.where(table.c.predicted==predicted)
+        if outcome is not None:
+            stmt=stmt.where(table.c.outcome==outcome)
+        if min_age is not None:
+            stmt=stmt.where(table.c.age>=min_age)
+        if max_age is not None:
+            stmt=stmt.where(table.c.age<=max_age)
+        if created_from is not None:
+            stmt=stmt.where(table.c.created_at>=created_from)
+        if created_to is not None:
+            stmt=stmt.where(table.c.created_at<created_to)
+        stmt=stmt.order_by(table.c.id.desc()).limit(limit)
+        items.extend(dict(row) for row in db.execute(stmt).mappings())
+        items.sort(key=lambda item:item["id"],reverse=True)
+        del items[limit:]
+    return items
 
+def labeled_feature_matrix(db:Session,after_id:Optional[int]=None)->Tuple[np.ndarray,np.ndarray,Optional[int]]:
+    """(features, outcome, max id) of every record whose true outcome is known, archived months excluded.
 
+    With `after_id` only records with a larger id are read; partitions below it are skipped.
+    """
+    parts=[]
+    for partition in partitions.readable_partitions(db):
+        if after_id is not None and partition.max_id is not None and partition.max_id<=after_id:
+            continue
+        table=partition.table
+        stmt=select(table.c.id,*(table.c[c] for c in FEATURE_COLUMNS),table.c.outcome).where(table.c.outcome.is_not(None))
+        if after_id is not None:
+            stmt=stmt.where(table.c.id>after_id)
+        parts.append(np.array(db.execute(stmt).all(),dtype=np.float64).reshape(-1,len(FEATURE_COLUMNS)+2))
+    rows=np.concatenate(parts)
+    max_id=int(rows[:,0].max()) if len(rows) else None
+    return rows[:,1:-1],rows[:,-1].astype(np.int64),max_id
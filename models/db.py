@@ -1,18 +1,60 @@
 import os
 from datetime import datetime
 from typing import Generator
-from sqlalchemy import create_engine,Column,Integer,Float,DateTime
+from sqlalchemy import create_engine,event,inspect,Boolean,Column,Integer,Float,Date,DateTime,String,Table,Text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import declarative_base,sessionmaker,Session
 
 THIS_DIR=os.path.dirname("./data/diabetes.csv")
 DEFAULT_DB_PATH = os.path.join(THIS_DIR, "diabetes.db")
 DATABASE_URL=os.getenv("DATABASE_URL",f"sqlite:///{DEFAULT_DB_PATH}")
 
-engine=create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread":False} if DATABASE_URL.startswith("sqlite") else {},
+# WAL lets readers run alongside the single writer and turns each commit into an append.
+# synchronous=FULL fsyncs the WAL on every commit, so an acknowledged write survives power
+# loss. NORMAL only fsyncs at checkpoints: much cheaper commits, and the database stays
+# consistent, but the last committed transactions can be lost on power loss or an OS crash
+SQLITE_TUNED=os.getenv("SQLITE_TUNED","1")=="1"
+SQLITE_SYNCHRONOUS=os.getenv("SQLITE_SYNCHRONOUS","FULL").upper()
+if SQLITE_SYNCHRONOUS not in ("OFF","NORMAL","FULL","EXTRA"):
+    raise ValueError(f"SQLITE_SYNCHRONOUS must be OFF, NORMAL, FULL or EXTRA, not {SQLITE_SYNCHRONOUS!r}")
+SQLITE_MMAP_BYTES=int(os.getenv("SQLITE_MMAP_BYTES",str(256*1024*1024)))
+SQLITE_CACHE_KB=int(os.getenv("SQLITE_CACHE_KB","65536"))
+SQLITE_BUSY_TIMEOUT_MS=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS","5000"))
+# the FastAPI threadpool runs up to 40 sync endpoints at once
+DB_POOL_SIZE=int(os.getenv("DB_POOL_SIZE","20"))
+DB_MAX_OVERFLOW=int(os.getenv("DB_MAX_OVERFLOW","20"))
+
+SQLITE_PRAGMAS=(
+    ("journal_mode","WAL"),
+    ("synchronous",SQLITE_SYNCHRONOUS),
+    ("mmap_size",SQLITE_MMAP_BYTES),
+    ("cache_size",-SQLITE_CACHE_KB),
+    ("temp_store","MEMORY"),
+    ("busy_timeout",SQLITE_BUSY_TIMEOUT_MS),
 )
 
+def _apply_sqlite_pragmas(dbapi_connection,connection_record)->None:
+    cursor=dbapi_connection.cursor()
+    try:
+        for name,value in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def make_engine(url:str=DATABASE_URL,tuned:bool=SQLITE_TUNED)->Engine:
+    """Engine for `url`; SQLite files get the pragmas above on every new connection when `tuned`."""
+    if not url.startswith("sqlite"):
+        return create_engine(url,pool_size=DB_POOL_SIZE,max_overflow=DB_MAX_OVERFLOW,pool_pre_ping=True)
+    in_memory=url in ("sqlite://","sqlite:///:memory:") or "mode=memory" in url
+    pool_args={} if in_memory else {"pool_size":DB_POOL_SIZE,"max_overflow":DB_MAX_OVERFLOW}
+    new_engine=create_engine(url,connect_args={"check_same_thread":False},**pool_args)
+    if tuned and not in_memory:
+        event.listen(new_engine,"connect",_apply_sqlite_pragmas)
+    return new_engine
+
+engine=make_engine()
+
 SessionLocal=sessionmaker(autocommit=False,autoflush=False,bind=engine)
 Base=declarative_base()
 
@@ -27,13 +69,96 @@ class PatientRecord(Base):
     insulin = Column(Float, nullable=False)
     bmi = Column(Float, nullable=False)
     diabetes_pedigree_function = Column(Float, nullable=False)
-    age = Column(Integer, nullable=False)
-    outcome = Column(Integer, nullable=True)
-    predicted = Column(Integer, nullable=True)
-    created_at=Column(DateTime, default=datetime.utcnow, nullable=False)
+    # secondary indexes back the /records filters; SQLite appends the rowid to every
+    # index entry, so `filter = ? AND id < cursor ORDER BY id DESC` stays an index range scan
+    age = Column(Integer, nullable=False, index=True)
+    outcome = Column(Integer, nullable=True, index=True)
+    predicted = Column(Integer, nullable=True, index=True)
+    created_at=Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+# rollups of patient_records per (UTC day, age band), maintained in the inserting
+# transaction so /records/stats reads O(buckets) rows instead of scanning every record
+AGE_BAND_WIDTH=10
+MAX_AGE_BAND=80
+ROLLUP_FEATURES=tuple(
+    c.name for c in PatientRecord.__table__.columns if c.name not in ("id","outcome","predicted","created_at")
+)
+ROLLUP_COUNTS=("n","predicted_n","predicted_pos","outcome_n","outcome_pos","tp","fp","tn","fn")
+ROLLUP_STATS=("sum","sumsq","min","max")
+
+record_rollups=Table(
+    "record_rollups",
+    Base.metadata,
+    Column("day",Date,primary_key=True),
+    # lower bound of the band; the last band is open ended
+    Column("age_band",Integer,primary_key=True),
+    *(Column(name,Integer,nullable=False,default=0) for name in ROLLUP_COUNTS),
+    *(Column(f"{feature}_{stat}",Float,nullable=True) for feature in ROLLUP_FEATURES for stat in ROLLUP_STATS),
+)
+
+# months of patient_records moved out of the hot table by models/partitions.py: first into
+# a per-month table ("warm"), later into a compressed Parquet archive ("archived")
+record_partitions=Table(
+    "record_partitions",
+    Base.metadata,
+    Column("name",String(64),primary_key=True),
+    # first day of the UTC month the partition holds
+    Column("month",Date,nullable=False,unique=True),
+    Column("state",String(16),nullable=False,default="warm"),
+    Column("rows",Integer,nullable=False,default=0),
+    Column("min_id",Integer,nullable=True),
+    Column("max_id",Integer,nullable=True),
+    Column("archive_path",Text,nullable=True),
+    Column("archived_at",DateTime,nullable=True),
+)
+
+class Job(Base):
+    """Background batch-scoring job; progress is updated by the worker process as it goes."""
+    __tablename__="jobs"
+
+    id=Column(String(32),primary_key=True)
+    kind=Column(String(16),nullable=False)
+    # queued -> running -> succeeded | failed
+    status=Column(String(16),nullable=False,default="queued",index=True)
+    store=Column(Boolean,nullable=False,default=False)
+    model_version=Column(String(64),nullable=True)
+    total=Column(Integer,nullable=True)
+    processed=Column(Integer,nullable=False,default=0)
+    failed=Column(Integer,nullable=False,default=0)
+    error=Column(Text,nullable=True)
+    # API process that dispatched the job; it (or its worker) renews the lease while the job
+    # is pending, and any process may claim the job once the lease has expired
+    owner=Column(String(32),nullable=True)
+    lease_until=Column(DateTime,nullable=True)
+    created_at=Column(DateTime,default=datetime.utcnow,nullable=False)
+    started_at=Column(DateTime,nullable=True)
+    finished_at=Column(DateTime,nullable=True)
+
+def _add_missing_columns() -> None:
+    """Add nullable columns introduced after a table was first created (no migration tool here)."""
+    inspector=inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing={c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                kind=column.type.compile(dialect=engine.dialect)
+                try:
+                    with engine.begin() as conn:
+                        conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {kind}")
+                except DBAPIError:
+                    # another worker process added it first
+                    if column.name not in {c["name"] for c in inspect(engine).get_columns(table.name)}:
+                        raise
 
 def init_db() -> None:
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    # create_all skips the indexes of tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 def get_db()->Generator[Session,None,None]:
     db=SessionLocal()
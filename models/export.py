@@ -0,0 +1,175 @@
+import io
+from datetime import datetime
+from typing import IO, TYPE_CHECKING, Iterator, List, Optional, Sequence, Union
+
+from sqlalchemy import Float, Integer, select
+from sqlalchemy.orm import Session
+
+from backend.metrics import span
+from .db import PatientRecord
+from .partitions import Partition, naive_utc, readable_partitions
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+EXPORT_CHUNK_ROWS = 100_000
+FORMATS = ("parquet", "arrow")
+MEDIA_TYPES = {"parquet": "application/vnd.apache.parquet", "arrow": "application/vnd.apache.arrow.stream"}
+PARQUET_COMPRESSION = "zstd"
+
+
+def arrow_schema() -> "pa.Schema":
+    """Arrow schema mirroring the patient_records columns, nullability included."""
+    import pyarrow as pa
+
+    fields = []
+    for column in PatientRecord.__table__.columns:
+        if isinstance(column.type, Integer):
+            type_ = pa.int64()
+        elif isinstance(column.type, Float):
+            type_ = pa.float64()
+        else:
+            # created_at is a naive UTC timestamp (datetime.utcnow)
+            type_ = pa.timestamp("us")
+        fields.append(pa.field(column.name, type_, nullable=column.nullable))
+    return pa.schema(fields)
+
+
+def iter_record_batches(
+    db: Session,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    chunk_rows: int = EXPORT_CHUNK_ROWS,
+    schema: Optional["pa.Schema"] = None,
+    partitions: Optional[Sequence[Partition]] = None,
+) -> Iterator["pa.RecordBatch"]:
+    """Yield records as Arrow record batches of at most `chunk_rows` rows, oldest partition
+    first and in id order within each (default: every partition still in the database).
+
+    Keyset pagination on the primary key: each chunk is one indexed range query, so memory
+    stays flat and later chunks cost the same as the first. `created_to` is exclusive.
+    """
+    import pyarrow as pa
+
+    schema = schema or arrow_schema()
+    created_from, created_to = naive_utc(created_from), naive_utc(created_to)
+    if partitions is None:
+        partitions = readable_partitions(db, created_from, created_to)[::-1]
+    for partition in partitions:
+        table = partition.table
+        base = select(*(table.c[name] for name in schema.names))
+        if created_from is not None:
+            base = base.where(table.c.created_at >= created_from)
+        if created_to is not None:
+            base = base.where(table.c.created_at < created_to)
+        last_id = None
+        while True:
+            stmt = base if last_id is None else base.where(table.c.id > last_id)
+            with span("db.export_chunk"):
+                rows = db.execute(stmt.order_by(table.c.id).limit(chunk_rows)).all()
+            if not rows:
+                break
+            columns = list(zip(*rows))
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            )
+            if len(rows) < chunk_rows:
+                break
+            last_id = rows[-1][0]
+
+
+def write_records(
+    db: Session,
+    sink: Union[str, IO[bytes]],
+    fmt: str = "parquet",
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    chunk_rows: int = EXPORT_CHUNK_ROWS,
+    partitions: Optional[Sequence[Partition]] = None,
+) -> int:
+    """Write the selected records to `sink` (path or binary file); returns the rows written."""
+    total = 0
+    for batch in _write_batches(db, sink, fmt, created_from, created_to, chunk_rows, partitions):
+        total += batch
+    return total
+
+
+def _write_batches(db, sink, fmt, created_from, created_to, chunk_rows, partitions=None) -> Iterator[int]:
+    """Write chunk by chunk, yielding the row count after each one so callers can drain `sink`."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}")
+    schema = arrow_schema()
+    if fmt == "parquet":
+        # one row group per chunk; readers can skip row groups by id/created_at statistics
+        writer = pq.ParquetWriter(sink, schema, compression=PARQUET_COMPRESSION)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    try:
+        for batch in iter_record_batches(db, created_from, created_to, chunk_rows, schema, partitions):
+            writer.write_batch(batch)
+            yield batch.num_rows
+    finally:
+        writer.close()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that keeps bytes until `drain` hands them to the HTTP response."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_records(
+    db: Session,
+    fmt: str = "parquet",
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    chunk_rows: int = EXPORT_CHUNK_ROWS,
+) -> Iterator[bytes]:
+    """Encoded export as a byte stream for a streaming response; holds at most one chunk."""
+    sink = _ChunkSink()
+    for _ in _write_batches(db, sink, fmt, created_from, created_to, chunk_rows):
+        data = sink.drain()
+        if data:
+            yield data
+    # the Parquet footer / end-of-stream marker is written on close
+    data = sink.drain()
+    if data:
+        yield data
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from .db import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Export patient_records to Parquet or an Arrow IPC stream.")
+    parser.add_argument("out", help="output file")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="default: from the file extension, else parquet")
+    parser.add_argument("--created-from", type=datetime.fromisoformat, default=None, help="UTC, inclusive")
+    parser.add_argument("--created-to", type=datetime.fromisoformat, default=None, help="UTC, exclusive")
+    parser.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS)
+    args = parser.parse_args()
+    fmt = args.format or ("arrow" if args.out.endswith((".arrow", ".arrows")) else "parquet")
+    init_db()
+    start = time.perf_counter()
+    with SessionLocal() as session:
+        rows = write_records(session, args.out, fmt, args.created_from, args.created_to, args.chunk_rows)
+    print(f"Exported {rows} records to {args.out} ({fmt}) in {time.perf_counter() - start:.2f}s")
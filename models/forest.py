@@ -0,0 +1,290 @@
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# rows evaluated together per block; keeps the (rows x trees) index matrix cache friendly
+BLOCK_ROWS = 1024
+# from this many rows up, predict_proba hands the batch to the attached sklearn estimator,
+# whose Cython tree walk overtakes the NumPy one (0 keeps every batch on the compiled path)
+SKLEARN_MIN_ROWS = int(os.getenv("FOREST_SKLEARN_MIN_ROWS", "500"))
+
+_estimator_lock = threading.Lock()
+
+
+class CompiledForest:
+    """Array-backed random forest evaluator.
+
+    All fitted trees are flattened into one set of contiguous node arrays (leaves point
+    back to themselves). A batch of rows walks every tree in lock-step, one vectorized
+    step per tree level, with no Python-level per-row or per-tree loop.
+
+    That beats sklearn's per-call overhead on small batches but not its Cython loop on
+    large ones, so a fitted estimator can be attached (`with_estimator`) to serve batches
+    of SKLEARN_MIN_ROWS rows or more, or its path (`with_estimator_path`) to unpickle it
+    on the first such batch. Both paths return the same probabilities.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        classes: np.ndarray,
+        max_depth: int,
+        children: Optional[np.ndarray] = None,
+        is_leaf: Optional[np.ndarray] = None,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        # derived from left/right, but saved with them so loads memory-map these as well
+        if is_leaf is None:
+            is_leaf = self.left == np.arange(len(self.left), dtype=self.left.dtype)
+        if children is None:
+            # interleaved [left, right] so a step is one gather at 2 * node + went_right
+            children = np.stack([left, right], axis=1).ravel().astype(np.int32)
+        self._is_leaf = is_leaf
+        self._children = children
+        self.estimator = None
+        self.estimator_path: Optional[str] = None
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledForest":
+        """Flatten a fitted sklearn RandomForestClassifier."""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for est in model.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            node_ids = np.arange(offset, offset + n, dtype=np.int32)
+            is_leaf = tree.children_left == -1
+            feat = tree.feature.astype(np.int32)
+            feat[is_leaf] = 0
+            left = np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32)
+            right = np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32)
+            val = tree.value[:, 0, :].astype(np.float64)
+            totals = val.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1.0
+            features.append(feat)
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(left)
+            rights.append(right)
+            values.append(val / totals)
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.int32),
+            classes=np.asarray(model.classes_),
+            max_depth=max_depth,
+        )
+
+    def with_estimator(self, model) -> "CompiledForest":
+        """Attach the fitted sklearn forest these arrays came from, for large batches.
+
+        Takes ownership of `model`: pass a private copy (e.g. freshly loaded), not one the
+        caller keeps using.
+        """
+        if model is not None and SKLEARN_MIN_ROWS > 0:
+            # the arrays carry no column names either; dropping the fitted ones keeps sklearn
+            # from warning on every ndarray batch (only this private copy is touched)
+            if hasattr(model, "feature_names_in_"):
+                del model.feature_names_in_
+            self.estimator = model
+        return self
+
+    def with_estimator_path(self, path: str) -> "CompiledForest":
+        """Attach the sklearn forest saved at `path` lazily: it is unpickled on the first
+        batch of SKLEARN_MIN_ROWS rows or more, so small-batch workers never load it."""
+        if SKLEARN_MIN_ROWS > 0 and os.path.exists(path):
+            self.estimator_path = path
+        return self
+
+    def _large_batch_estimator(self):
+        if self.estimator is None and self.estimator_path is not None:
+            with _estimator_lock:
+                if self.estimator is None and self.estimator_path is not None:
+                    path, self.estimator_path = self.estimator_path, None
+                    self.with_estimator(self._load_estimator(path))
+        return self.estimator
+
+    def _load_estimator(self, path: str):
+        """The sklearn forest at `path`, or None if it is not the one these arrays came from."""
+        import joblib
+        model = joblib.load(path)
+        nodes = sum(est.tree_.node_count for est in model.estimators_)
+        if len(model.estimators_) != self.n_trees or nodes != len(self.left):
+            print(f"Ignoring {path}: it does not match the compiled forest")
+            return None
+        return model
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "left": self.left,
+            "right": self.right,
+            "value": self.value,
+            "roots": self.roots,
+            "classes": self.classes_,
+            "max_depth": np.asarray(self.max_depth),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "CompiledForest":
+        return cls(
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            left=arrays["left"],
+            right=arrays["right"],
+            value=arrays["value"],
+            roots=arrays["roots"],
+            classes=arrays["classes"],
+            max_depth=int(arrays["max_depth"]),
+            children=arrays.get("children"),
+            is_leaf=arrays.get("is_leaf"),
+        )
+
+    def fingerprint(self) -> str:
+        """Short content hash of the fitted arrays, used as the model version."""
+        digest = hashlib.sha1()
+        for name, arr in sorted(self.to_arrays().items()):
+            digest.update(name.encode())
+            digest.update(np.ascontiguousarray(arr).tobytes())
+        return digest.hexdigest()[:12]
+
+    def save(self, path: str) -> None:
+        # uncompressed so the arrays can later be memory-mapped on load
+        import joblib
+        joblib.dump({**self.to_arrays(), "children": self._children, "is_leaf": self._is_leaf}, path)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = None) -> "CompiledForest":
+        import joblib
+        return cls.from_arrays(joblib.load(path, mmap_mode=mmap_mode))
+
+    def _as_matrix(self, X) -> np.ndarray:
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return X.astype(np.float64)
+
+    def _apply_block(self, xb: np.ndarray) -> np.ndarray:
+        n_rows, n_features = xb.shape
+        # one flat slot per (row, tree) pair; pairs drop out of the walk once they hit a leaf
+        leaves = np.tile(self.roots, n_rows)
+        pos = np.flatnonzero(~self._is_leaf.take(leaves)).astype(np.int32)
+        nodes = leaves[pos]
+        xbase = (pos // self.n_trees) * n_features
+        x = xb.ravel()
+        for _ in range(self.max_depth):
+            if not len(nodes):
+                break
+            went_right = x.take(xbase + self.feature.take(nodes)) > self.threshold.take(nodes)
+            nodes = self._children.take(2 * nodes + went_right)
+            done = self._is_leaf.take(nodes)
+            if done.any():
+                leaves[pos[done]] = nodes[done]
+                keep = ~done
+                nodes, pos, xbase = nodes[keep], pos[keep], xbase[keep]
+        return leaves.reshape(n_rows, self.n_trees)
+
+    def apply(self, X) -> np.ndarray:
+        """Return the global leaf index reached in every tree, shape (n_rows, n_trees)."""
+        X = self._as_matrix(X)
+        out = np.empty((X.shape[0], self.n_trees), dtype=np.int32)
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            out[start:start + BLOCK_ROWS] = self._apply_block(X[start:start + BLOCK_ROWS])
+        return out
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = self._as_matrix(X)
+        if X.shape[0] >= SKLEARN_MIN_ROWS:
+            estimator = self._large_batch_estimator()
+            if estimator is not None:
+                return estimator.predict_proba(X)
+        out = np.empty((X.shape[0], len(self.classes_)), dtype=np.float64)
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            leaves = self._apply_block(X[start:start + BLOCK_ROWS])
+            out[start:start + BLOCK_ROWS] = self.value.take(leaves, axis=0).mean(axis=1)
+        return out
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def positive_index(self) -> int:
+        """Column of class 1 (the diabetic outcome) in predict_proba; the last class otherwise."""
+        matches = np.flatnonzero(self.classes_ == 1)
+        return int(matches[0]) if len(matches) else len(self.classes_) - 1
+
+    def _explain_block(self, xb: np.ndarray, vk: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        n_rows, n_features = xb.shape
+        leaves = np.tile(self.roots, n_rows)
+        pos = np.flatnonzero(~self._is_leaf.take(leaves)).astype(np.int32)
+        nodes = leaves[pos]
+        xbase = (pos // self.n_trees) * n_features
+        x = xb.ravel()
+        slots, deltas = [], []
+        for _ in range(self.max_depth):
+            if not len(nodes):
+                break
+            feat = self.feature.take(nodes)
+            slot = xbase + feat
+            went_right = x.take(slot) > self.threshold.take(nodes)
+            children = self._children.take(2 * nodes + went_right)
+            # the step from a node to its child is credited to the feature it split on
+            slots.append(slot)
+            deltas.append(vk.take(children) - vk.take(nodes))
+            nodes = children
+            done = self._is_leaf.take(nodes)
+            if done.any():
+                leaves[pos[done]] = nodes[done]
+                keep = ~done
+                nodes, pos, xbase = nodes[keep], pos[keep], xbase[keep]
+        contributions = np.bincount(
+            np.concatenate(slots) if slots else np.empty(0, dtype=np.int64),
+            weights=np.concatenate(deltas) if deltas else None,
+            minlength=n_rows * n_features,
+        )
+        return leaves.reshape(n_rows, self.n_trees), contributions.reshape(n_rows, n_features) / self.n_trees
+
+    def explain(self, X, class_index: Optional[int] = None) -> Tuple[np.ndarray, float, np.ndarray]:
+        """(predict_proba, bias, contributions) with per-feature contributions to one class.
+
+        Decomposes each tree's path (Saabas): moving from a node to its child adds the
+        change in the class fraction to the feature the node split on. Averaged over trees,
+        `bias + contributions.sum(axis=1)` equals `predict_proba(X)[:, class_index]`; bias
+        is the class fraction at the roots. Paths of all rows and trees are walked together,
+        one vectorized step per level, as in `apply`. Default class: `positive_index()`.
+        """
+        X = self._as_matrix(X)
+        k = self.positive_index() if class_index is None else class_index
+        vk = np.ascontiguousarray(self.value[:, k])
+        proba = np.empty((X.shape[0], len(self.classes_)), dtype=np.float64)
+        contributions = np.empty(X.shape, dtype=np.float64)
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            leaves, contributions[start:start + BLOCK_ROWS] = self._explain_block(X[start:start + BLOCK_ROWS], vk)
+            proba[start:start + BLOCK_ROWS] = self.value.take(leaves, axis=0).mean(axis=1)
+        return proba, float(vk.take(self.roots).mean()), contributions
@@ -0,0 +1,265 @@
+"""Monthly partitions of patient_records and the compaction job that maintains them.
+
+`patient_records` stays the hot table that every insert goes to. `roll` moves whole UTC
+months older than HOT_MONTHS into per-month tables (`patient_records_YYYYMM`, "warm"),
+and `archive` writes warm months older than RETENTION_MONTHS to zstd Parquet files and
+drops their tables ("archived"). The `record_partitions` table tracks every moved month
+with its id range, which readers use to skip partitions.
+
+The newest row never leaves the hot table: SQLite hands out max(rowid) + 1 as the next id,
+so an emptied table would start reusing ids that already live in a partition. Rollups are
+left untouched, so /records/stats still covers archived months.
+
+    python -m models.partitions [--hot-months 2] [--retention-months 24] [--vacuum]
+"""
+import os
+from datetime import date, datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, Index, MetaData, Table, and_, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from .db import PatientRecord, record_partitions
+
+# months, counting the current one, that stay in the hot table
+HOT_MONTHS = max(1, int(os.getenv("PARTITION_HOT_MONTHS", "2")))
+# months kept queryable in the database; older ones are archived (0 = never archive)
+RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", "24"))
+ARCHIVE_DIR = os.getenv("PARTITION_ARCHIVE_DIR", os.path.join("data", "archive"))
+# rows moved per transaction, so API inserts are never blocked for long
+MOVE_CHUNK_ROWS = 50_000
+
+HOT_TABLE = PatientRecord.__table__
+INDEXED_COLUMNS = ("age", "outcome", "predicted", "created_at")
+# partition tables are created by `roll` when a month is first moved, not by init_db
+_partition_metadata = MetaData()
+
+
+class Partition(NamedTuple):
+    table: Table
+    # first day of the month; None for the hot table
+    month: Optional[date]
+    min_id: Optional[int]
+    max_id: Optional[int]
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"patient_records_{month:%Y%m}"
+
+
+def partition_table(name: str) -> Table:
+    """Table object of a month partition: the hot table's columns and indexes under `name`."""
+    if name in _partition_metadata.tables:
+        return _partition_metadata.tables[name]
+    table = Table(
+        name,
+        _partition_metadata,
+        *(Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable, autoincrement=False) for c in HOT_TABLE.columns),
+    )
+    for column in INDEXED_COLUMNS:
+        Index(f"ix_{name}_{column}", table.c[column])
+    return table
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """`value` in the form created_at is stored in: naive UTC (aware values are converted)."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def readable_partitions(
+    db: Session,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+) -> List[Partition]:
+    """Hot table first, then warm partitions newest first, minus those the filters rule out.
+
+    `created_to` is exclusive, as in list_records. Archived months are not readable here.
+    """
+    created_from, created_to = naive_utc(created_from), naive_utc(created_to)
+    stmt = select(record_partitions).where(record_partitions.c.state == "warm").order_by(record_partitions.c.month.desc())
+    partitions = [Partition(HOT_TABLE, None, None, None)]
+    for row in db.execute(stmt).mappings():
+        start, end = _month_bounds(row["month"])
+        if (created_from is not None and end <= created_from) or (created_to is not None and created_to <= start):
+            continue
+        if before_id is not None and row["min_id"] is not None and row["min_id"] >= before_id:
+            continue
+        partitions.append(Partition(partition_table(row["name"]), row["month"], row["min_id"], row["max_id"]))
+    return partitions
+
+
+def archived_months(db: Session) -> List[date]:
+    stmt = select(record_partitions.c.month).where(record_partitions.c.state == "archived").order_by(record_partitions.c.month)
+    return list(db.scalars(stmt))
+
+
+def outside_months(column, months: List[date]):
+    """Condition excluding the given months from a date or datetime column (None: nothing to exclude)."""
+    if not months:
+        return None
+    if isinstance(column.type, DateTime):
+        bounds = [_month_bounds(month) for month in months]
+    else:
+        bounds = [(month, add_months(month, 1)) for month in months]
+    return ~or_(*(and_(column >= start, column < end) for start, end in bounds))
+
+
+def _month_bounds(month: date) -> Tuple[datetime, datetime]:
+    start = datetime.combine(month, datetime.min.time())
+    return start, datetime.combine(add_months(month, 1), datetime.min.time())
+
+
+def _move_month(db: Session, month: date, newest_id: int) -> int:
+    """Move one month of hot rows (all but the newest row) into its partition, chunk by chunk."""
+    name = partition_name(month)
+    table = partition_table(name)
+    table.create(db.connection(), checkfirst=True)
+    start, end = _month_bounds(month)
+    in_month = and_(HOT_TABLE.c.created_at >= start, HOT_TABLE.c.created_at < end, HOT_TABLE.c.id < newest_id)
+    p = record_partitions.c
+    meta = db.execute(select(p.rows, p.min_id, p.max_id).where(p.name == name)).first()
+    if meta is None:
+        db.execute(insert(record_partitions).values(name=name, month=month, state="warm", rows=0))
+        rows, min_id, max_id = 0, None, None
+    else:
+        rows, min_id, max_id = meta
+    moved = 0
+    while True:
+        ids = db.execute(select(HOT_TABLE.c.id).where(in_month).order_by(HOT_TABLE.c.id).limit(MOVE_CHUNK_ROWS)).scalars().all()
+        if not ids:
+            break
+        chunk = and_(in_month, HOT_TABLE.c.id <= ids[-1])
+        # copy and delete in one transaction: a row is always in exactly one table
+        db.execute(insert(table).from_select([c.name for c in HOT_TABLE.columns], select(*HOT_TABLE.columns).where(chunk)))
+        db.execute(delete(HOT_TABLE).where(chunk))
+        rows += len(ids)
+        min_id = ids[0] if min_id is None else min(min_id, ids[0])
+        max_id = ids[-1] if max_id is None else max(max_id, ids[-1])
+        db.execute(update(record_partitions).where(p.name == name).values(rows=rows, min_id=min_id, max_id=max_id))
+        db.commit()
+        moved += len(ids)
+    db.commit()
+    return moved
+
+
+def roll(db: Session, hot_months: int = HOT_MONTHS, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Move hot rows of months before the last `hot_months` into month partitions; returns rows per partition."""
+    cutoff = add_months(month_start(now or datetime.utcnow()), -(max(1, hot_months) - 1))
+    cutoff_at = datetime.combine(cutoff, datetime.min.time())
+    newest_id = db.scalar(select(func.max(HOT_TABLE.c.id)))
+    if newest_id is None:
+        return {}
+    archived = set(archived_months(db))
+    moved: Dict[str, int] = {}
+    after: Optional[datetime] = None
+    while True:
+        stmt = select(func.min(HOT_TABLE.c.created_at)).where(HOT_TABLE.c.created_at < cutoff_at, HOT_TABLE.c.id < newest_id)
+        if after is not None:
+            stmt = stmt.where(HOT_TABLE.c.created_at >= after)
+        oldest = db.scalar(stmt)
+        if oldest is None:
+            break
+        month = month_start(oldest)
+        if month in archived:
+            # a late row for a month that is already archived stays hot rather than reopening it
+            print(f"Skipping rows for archived month {month:%Y-%m}")
+        else:
+            moved[partition_name(month)] = _move_month(db, month, newest_id)
+        after = datetime.combine(add_months(month, 1), datetime.min.time())
+    return moved
+
+
+def archive(
+    db: Session,
+    retention_months: int = RETENTION_MONTHS,
+    now: Optional[datetime] = None,
+    archive_dir: str = ARCHIVE_DIR,
+) -> Dict[str, str]:
+    """Write warm partitions older than `retention_months` to Parquet and drop their tables.
+
+    The archive is written to a temp file, its row count checked against the partition and
+    then renamed into place before the table is dropped. Returns archive path per partition.
+    """
+    if retention_months <= 0:
+        return {}
+    import pyarrow.parquet as pq
+
+    from .export import write_records
+
+    cutoff = add_months(month_start(now or datetime.utcnow()), -(retention_months - 1))
+    p = record_partitions.c
+    rows = db.execute(select(record_partitions).where(p.state == "warm", p.month < cutoff).order_by(p.month)).mappings().all()
+    archived: Dict[str, str] = {}
+    os.makedirs(archive_dir, exist_ok=True)
+    for row in rows:
+        name = row["name"]
+        table = partition_table(name)
+        path = os.path.join(archive_dir, f"{name}.parquet")
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        try:
+            written = write_records(db, tmp_path, "parquet", partitions=[Partition(table, row["month"], row["min_id"], row["max_id"])])
+            stored = db.scalar(select(func.count()).select_from(table))
+            if written != stored or pq.ParquetFile(tmp_path).metadata.num_rows != stored:
+                raise RuntimeError(f"archive of {name} has {written} rows, the table {stored}")
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        table.drop(db.connection())
+        db.execute(update(record_partitions).where(p.name == name).values(
+            state="archived", archive_path=path, archived_at=datetime.utcnow(), rows=stored,
+        ))
+        db.commit()
+        archived[name] = path
+    return archived
+
+
+def status(db: Session) -> List[dict]:
+    hot_rows = db.scalar(select(func.count()).select_from(HOT_TABLE))
+    items = [{"name": HOT_TABLE.name, "state": "hot", "month": None, "rows": hot_rows}]
+    for row in db.execute(select(record_partitions).order_by(record_partitions.c.month.desc())).mappings():
+        item = dict(row)
+        item["month"] = row["month"].isoformat()
+        item["archived_at"] = row["archived_at"].isoformat() if row["archived_at"] else None
+        items.append(item)
+    return items
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from .db import SessionLocal, engine, init_db
+
+    parser = argparse.ArgumentParser(description="Move old months of patient_records into partitions and archive expired ones.")
+    parser.add_argument("--hot-months", type=int, default=HOT_MONTHS)
+    parser.add_argument("--retention-months", type=int, default=RETENTION_MONTHS, help="0 keeps every month in the database")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--vacuum", action="store_true", help="reclaim the space of moved and dropped rows afterwards (SQLite)")
+    args = parser.parse_args()
+    init_db()
+    start = time.perf_counter()
+    with SessionLocal() as session:
+        for name, count in roll(session, args.hot_months).items():
+            print(f"Moved {count} rows to {name}")
+        for name, path in archive(session, args.retention_months, archive_dir=args.archive_dir).items():
+            print(f"Archived {name} to {path}")
+        print(f"Compaction took {time.perf_counter() - start:.2f}s")
+        for item in status(session):
+            print(f"{item['name']:<26} {item['state']:<9} {item['rows']:>10}")
+    if args.vacuum and engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
@@ -0,0 +1,161 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from .forest import CompiledForest
+
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", os.path.join(MODELS_DIR, "registry"))
+# artifacts from before the registry existed; used when the registry is empty
+LEGACY_MODEL_PATH = os.path.join(MODELS_DIR, "model.joblib")
+LEGACY_FOREST_PATH = os.path.join(MODELS_DIR, "forest.joblib")
+
+CURRENT_FILE = "CURRENT"
+SKLEARN_FILE = "model.joblib"
+FOREST_FILE = "forest.joblib"
+META_FILE = "meta.json"
+BASELINE_FILE = "drift_baseline.json"
+
+
+class ModelRegistry:
+    """Directory of immutable, versioned model artifacts plus a `CURRENT` pointer.
+
+    Layout: `<root>/<version>/{model.joblib,forest.joblib,meta.json,drift_baseline.json}` and `<root>/CURRENT`
+    holding the active version name. Versions are published by renaming a fully written
+    temp directory and activated by atomically replacing `CURRENT`, so readers never
+    see a half-written model.
+    """
+
+    def __init__(self, root: str = REGISTRY_DIR):
+        self.root = root
+
+    @property
+    def current_path(self) -> str:
+        return os.path.join(self.root, CURRENT_FILE)
+
+    def versions(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith(".") and os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def current_version(self) -> Optional[str]:
+        try:
+            with open(self.current_path) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            versions = self.versions()
+            return versions[-1] if versions else None
+        return version or None
+
+    def publish(
+        self,
+        model,
+        activate: bool = True,
+        version: Optional[str] = None,
+        meta: Optional[dict] = None,
+        baseline: Optional[dict] = None,
+    ) -> str:
+        """Store a fitted sklearn forest, its compiled arrays and optionally the training
+        data's drift baseline as a new version."""
+        # microseconds, so publishes within the same second get distinct names
+        version = version or datetime.utcnow().strftime("v%Y%m%d-%H%M%S-%f")
+        final_dir = os.path.join(self.root, version)
+        if os.path.exists(final_dir):
+            raise ValueError(f"Model version already exists: {version}")
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".publish-", dir=self.root)
+        try:
+            import joblib
+            joblib.dump(model, os.path.join(tmp_dir, SKLEARN_FILE))
+            forest = CompiledForest.from_sklearn(model)
+            forest.save(os.path.join(tmp_dir, FOREST_FILE))
+            info = {"version": version, "fingerprint": forest.fingerprint(), "created_at": datetime.utcnow().isoformat()}
+            info.update(meta or {})
+            with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+                json.dump(info, f, indent=2)
+            if baseline is not None:
+                with open(os.path.join(tmp_dir, BASELINE_FILE), "w") as f:
+                    json.dump(baseline, f)
+            try:
+                os.rename(tmp_dir, final_dir)
+            except OSError:
+                # published concurrently under the same name since the check above
+                if os.path.exists(final_dir):
+                    raise ValueError(f"Model version already exists: {version}") from None
+                raise
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version: str) -> None:
+        if version not in self.versions():
+            raise ValueError(f"Unknown model version: {version}")
+        fd, tmp_path = tempfile.mkstemp(prefix=".current-", dir=self.root)
+        with os.fdopen(fd, "w") as f:
+            f.write(version + "\n")
+        os.replace(tmp_path, self.current_path)
+
+    def meta(self, version: str) -> dict:
+        try:
+            with open(os.path.join(self.root, version, META_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": version}
+
+    def baseline(self, version: str) -> Optional[dict]:
+        """Drift baseline stored with `version`, or None (legacy models, older versions)."""
+        try:
+            with open(os.path.join(self.root, version, BASELINE_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def load(self, version: Optional[str] = None, mmap_mode: Optional[str] = "r") -> Tuple[str, CompiledForest]:
+        """Load a version (default: current) as a compiled forest.
+
+        With `mmap_mode="r"` the node arrays are memory-mapped read-only, so every worker
+        process serving the same version shares one copy in the page cache. The sklearn
+        estimator is only unpickled on the first large batch (`with_estimator_path`).
+        """
+        version = version or self.current_version()
+        if version is None:
+            return load_legacy_model(mmap_mode)
+        version_dir = os.path.join(self.root, version)
+        forest_path = os.path.join(version_dir, FOREST_FILE)
+        sklearn_path = os.path.join(version_dir, SKLEARN_FILE)
+        if os.path.exists(forest_path):
+            forest = CompiledForest.load(forest_path, mmap_mode=mmap_mode)
+            return version, forest.with_estimator_path(sklearn_path)
+        if os.path.exists(sklearn_path):
+            import joblib
+            model = joblib.load(sklearn_path)
+            return version, CompiledForest.from_sklearn(model).with_estimator(model)
+        raise FileNotFoundError(f"No model artifacts for version {version} in {version_dir}")
+
+
+def load_legacy_model(mmap_mode: Optional[str] = "r") -> Tuple[str, CompiledForest]:
+    """Load models/forest.joblib or models/model.joblib; the version is the content fingerprint."""
+    if os.path.exists(LEGACY_FOREST_PATH) and (
+        not os.path.exists(LEGACY_MODEL_PATH)
+        or os.path.getmtime(LEGACY_FOREST_PATH) >= os.path.getmtime(LEGACY_MODEL_PATH)
+    ):
+        forest = CompiledForest.load(LEGACY_FOREST_PATH, mmap_mode=mmap_mode)
+        forest.with_estimator_path(LEGACY_MODEL_PATH)
+    elif os.path.exists(LEGACY_MODEL_PATH):
+        # joblib (and sklearn, to unpickle) are only imported when an artifact is actually loaded
+        import joblib
+        model = joblib.load(LEGACY_MODEL_PATH)
+        forest = CompiledForest.from_sklearn(model).with_estimator(model)
+    else:
+        raise FileNotFoundError("No model found. Run the training script to generate one.")
+    return f"legacy-{forest.fingerprint()}", forest
+
@@ -0,0 +1,238 @@
+import functools
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import partitions
+from .db import (
+    AGE_BAND_WIDTH,
+    MAX_AGE_BAND,
+    ROLLUP_COUNTS,
+    ROLLUP_FEATURES,
+    PatientRecord,
+    record_rollups,
+)
+
+# value tuples handed to `apply` are in this order (same as crud.ROW_KEYS)
+ROW_KEYS = ROLLUP_FEATURES + ("predicted", "outcome")
+BACKFILL_CHUNK_ROWS = 100_000
+GROUP_BY = ("day", "age_band", "none")
+
+
+def age_band(age: np.ndarray) -> np.ndarray:
+    return np.minimum(np.floor_divide(age, AGE_BAND_WIDTH) * AGE_BAND_WIDTH, MAX_AGE_BAND).astype(np.int64)
+
+
+@functools.lru_cache(maxsize=None)
+def _upsert_statement(dialect: str):
+    """INSERT .. ON CONFLICT DO UPDATE adding a bucket's deltas; built once per dialect."""
+    table = record_rollups
+    if dialect == "sqlite":
+        stmt, least, greatest = sqlite.insert(table), func.min, func.max
+    elif dialect == "postgresql":
+        stmt, least, greatest = postgresql.insert(table), func.least, func.greatest
+    else:
+        raise NotImplementedError(f"record rollups need an upsert; unsupported dialect {dialect}")
+    excluded = stmt.excluded
+    updates = {name: table.c[name] + excluded[name] for name in ROLLUP_COUNTS}
+    for feature in ROLLUP_FEATURES:
+        for stat in ("sum", "sumsq"):
+            col = f"{feature}_{stat}"
+            updates[col] = table.c[col] + excluded[col]
+        # multi-argument min()/max() are scalar functions in SQLite
+        lo, hi = f"{feature}_min", f"{feature}_max"
+        updates[lo] = least(table.c[lo], excluded[lo])
+        updates[hi] = greatest(table.c[hi], excluded[hi])
+    return stmt.on_conflict_do_update(index_elements=["day", "age_band"], set_=updates)
+
+
+def apply(db: Session, rows: Sequence[Sequence[Optional[float]]], days: Union[date, Sequence[date]]) -> None:
+    """Add inserted rows (ROW_KEYS order) created on `days` (one date, or one per row) to the
+    rollups, in the caller's transaction.
+
+    Aggregation is vectorized per (day, age band) bucket; the upsert touches one rollup row
+    per bucket, not per record.
+    """
+    if not len(rows):
+        return
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), len(ROW_KEYS))
+    n_features = len(ROLLUP_FEATURES)
+    features = values[:, :n_features]
+    predicted, outcome = values[:, n_features], values[:, n_features + 1]
+    if isinstance(days, date):
+        ordinals = np.full(len(values), days.toordinal(), dtype=np.int64)
+    else:
+        ordinals = np.fromiter((d.toordinal() for d in days), dtype=np.int64, count=len(values))
+    bucket_keys, group = np.unique(ordinals * 1000 + age_band(features[:, ROLLUP_FEATURES.index("age")]), return_inverse=True)
+    buckets = [(date.fromordinal(int(k) // 1000), int(k) % 1000) for k in bucket_keys]
+    group = group.reshape(-1)
+    m = len(buckets)
+
+    def count(mask: np.ndarray) -> np.ndarray:
+        return np.bincount(group, weights=mask.astype(np.float64), minlength=m).astype(np.int64)
+
+    has_pred, has_out = ~np.isnan(predicted), ~np.isnan(outcome)
+    both = has_pred & has_out
+    counts = {
+        "n": np.bincount(group, minlength=m),
+        "predicted_n": count(has_pred),
+        "predicted_pos": count(has_pred & (predicted == 1)),
+        "outcome_n": count(has_out),
+        "outcome_pos": count(has_out & (outcome == 1)),
+        "tp": count(both & (predicted == 1) & (outcome == 1)),
+        "fp": count(both & (predicted == 1) & (outcome == 0)),
+        "tn": count(both & (predicted == 0) & (outcome == 0)),
+        "fn": count(both & (predicted == 0) & (outcome == 1)),
+    }
+    stats: Dict[str, np.ndarray] = {}
+    for j, feature in enumerate(ROLLUP_FEATURES):
+        col = features[:, j]
+        stats[f"{feature}_sum"] = np.bincount(group, weights=col, minlength=m)
+        stats[f"{feature}_sumsq"] = np.bincount(group, weights=col * col, minlength=m)
+        lo = np.full(m, np.inf)
+        hi = np.full(m, -np.inf)
+        np.minimum.at(lo, group, col)
+        np.maximum.at(hi, group, col)
+        stats[f"{feature}_min"], stats[f"{feature}_max"] = lo, hi
+
+    params = []
+    for i, (day, band) in enumerate(buckets):
+        item: Dict[str, Any] = {"day": day, "age_band": band}
+        item.update({name: int(values_[i]) for name, values_ in counts.items()})
+        item.update({name: float(values_[i]) for name, values_ in stats.items()})
+        params.append(item)
+    db.execute(_upsert_statement(db.get_bind().dialect.name), params)
+
+
+def rebuild(db: Session, chunk_rows: int = BACKFILL_CHUNK_ROWS) -> int:
+    """Recompute the rollups from the records in the database (backfill); returns the records counted.
+
+    Rollups of archived months are kept as they are, since their rows are no longer here.
+    Safe to run while records are being inserted: it counts the rows up to each table's id
+    high-water mark taken when the old rollups are cleared (later inserts add their own
+    rollups) and commits per chunk, so writers never wait for the whole rebuild.
+    """
+    archived = partitions.archived_months(db)
+    keep = partitions.outside_months(record_rollups.c.day, archived)
+    db.execute(record_rollups.delete() if keep is None else record_rollups.delete().where(keep))
+    marks = [(p.table, db.scalar(select(func.max(p.table.c.id)))) for p in partitions.readable_partitions(db)]
+    db.commit()
+    total = 0
+    for table, high_id in marks:
+        if high_id is None:
+            continue
+        columns = [table.c[c] for c in ROW_KEYS]
+        skip = partitions.outside_months(table.c.created_at, archived)
+        last_id = 0
+        while True:
+            stmt = select(table.c.id, table.c.created_at, *columns).where(table.c.id > last_id, table.c.id <= high_id)
+            if skip is not None:
+                stmt = stmt.where(skip)
+            batch = db.execute(stmt.order_by(table.c.id).limit(chunk_rows)).all()
+            if not batch:
+                break
+            apply(db, [row[2:] for row in batch], [row[1].date() for row in batch])
+            db.commit()
+            last_id = batch[-1][0]
+            total += len(batch)
+    return total
+
+
+def backfill_if_empty(db: Session) -> int:
+    """Build the rollups once for a database that has records but no rollups yet."""
+    if db.scalar(select(func.count()).select_from(record_rollups)):
+        return 0
+    if db.scalar(select(PatientRecord.id).limit(1)) is None:
+        return 0
+    return rebuild(db)
+
+
+def _rate(num: int, den: int) -> Optional[float]:
+    return num / den if den else None
+
+
+def stats(
+    db: Session,
+    group_by: str = "day",
+    day_from: Optional[date] = None,
+    day_to: Optional[date] = None,
+    min_age_band: Optional[int] = None,
+    max_age_band: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Aggregate the rollups per day, per age band or overall.
+
+    Returns prediction and outcome rates, the predicted-vs-outcome confusion counts and
+    mean/std/min/max of every feature per bucket.
+    """
+    if group_by not in GROUP_BY:
+        raise ValueError(f"group_by must be one of {GROUP_BY}")
+    t = record_rollups
+    keys = [t.c.day] if group_by == "day" else [t.c.age_band] if group_by == "age_band" else []
+    aggregates = [func.sum(t.c[name]).label(name) for name in ROLLUP_COUNTS]
+    for feature in ROLLUP_FEATURES:
+        aggregates += [
+            func.sum(t.c[f"{feature}_sum"]).label(f"{feature}_sum"),
+            func.sum(t.c[f"{feature}_sumsq"]).label(f"{feature}_sumsq"),
+            func.min(t.c[f"{feature}_min"]).label(f"{feature}_min"),
+            func.max(t.c[f"{feature}_max"]).label(f"{feature}_max"),
+        ]
+    stmt = select(*keys, *aggregates)
+    if day_from is not None:
+        stmt = stmt.where(t.c.day >= day_from)
+    if day_to is not None:
+        stmt = stmt.where(t.c.day <= day_to)
+    if min_age_band is not None:
+        stmt = stmt.where(t.c.age_band >= min_age_band)
+    if max_age_band is not None:
+        stmt = stmt.where(t.c.age_band <= max_age_band)
+    if keys:
+        stmt = stmt.group_by(*keys).order_by(*keys)
+
+    buckets = []
+    for row in db.execute(stmt).mappings():
+        n = row["n"] or 0
+        if not n:
+            continue
+        bucket: Dict[str, Any] = {}
+        if group_by == "day":
+            day = row["day"]
+            bucket["day"] = day.isoformat() if isinstance(day, (date, datetime)) else day
+        elif group_by == "age_band":
+            band = row["age_band"]
+            bucket["age_band"] = f"{band}+" if band >= MAX_AGE_BAND else f"{band}-{band + AGE_BAND_WIDTH - 1}"
+        tp, fp, tn, fn = (row[k] or 0 for k in ("tp", "fp", "tn", "fn"))
+        bucket.update({
+            "count": n,
+            "prediction_rate": _rate(row["predicted_pos"] or 0, row["predicted_n"] or 0),
+            "outcome_rate": _rate(row["outcome_pos"] or 0, row["outcome_n"] or 0),
+            "confusion": {"tp": tp, "fp": fp, "tn": tn, "fn": fn},
+            "accuracy": _rate(tp + tn, tp + fp + tn + fn),
+            "features": {},
+        })
+        for feature in ROLLUP_FEATURES:
+            mean = row[f"{feature}_sum"] / n
+            variance = max(0.0, row[f"{feature}_sumsq"] / n - mean * mean)
+            bucket["features"][feature] = {
+                "mean": mean,
+                "std": variance ** 0.5,
+                "min": row[f"{feature}_min"],
+                "max": row[f"{feature}_max"],
+            }
+        buckets.append(bucket)
+    return buckets
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .db import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Rebuild the record_rollups table from patient_records and its partitions.")
+    parser.parse_args()
+    init_db()
+    with SessionLocal() as session:
+        print(f"Rolled up {rebuild(session)} records")
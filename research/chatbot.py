@@ -1,10 +1,90 @@
+import asyncio
 import os
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+import re
+import threading
+import time
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+from backend.cache import TTLCache
 load_dotenv()
 
+# langchain is imported inside the builders below: it costs ~0.7 s, which the API process
+# should not pay before it can serve anything else
+if TYPE_CHECKING:
+    from langchain_core.messages import AIMessage
+    from langchain_core.runnables import Runnable
+
+# "groq" for the hosted model, "stub" for an offline canned-answer model (benchmarks, tests)
+CHAT_LLM = os.getenv("CHAT_LLM", "groq")
+CHAT_STUB_LATENCY_MS = float(os.getenv("CHAT_STUB_LATENCY_MS", "200"))
+
+SYSTEM_PROMPT = (
+    "You are a healthcare research assistant focused on diabetes. "
+    "Provide concise, evidence-informed answers for general education. "
+    "Avoid medical diagnosis or personalized treatment. If asked for medical advice, "
+    "recommend consulting a licensed clinician. If uncertain, say you don't know."
+)
+
+# answers keyed on the normalized question; only successful answers are cached
+answer_cache = TTLCache(
+    maxsize=int(os.getenv("CHAT_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("CHAT_CACHE_TTL", "86400")),
+)
+
+_chain = None
+_chain_lock = threading.Lock()
+
+
+def _stub_answer(prompt_value) -> "AIMessage":
+    from langchain_core.messages import AIMessage
+    question = prompt_value.to_messages()[-1].content
+    return AIMessage(content=f"[stub] General information about: {question}")
+
+
+def build_stub_llm(latency_ms: float = CHAT_STUB_LATENCY_MS) -> "Runnable":
+    """Local stand-in for the hosted LLM that sleeps `latency_ms` to mimic a round trip."""
+    from langchain_core.runnables import RunnableLambda
+
+    def invoke(prompt_value) -> "AIMessage":
+        time.sleep(latency_ms / 1000.0)
+        return _stub_answer(prompt_value)
+
+    async def ainvoke(prompt_value) -> "AIMessage":
+        await asyncio.sleep(latency_ms / 1000.0)
+        return _stub_answer(prompt_value)
+
+    return RunnableLambda(invoke, afunc=ainvoke)
+
+
+def build_llm() -> "Runnable":
+    if CHAT_LLM == "stub":
+        return build_stub_llm()
+    from langchain_groq import ChatGroq
+    return ChatGroq(model="llama-3.1-8b-instant", api_key=os.getenv("GROQ_API_KEY"), temperature=0.2)
+
+
+def get_chain() -> "Runnable":
+    """Long-lived prompt | llm | parser chain, created once and shared by all requests."""
+    global _chain
+    if _chain is None:
+        with _chain_lock:
+            if _chain is None:
+                from langchain_core.output_parsers import StrOutputParser
+                from langchain_core.prompts import ChatPromptTemplate
+                prompt = ChatPromptTemplate.from_messages([
+                    ("system", SYSTEM_PROMPT),
+                    ("user", "{question}"),
+                ])
+                _chain = prompt | build_llm() | StrOutputParser()
+    return _chain
+
+
+def normalize_question(question: str) -> str:
+    """Cache key: case, punctuation and whitespace differences map to the same question."""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
 def get_chat_response(question:str)->str:
     """
     return research-oriented answer using groq and langchain
@@ -12,27 +92,35 @@ def get_chat_response(question:str)->str:
     q=(question or "").strip()
     if not q:
         return "please ask question about diabetes research"
-    
-    api_key=os.getenv("GROQ_API_KEY")
 
-    llm=ChatGroq(model="llama-3.1-8b-instant",api_key=api_key,temperature=0.2)
+    key = normalize_question(q)
+    cached = answer_cache.get(key)
+    if cached is not None:
+        return cached
+    try:
+        answer = get_chain().invoke({"question": q})
+    except Exception as e:
+        return f"Chat error: {e}"
+    answer_cache.put(key, answer)
+    return answer
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", (
-            "You are a healthcare research assistant focused on diabetes. "
-            "Provide concise, evidence-informed answers for general education. "
-            "Avoid medical diagnosis or personalized treatment. If asked for medical advice, "
-            "recommend consulting a licensed clinician. If uncertain, say you don't know."
-        )),
-        ("user", "{question}"),
-    ])
 
-    chain=prompt | llm | StrOutputParser()
+async def aget_chat_response(question: str) -> str:
+    """Async variant of `get_chat_response`; the LLM round trip does not hold a worker thread."""
+    q = (question or "").strip()
+    if not q:
+        return "please ask question about diabetes research"
 
+    key = normalize_question(q)
+    cached = answer_cache.get(key)
+    if cached is not None:
+        return cached
     try:
-        return chain.invoke({"question": q})
+        # building the chain imports langchain and may wait on the warm-up thread's lock,
+        # so only a ready chain is taken on the event loop
+        chain = _chain or await run_in_threadpool(get_chain)
+        answer = await chain.ainvoke({"question": q})
     except Exception as e:
-        return f"Chat error: {e}"   
-
-# result=get_chat_response("what is diabetes")
-# print(result)
\ No newline at end of file
+        return f"Chat error: {e}"
+    answer_cache.put(key, answer)
+    return answer
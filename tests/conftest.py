@@ -0,0 +1,30 @@
+"""Tests run against a throwaway SQLite file and job directory, never data/diabetes.db.
+
+The environment is set before any app module is imported, because models.db builds its
+engine and backend.jobs its paths at import time.
+"""
+import os
+import tempfile
+
+_TMP_DIR = tempfile.mkdtemp(prefix="diabetes-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ["JOB_DIR"] = os.path.join(_TMP_DIR, "jobs")
+
+import pytest
+from sqlalchemy import inspect
+
+
+@pytest.fixture
+def db():
+    """A session on freshly created tables; every table, month partitions included, is dropped afterwards."""
+    from models.db import SessionLocal, engine, init_db
+
+    init_db()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        with engine.begin() as conn:
+            for name in inspect(conn).get_table_names():
+                conn.exec_driver_sql(f'DROP TABLE "{name}"')
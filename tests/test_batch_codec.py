@@ -0,0 +1,41 @@
+"""Malformed or oversized /predict/batch bodies are client errors, never a 500."""
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import batch_codec, serving
+from backend.main import app
+
+ROW = [1, 120, 70, 20, 80, 30.0, 0.5, 40]
+
+
+def test_decode_json_nulls_are_nan():
+    X = batch_codec.decode_json(json.dumps([ROW, [None] * 8]).encode())
+    assert X.shape == (2, 8) and np.isnan(X[1]).all()
+
+
+@pytest.mark.parametrize("rows", [[[{"a": 1}] + ROW[1:]], [ROW[:-1] + [[1, 2]]], [ROW, ROW[:4]], [["x"] + ROW[1:]]])
+def test_decode_json_rejects_non_numeric_cells(rows):
+    with pytest.raises(ValueError):
+        batch_codec.decode_json(json.dumps(rows).encode())
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # a loaded model is required, but these bodies are refused before anything is scored
+    monkeypatch.setattr(serving, "current", lambda: serving.ActiveModel(None, "test"))
+    return TestClient(app)
+
+
+def test_bad_cells_are_400(client):
+    response = client.post("/predict/batch", json=[[{"a": 1}] + ROW[1:]])
+    assert response.status_code == 400
+
+
+def test_oversized_body_is_413(client, monkeypatch):
+    monkeypatch.setattr(batch_codec, "MAX_BATCH_BYTES", 100)
+    body = batch_codec.encode_binary(np.tile(np.asarray(ROW, dtype=np.float64), (2, 1)))
+    response = client.post("/predict/batch", content=body, headers={"Content-Type": batch_codec.BINARY_MEDIA_TYPE})
+    assert response.status_code == 413
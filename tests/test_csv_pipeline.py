@@ -0,0 +1,100 @@
+"""Vectorized CSV validation: which rows are rejected, and why."""
+import io
+
+import numpy as np
+import pytest
+
+from data.csv_pipeline import (
+    EXPECTED_FEATURES,
+    OUTCOME_COLUMN,
+    iter_validated_chunks,
+    load_validated_csv,
+    validate_matrix,
+)
+
+GOOD = [1, 120, 70, 20, 80, 30.5, 0.5, 40]
+HEADER = ",".join(EXPECTED_FEATURES)
+
+
+def _csv(rows, header=HEADER):
+    return io.BytesIO(("\n".join([header] + [",".join(str(v) for v in row) for row in rows]) + "\n").encode())
+
+
+def test_validate_matrix_rules():
+    X = np.array([
+        GOOD,
+        [np.nan] + GOOD[1:],
+        GOOD[:1] + [np.inf] + GOOD[2:],
+        GOOD[:2] + [-1] + GOOD[3:],
+        [2.5] + GOOD[1:7] + [-3],
+        GOOD,
+    ], dtype=np.float64)
+    valid, errors = validate_matrix(X)
+    np.testing.assert_array_equal(valid, [True, False, False, False, False, True])
+    assert set(errors) == {
+        "Pregnancies: missing or not a number",
+        "Glucose: missing or not a number",
+        "BloodPressure: must be >= 0",
+        "Pregnancies: must be a whole number",
+        "Age: must be >= 0",
+    }
+    np.testing.assert_array_equal(errors["Pregnancies: missing or not a number"], [1])
+    np.testing.assert_array_equal(errors["Age: must be >= 0"], [4])
+    # NaN is reported as missing only, not also as a fractional count
+    assert 1 not in errors["Pregnancies: must be a whole number"]
+
+
+def test_validate_matrix_all_good():
+    valid, errors = validate_matrix(np.array([GOOD, GOOD], dtype=np.float64))
+    assert valid.all() and errors == {}
+
+
+def test_non_numeric_cells_are_rejected_not_fatal():
+    chunk = load_validated_csv(_csv([GOOD, ["abc"] + GOOD[1:], GOOD[:5] + [""] + GOOD[6:], GOOD]))
+    np.testing.assert_array_equal(chunk.valid, [True, False, False, True])
+    assert chunk.rejected == 2
+    assert chunk.row_errors() == {1: ["Pregnancies: missing or not a number"], 2: ["BMI: missing or not a number"]}
+    # valid rows keep their parsed values
+    np.testing.assert_array_equal(chunk.features[EXPECTED_FEATURES].to_numpy()[3], GOOD)
+
+
+def test_row_errors_offset_and_limit():
+    chunk = load_validated_csv(_csv([[-1] + GOOD[1:7] + [1.5], GOOD, [-2] + GOOD[1:]]))
+    assert chunk.row_errors(offset=100) == {
+        100: ["Pregnancies: must be >= 0", "Age: must be a whole number"],
+        102: ["Pregnancies: must be >= 0"],
+    }
+    assert list(chunk.row_errors(limit=1)) == [0]
+    summary = chunk.summary()
+    assert summary["rejected"] == 2
+    assert summary["reject_counts"] == {"Pregnancies: must be >= 0": 2, "Age: must be a whole number": 1}
+
+
+def test_missing_columns_are_an_error():
+    with pytest.raises(ValueError, match="Missing required columns: \\['Age'\\]"):
+        load_validated_csv(_csv([GOOD[:-1]], header=",".join(EXPECTED_FEATURES[:-1])))
+    with pytest.raises(ValueError, match="Missing required columns"):
+        list(iter_validated_chunks(_csv([GOOD[:-1]], header=",".join(EXPECTED_FEATURES[:-1]))))
+
+
+def test_extra_columns_ignored_and_outcome_kept_on_request():
+    source = _csv([["x"] + GOOD + [1]], header=",".join(["Name"] + EXPECTED_FEATURES + [OUTCOME_COLUMN]))
+    chunk = load_validated_csv(source, with_outcome=True)
+    assert list(chunk.features.columns) == EXPECTED_FEATURES + [OUTCOME_COLUMN]
+    assert chunk.valid.all()
+    source.seek(0)
+    assert list(load_validated_csv(source).features.columns) == EXPECTED_FEATURES
+
+
+def test_chunks_fall_back_to_text_parsing_mid_file():
+    rows = [[i] + GOOD[1:] for i in range(7)]
+    # "n/a" would be read as NaN by the typed parser; this cell forces the text fallback
+    rows[5][1] = "abc"
+    chunks = list(iter_validated_chunks(_csv(rows), chunksize=2))
+    assert [len(c.valid) for c in chunks] == [2, 2, 2, 1]
+    valid = np.concatenate([c.valid for c in chunks])
+    np.testing.assert_array_equal(valid, [True] * 5 + [False, True])
+    # every row comes out exactly once, in file order
+    pregnancies = np.concatenate([c.features["Pregnancies"].to_numpy() for c in chunks])
+    np.testing.assert_array_equal(pregnancies, np.arange(7))
+    assert chunks[2].row_errors(offset=4) == {5: ["Glucose: missing or not a number"]}
@@ -0,0 +1,74 @@
+"""The compiled forest must agree with the sklearn forest it was flattened from.
+
+    python -m pytest -q tests
+"""
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.csv_pipeline import EXPECTED_FEATURES
+from models import forest as forest_module
+from models.forest import CompiledForest
+from models.registry import LEGACY_MODEL_PATH, ModelRegistry
+
+CSV_PATH = os.path.join("data", "diabetes.csv")
+
+pytestmark = pytest.mark.skipif(not os.path.exists(LEGACY_MODEL_PATH), reason="no trained model.joblib")
+
+
+@pytest.fixture(scope="module")
+def model():
+    return joblib.load(LEGACY_MODEL_PATH)
+
+
+@pytest.fixture(scope="module")
+def X():
+    rows = pd.read_csv(CSV_PATH)[EXPECTED_FEATURES].to_numpy(dtype=np.float64)
+    # the training rows plus off-distribution rows, so every kind of split is exercised
+    rng = np.random.default_rng(0)
+    noise = rng.uniform(0, 1, size=(2_000, len(EXPECTED_FEATURES))) * rows.max(axis=0) * 1.5
+    return np.vstack([rows, noise])
+
+
+def test_compiled_matches_sklearn(model, X):
+    forest = CompiledForest.from_sklearn(model)
+    assert forest.estimator is None
+    frame = pd.DataFrame(X, columns=model.feature_names_in_)
+    np.testing.assert_allclose(forest.predict_proba(X), model.predict_proba(frame), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(forest.predict(X), model.predict(frame))
+
+
+def test_large_batches_use_the_estimator(model, X, monkeypatch):
+    monkeypatch.setattr(forest_module, "SKLEARN_MIN_ROWS", 1_000)
+    compiled = CompiledForest.from_sklearn(model)
+    hybrid = CompiledForest.from_sklearn(model).with_estimator(joblib.load(LEGACY_MODEL_PATH))
+    calls = []
+    predict_proba = hybrid.estimator.predict_proba
+    monkeypatch.setattr(hybrid.estimator, "predict_proba", lambda A: calls.append(len(A)) or predict_proba(A))
+    for n in (1, 999, 1_000, len(X)):
+        np.testing.assert_allclose(hybrid.predict_proba(X[:n]), compiled.predict_proba(X[:n]), rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(hybrid.predict(X[:n]), compiled.predict(X[:n]))
+    assert all(n >= 1_000 for n in calls) and calls
+
+
+def test_registry_attaches_the_estimator_on_the_first_large_batch(model, X, tmp_path, monkeypatch):
+    monkeypatch.setattr(forest_module, "SKLEARN_MIN_ROWS", 1_000)
+    registry = ModelRegistry(str(tmp_path))
+    _, served = registry.load(registry.publish(model))
+    # the traversal arrays are mapped from forest.joblib like the node arrays
+    assert isinstance(served._children, np.memmap) and isinstance(served._is_leaf, np.memmap)
+    compiled = CompiledForest.from_sklearn(model)
+    np.testing.assert_array_equal(served.predict_proba(X[:999]), compiled.predict_proba(X[:999]))
+    assert served.estimator is None
+    np.testing.assert_allclose(served.predict_proba(X[:1_000]), compiled.predict_proba(X[:1_000]), rtol=0, atol=1e-12)
+    assert served.estimator is not None and served.estimator_path is None
+
+
+def test_explain_adds_up_to_probability(model, X):
+    forest = CompiledForest.from_sklearn(model)
+    proba, bias, contributions = forest.explain(X)
+    np.testing.assert_array_equal(proba, forest.predict_proba(X))
+    np.testing.assert_allclose(bias + contributions.sum(axis=1), proba[:, forest.positive_index()], atol=1e-9)
@@ -0,0 +1,207 @@
+"""Background jobs resume from their committed progress once a dead worker's lease runs out.
+
+Jobs run in this process: `_dispatch` only records the job and the test calls `run_job`.
+"""
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import func, select, update
+
+from backend import jobs, serving
+from data.csv_pipeline import EXPECTED_FEATURES, OUTCOME_COLUMN
+from models.db import Job, PatientRecord
+
+ROWS = 25
+
+
+class Killed(BaseException):
+    """Stands in for a worker process dying: nothing in run_job handles it."""
+
+
+class CountingForest:
+    """Predicts from Glucose and remembers which rows (by Pregnancies) it scored."""
+
+    def __init__(self, die_on_call=None, on_call=None):
+        self.scored = []
+        self.calls = 0
+        self.die_on_call = die_on_call
+        self.on_call = on_call
+
+    def predict(self, X):
+        self.calls += 1
+        if self.on_call is not None:
+            self.on_call(self.calls)
+        if self.calls == self.die_on_call:
+            raise Killed()
+        self.scored.extend(int(p) for p in X[:, 0])
+        return (X[:, 1] > 120).astype(np.int64)
+
+
+@pytest.fixture
+def dispatched(db, monkeypatch):
+    calls = []
+    monkeypatch.setattr(jobs, "_dispatch", calls.append)
+    monkeypatch.setattr(jobs, "DEFAULT_CHUNK_ROWS", 10)
+    return calls
+
+
+def _use(monkeypatch, forest):
+    monkeypatch.setattr(jobs, "_load_forest", lambda version: ("test", forest))
+    # each run stands for a fresh worker process, which has no active model yet
+    monkeypatch.setattr(serving, "_active", None)
+
+
+def _csv_job(tmp_path, store=True):
+    path = tmp_path / "input.csv"
+    lines = [",".join(EXPECTED_FEATURES + [OUTCOME_COLUMN])]
+    # Pregnancies is the row number, so every row is distinct and identifiable
+    lines += [f"{i},{100 + 2 * i},70,20,80,30.5,0.4,40,{i % 2}" for i in range(ROWS)]
+    path.write_text("\n".join(lines) + "\n")
+    with open(path, "rb") as f:
+        return jobs.submit_csv_job(f, store=store, model_version="test")
+
+
+def _job(db, job_id):
+    db.expire_all()
+    return db.get(Job, job_id)
+
+
+def _expire_lease(db, job_id):
+    db.execute(update(Job).where(Job.id == job_id).values(lease_until=datetime.utcnow() - timedelta(seconds=1)))
+    db.commit()
+
+
+def _result_rows(job_id):
+    with open(jobs.result_path(job_id)) as f:
+        return [json.loads(line)["row"] for line in f]
+
+
+def test_killed_job_resumes_after_lease_expiry(db, dispatched, tmp_path, monkeypatch):
+    job_id = _csv_job(tmp_path)
+    assert dispatched == [job_id]
+    first = CountingForest(die_on_call=2)
+    _use(monkeypatch, first)
+    with pytest.raises(Killed):
+        jobs.run_job(job_id, jobs.OWNER)
+    job = _job(db, job_id)
+    assert (job.status, job.processed) == ("running", 10)
+    assert first.scored == list(range(10))
+    # a line of the chunk that was cut off, as a dying worker can leave behind
+    with open(jobs.result_path(job_id), "a") as f:
+        f.write('{"row": 10, "predic')
+
+    # the dead worker's lease still holds, so nobody takes the job yet
+    assert jobs.resume_jobs() == 0
+    _expire_lease(db, job_id)
+    assert jobs.resume_jobs() == 1
+    assert dispatched == [job_id, job_id]
+
+    second = CountingForest()
+    _use(monkeypatch, second)
+    assert jobs.run_job(job_id, jobs.OWNER)["status"] == "succeeded"
+    job = _job(db, job_id)
+    assert (job.status, job.processed, job.total) == ("succeeded", ROWS, ROWS)
+    assert second.scored == list(range(10, ROWS))
+    assert _result_rows(job_id) == list(range(ROWS))
+    assert db.scalar(select(func.count()).select_from(PatientRecord)) == ROWS
+    assert sorted(db.scalars(select(PatientRecord.pregnancies))) == list(range(ROWS))
+    # the upload is gone once the job is finished; the result stays until purged
+    assert not os.path.exists(os.path.join(jobs.job_dir(job_id), jobs.CSV_INPUT))
+
+
+def test_worker_that_lost_its_lease_commits_nothing(db, dispatched, tmp_path, monkeypatch):
+    job_id = _csv_job(tmp_path)
+
+    def claimed_elsewhere(call):
+        # another API process claims the job while the first chunk is being scored
+        if call == 1:
+            db.execute(update(Job).where(Job.id == job_id).values(owner="other"))
+            db.commit()
+
+    _use(monkeypatch, CountingForest(on_call=claimed_elsewhere))
+    assert jobs.run_job(job_id, jobs.OWNER)["status"] == "claimed"
+    job = _job(db, job_id)
+    assert (job.owner, job.processed, job.finished_at) == ("other", 0, None)
+    assert db.scalar(select(func.count()).select_from(PatientRecord)) == 0
+    # nor does a worker started for a job this process no longer owns
+    assert jobs.run_job(job_id, jobs.OWNER)["status"] == "running"
+
+
+def test_renew_keeps_own_queued_leases_only(db, dispatched, tmp_path):
+    mine, theirs, running = _csv_job(tmp_path), _csv_job(tmp_path), _csv_job(tmp_path)
+    now = datetime.utcnow()
+    db.execute(update(Job).values(lease_until=now))
+    db.execute(update(Job).where(Job.id == theirs).values(owner="other"))
+    # a running job's lease is its worker's to renew, so a hung worker lets it expire
+    db.execute(update(Job).where(Job.id == running).values(status="running"))
+    db.commit()
+    assert jobs.renew_leases() == 1
+    assert _job(db, mine).lease_until > datetime.utcnow() + timedelta(seconds=jobs.JOB_LEASE_SECONDS / 2)
+    assert _job(db, running).lease_until == now
+
+
+class FailingPool:
+    def __init__(self, error):
+        self.error = error
+        self.shut_down = False
+
+    def submit(self, *args):
+        raise self.error
+
+    def shutdown(self, **kwargs):
+        self.shut_down = True
+
+
+def test_undispatchable_job_releases_its_lease(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "get_job_pool", lambda: FailingPool(RuntimeError("cannot schedule new futures")))
+    job_id = _csv_job(tmp_path)
+    job = _job(db, job_id)
+    assert (job.status, job.owner, job.lease_until) == ("queued", None, None)
+    # so it is neither renewed forever nor stuck: the keeper claims it again next round
+    assert jobs.renew_leases() == 0
+    assert jobs.resume_jobs() == 1
+
+
+def test_broken_pool_is_replaced_on_dispatch(db, tmp_path, monkeypatch):
+    broken = FailingPool(jobs.BrokenProcessPool("a worker died"))
+    submitted = []
+
+    class FreshPool:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def submit(self, fn, *args):
+            submitted.append(args)
+            return jobs.Future()
+
+    monkeypatch.setattr(jobs, "_pool", broken)
+    monkeypatch.setattr(jobs, "ProcessPoolExecutor", FreshPool)
+    job_id = _csv_job(tmp_path)
+    assert broken.shut_down and isinstance(jobs._pool, FreshPool)
+    assert submitted == [(job_id, jobs.OWNER)]
+    assert _job(db, job_id).owner == jobs.OWNER
+
+
+def test_time_limit_interrupts_a_hung_extraction():
+    with pytest.raises(TimeoutError):
+        with jobs._time_limit(0.05, "PDF text extraction"):
+            time.sleep(5)
+    with jobs._time_limit(1, "PDF text extraction"):
+        pass
+
+
+def test_purge_removes_old_finished_jobs_only(db, dispatched, tmp_path):
+    old, recent, pending = _csv_job(tmp_path), _csv_job(tmp_path), _csv_job(tmp_path)
+    now = datetime.utcnow()
+    db.execute(update(Job).where(Job.id == old).values(status="succeeded", finished_at=now - timedelta(hours=3)))
+    db.execute(update(Job).where(Job.id == recent).values(status="failed", finished_at=now))
+    db.commit()
+    assert jobs.purge_jobs(retention_hours=2) == 1
+    assert jobs.get_job(old) is None and not os.path.exists(jobs.job_dir(old))
+    assert jobs.get_job(recent) is not None and os.path.exists(jobs.job_dir(recent))
+    assert jobs.get_job(pending)["status"] == "queued"
+    assert jobs.purge_jobs(retention_hours=0) == 0
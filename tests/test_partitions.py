@@ -0,0 +1,57 @@
+"""/records and /records/export read the hot table plus warm month partitions."""
+import io
+from datetime import datetime
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from backend.main import app
+from models import crud, partitions
+from models.db import PatientRecord
+
+
+@pytest.fixture
+def client():
+    # no `with`: the lifespan (model warm-up, job keeper) is not needed to read records
+    return TestClient(app)
+
+
+@pytest.fixture
+def rolled(db):
+    """Ids 1-3 created in May 2026 and moved to their month partition, ids 4-6 hot in July."""
+    X = np.tile([1, 120, 70, 20, 80, 30.0, 0.5, 40], (6, 1))
+    ids = crud.create_records_bulk(db, X, [0, 1, 0, 1, 0, 1])
+    db.execute(update(PatientRecord).where(PatientRecord.id.in_(ids[:3])).values(created_at=datetime(2026, 5, 10)))
+    db.execute(update(PatientRecord).where(PatientRecord.id.in_(ids[3:])).values(created_at=datetime(2026, 7, 10)))
+    db.commit()
+    assert partitions.roll(db, hot_months=1, now=datetime(2026, 7, 15)) == {"patient_records_202605": 3}
+    return ids
+
+
+def _pages(client, params):
+    ids, cursor = [], None
+    while True:
+        response = client.get("/records", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        ids.extend(item["id"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids
+
+
+def test_records_pages_across_partitions_with_aware_filters(client, rolled):
+    expected = sorted(rolled, reverse=True)
+    assert _pages(client, {"limit": 2, "created_from": "2026-05-01T00:00:00Z", "fields": "id"}) == expected
+    assert _pages(client, {"limit": 2, "created_from": "2026-06-01T00:00:00Z"}) == expected[:3]
+    # 02:00 at +02:00 is midnight UTC on June 1st, so the May rows are kept and the hot July rows are excluded
+    assert _pages(client, {"limit": 2, "created_to": "2026-06-01T02:00:00+02:00"}) == expected[3:]
+
+
+def test_export_with_aware_filters(client, rolled):
+    pa = pytest.importorskip("pyarrow")
+    response = client.get("/records/export", params={"format": "arrow", "created_from": "2026-05-01T00:00:00+00:00"})
+    assert response.status_code == 200, response.text
+    table = pa.ipc.open_stream(io.BytesIO(response.content)).read_all()
+    assert table.column("id").to_pylist() == sorted(rolled)
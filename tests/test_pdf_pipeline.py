@@ -0,0 +1,48 @@
+"""PDF text extraction on the process pool survives crashed workers."""
+import asyncio
+import io
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from data import pdf_pipeline_with_feature_extract as pdf
+
+pypdf = pytest.importorskip("pypdf")
+
+
+def _blank_pdf(pages):
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    pdf.shutdown_pdf_pool()
+    yield
+    pdf.shutdown_pdf_pool()
+
+
+def test_pool_is_replaced_after_a_worker_dies():
+    pool = pdf.get_pdf_pool()
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result(timeout=60)
+    assert pdf.extract_text_from_pdf_bytes_pooled(_blank_pdf(1), timeout=60) == ""
+    assert pdf.get_pdf_pool() is not pool
+
+
+def test_long_documents_are_split_across_tasks(monkeypatch):
+    monkeypatch.setattr(pdf, "PDF_PAGES_PER_TASK", 2)
+    data = _blank_pdf(5)
+    extraction = pdf.submit_pdf_extraction(data, timeout=60)
+    assert extraction.result() == pdf.extract_text_from_pdf_bytes(data)
+    # the shared copy of the document is freed once the text is in
+    assert extraction.shared is None and len(extraction.futures) == 3
+
+
+def test_async_extraction():
+    assert asyncio.run(pdf.aextract_text_from_pdf_bytes_pooled(_blank_pdf(1), timeout=60)) == ""
@@ -0,0 +1,114 @@
+"""/records/stats, served from the upserted rollups, must equal a full scan of patient_records."""
+import io
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from backend import serving
+from backend.main import app
+from data.csv_pipeline import EXPECTED_FEATURES, OUTCOME_COLUMN, load_validated_csv
+from models import crud, rollups
+from models.db import ROLLUP_FEATURES, PatientRecord, SessionLocal
+from models.schema import RecordCreate
+
+
+def _insert_every_way(db, rng):
+    def random_row(age):
+        return [int(rng.integers(0, 10)), *rng.uniform(0, 200, 5).round(2).tolist(), float(rng.uniform(0, 2).round(3)), age]
+
+    # one record per transaction, with and without a prediction or an outcome
+    for i, age in enumerate([25, 27, 33, 81, 95, 25]):
+        data = RecordCreate(**dict(zip(crud.FEATURE_COLUMNS, random_row(age))), outcome=[None, 0, 1][i % 3])
+        crud.create_record(db, data, predicted=[0, 1, None][i % 3] if i != 4 else 1)
+    # a group-commit batch hitting buckets that already exist and new ones
+    crud.insert_rows(db, [tuple(random_row(age)) + (p, o) for age, p, o in [
+        (26, 1, 1), (26, 0, 1), (45, 1, 0), (85, 0, 0), (33, None, 1), (58, 1, None),
+    ]])
+    # the bulk CSV path: rejected rows are neither stored nor counted
+    lines = [",".join(EXPECTED_FEATURES + [OUTCOME_COLUMN])]
+    for i in range(40):
+        row = random_row(int(rng.integers(21, 90)))
+        lines.append(",".join(str(v) for v in row) + f",{i % 2 if i % 5 else ''}")
+    lines.append("1,100,70,20,80,30,0.5,-4,1")
+    chunk = load_validated_csv(io.BytesIO(("\n".join(lines) + "\n").encode()), with_outcome=True)
+    assert chunk.rejected == 1
+    serving.score_chunk(chunk, lambda X: (X[:, 1] > 100).astype(np.int64), db)
+
+
+def _scan(db, group_by):
+    """The numbers /records/stats reports, computed from every stored row."""
+    columns = [PatientRecord.__table__.c[c] for c in ROLLUP_FEATURES + ("predicted", "outcome")]
+    values = np.array(db.execute(select(*columns)).all(), dtype=np.float64)
+    features, predicted, outcome = values[:, :-2], values[:, -2], values[:, -1]
+    keys = rollups.age_band(features[:, ROLLUP_FEATURES.index("age")]) if group_by == "age_band" else np.zeros(len(values))
+    expected = []
+    for key in np.unique(keys):
+        rows = keys == key
+        p, o = predicted[rows], outcome[rows]
+        both = ~np.isnan(p) & ~np.isnan(o)
+        confusion = {
+            "tp": int(np.sum(both & (p == 1) & (o == 1))),
+            "fp": int(np.sum(both & (p == 1) & (o == 0))),
+            "tn": int(np.sum(both & (p == 0) & (o == 0))),
+            "fn": int(np.sum(both & (p == 0) & (o == 1))),
+        }
+        expected.append({
+            "count": int(rows.sum()),
+            "prediction_rate": float(np.nanmean(p)) if (~np.isnan(p)).any() else None,
+            "outcome_rate": float(np.nanmean(o)) if (~np.isnan(o)).any() else None,
+            "confusion": confusion,
+            "features": {
+                name: {"mean": col.mean(), "std": col.std(), "min": col.min(), "max": col.max()}
+                for name, col in zip(ROLLUP_FEATURES, features[rows].T)
+            },
+        })
+    return expected
+
+
+def _assert_matches(buckets, expected):
+    assert len(buckets) == len(expected)
+    for bucket, want in zip(buckets, expected):
+        assert bucket["count"] == want["count"]
+        assert bucket["confusion"] == want["confusion"]
+        for rate in ("prediction_rate", "outcome_rate"):
+            assert (bucket[rate] is None) == (want[rate] is None)
+            if want[rate] is not None:
+                assert bucket[rate] == pytest.approx(want[rate])
+        for name, stats in want["features"].items():
+            for stat, value in stats.items():
+                # std comes from sum and sum of squares, hence the absolute slack
+                assert bucket["features"][name][stat] == pytest.approx(value, rel=1e-9, abs=1e-4), (name, stat)
+
+
+@pytest.mark.parametrize("group_by", ["age_band", "none"])
+def test_stats_match_a_full_scan(db, group_by):
+    _insert_every_way(db, np.random.default_rng(7))
+    response = TestClient(app).get("/records/stats", params={"group_by": group_by})
+    assert response.status_code == 200, response.text
+    _assert_matches(response.json(), _scan(db, group_by))
+
+
+def test_rebuild_matches_a_full_scan(db):
+    _insert_every_way(db, np.random.default_rng(11))
+    assert rollups.rebuild(db) == db.query(PatientRecord).count()
+    _assert_matches(rollups.stats(db, group_by="age_band"), _scan(db, "age_band"))
+
+
+def test_rows_inserted_during_a_rebuild_are_counted_once(db, monkeypatch):
+    _insert_every_way(db, np.random.default_rng(13))
+    stored = db.query(PatientRecord).count()
+    apply, inserted = rollups.apply, []
+
+    def apply_after_an_insert(session, rows, days):
+        # another writer stores rows between two chunks of the rebuild
+        if session is db and not inserted:
+            with SessionLocal() as other:
+                inserted.extend(crud.insert_rows(other, [(1, 100, 70, 20, 80, 30.5, 0.4, 40, 1, 0)] * 3))
+        apply(session, rows, days)
+
+    monkeypatch.setattr(rollups, "apply", apply_after_an_insert)
+    assert rollups.rebuild(db, chunk_rows=10) == stored
+    assert len(inserted) == 3
+    _assert_matches(rollups.stats(db, group_by="age_band"), _scan(db, "age_band"))
@@ -0,0 +1,26 @@
+"""Micro-batched single-row predictions are made by the model their request read."""
+import numpy as np
+
+from backend import serving
+
+
+class ConstantForest:
+    def __init__(self, value):
+        self.value = value
+
+    def predict(self, X):
+        return np.full(len(X), self.value)
+
+
+def test_batch_spanning_a_swap_uses_each_rows_model():
+    old, new = serving.ActiveModel(ConstantForest(0), "v1"), serving.ActiveModel(ConstantForest(1), "v2")
+    row = [1, 120, 70, 20, 80, 30.0, 0.5, 40]
+    preds = serving._predict_queued([(old, row), (new, row), (old, row), (new, row)])
+    np.testing.assert_array_equal(preds, [0, 1, 0, 1])
+
+
+def test_predict_one_caches_under_the_version_that_scored():
+    active = serving.ActiveModel(ConstantForest(1), "test-predict-one")
+    row = [2, 99, 60, 10, 0, 25.5, 0.3, 33]
+    assert serving.predict_one(row, active) == 1
+    assert serving.prediction_cache.get(("test-predict-one", serving.feature_key(row))) == 1
@@ -0,0 +1,37 @@
+"""Incremental training inputs and registry version names."""
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import update
+
+from models import crud, partitions
+from models.db import PatientRecord
+from models.registry import ModelRegistry
+
+ROW = [1, 120, 70, 20, 80, 30.5, 0.5, 40]
+
+
+def test_labeled_rows_after_an_id(db):
+    ids = crud.create_records_bulk(db, np.tile(ROW, (6, 1)), [0] * 6, outcome=[1, None, 0, 1, None, 0])
+    db.execute(update(PatientRecord).where(PatientRecord.id.in_(ids[:3])).values(created_at=datetime(2026, 5, 10)))
+    db.commit()
+    partitions.roll(db, hot_months=1, now=datetime(2026, 7, 15))
+
+    features, outcome, max_id = crud.labeled_feature_matrix(db)
+    assert (len(features), max_id) == (4, ids[5])
+    features, outcome, max_id = crud.labeled_feature_matrix(db, after_id=ids[2])
+    np.testing.assert_array_equal(outcome, [1, 0])
+    assert max_id == ids[5]
+    features, outcome, max_id = crud.labeled_feature_matrix(db, after_id=ids[5])
+    assert len(features) == 0 and max_id is None
+
+
+def test_publishes_in_the_same_second_get_distinct_versions(tmp_path):
+    from sklearn.ensemble import RandomForestClassifier
+
+    X = np.tile(ROW, (20, 1)) + np.arange(20)[:, None]
+    model = RandomForestClassifier(n_estimators=2, random_state=0).fit(X, np.arange(20) % 2)
+    registry = ModelRegistry(str(tmp_path))
+    versions = [registry.publish(model, activate=False) for _ in range(3)]
+    assert len(set(versions)) == 3
+    assert registry.versions() == sorted(versions)